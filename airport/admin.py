@@ -2,7 +2,7 @@ from airport.forms import AirportForm
 from django.contrib.gis import admin
 from django.utils.html import format_html
 from airport.models import SurfaceType, Airport, SurfaceShape, AssetType, \
-    Asset, AssetCategory, AssetVersion, Translation
+    Asset, AssetCategory, AssetVersion, Translation, MediaFile, Upload
 
 
 class AirportAdmin(admin.ModelAdmin):
@@ -26,3 +26,5 @@ admin.site.register(SurfaceShape, admin.GeoModelAdmin)
 admin.site.register(Asset, admin.OSMGeoAdmin)
 admin.site.register(AssetVersion)
 admin.site.register(Translation)
+admin.site.register(MediaFile)
+admin.site.register(Upload)
@@ -0,0 +1,180 @@
+"""
+Catalog of the images of an airport, used by the mobile app to keep a copy
+of them on the device.
+
+Every image has one entry, scoped to its airport (asset type icons are
+shared by all of them). Changing an image replaces its entry with a new
+one and removing it leaves a deleted entry behind, so the entries with an
+id above the last one a device has seen are exactly the changes since it
+last synced. For that the ids a device reads, those of its airport and
+the shared ones, must become visible in order: entries are written holding
+a lock until their transaction commits, otherwise an entry committed after
+one with a higher id would be skipped. Each airport has its own lock, so
+airports don't wait for each other, while writing shared entries waits
+for all of them.
+"""
+
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+# Key of the advisory locks serializing the writes of catalog entries,
+# paired with the airport id, or with 0 for the shared entries
+ENTRIES_LOCK = 0x4d454449
+SHARED_ENTRIES = 0
+
+# How an image source is turned into catalog entries: the model holding
+# the image, the relations needed to describe it and a function returning
+# (airport id, image id, title, file) for an instance.
+Source = namedtuple('Source', ['model', 'select_related', 'describe'])
+
+SOURCES = {
+    'airport': Source(
+        'airport.Airport', [],
+        lambda airport: (
+            airport.id, 'airport_' + airport.code, airport.name,
+            airport.logo)),
+    'assets': Source(
+        'airport.AssetImage', ['asset'],
+        lambda image: (
+            image.asset.airport_id, 'asset_image_' + str(image.id),
+            image.asset.name, image.image)),
+    'asset_types': Source(
+        'airport.AssetType', [],
+        lambda asset_type: (
+            None, 'asset_type_' + str(asset_type.id), asset_type.name,
+            asset_type.icon)),
+    'userProfile': Source(
+        'users.AerosimpleUser', ['user'],
+        lambda user: (
+            user.airport_id, 'user_' + user.user.username, user.first_name,
+            user.image)),
+    'workOrder': Source(
+        'work_orders.WorkOrderImage', ['work_order__form__form'],
+        lambda image: (
+            image.work_order.form.form.airport_id,
+            'workorder_' + str(image.id),
+            image.work_order.category + ' - ' + image.work_order.subcategory,
+            image.image)),
+}
+
+
+def _entry_model(get_model):
+    return get_model('airport', 'MediaCatalogEntry')
+
+
+def _lock_entries(airport_ids):
+    """
+    Waits for the transactions writing entries of the given airports (None
+    for the shared entries) to commit, and keeps the others waiting until
+    the current one commits. Ids are so committed in the order they are
+    given within an airport and the shared entries. Must run inside a
+    transaction.
+    """
+    with connection.cursor() as cursor:
+        if None in airport_ids:
+            # Every airport sees the shared entries
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, %s)',
+                [ENTRIES_LOCK, SHARED_ENTRIES])
+            return
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock_shared(%s, %s)',
+            [ENTRIES_LOCK, SHARED_ENTRIES])
+        # Always in the same order, so writers can't deadlock
+        for airport_id in sorted(airport_ids):
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, %s)',
+                [ENTRIES_LOCK, airport_id])
+
+
+def _new_entry(Entry, source_type, instance):
+    airport_id, image_id, title, image = \
+        SOURCES[source_type].describe(instance)
+    if not image or (airport_id is None and source_type != 'asset_types'):
+        return None
+    return Entry(
+        airport_id=airport_id, source_type=source_type,
+        object_id=instance.pk, image_id=image_id, title=title or '',
+        file=image.name)
+
+
+def refresh(source_type, instance, get_model=None):
+    """ Updates the entry of an image after its instance was saved. """
+    if get_model is None:
+        from django.apps import apps
+        get_model = apps.get_model
+    Entry = _entry_model(get_model)
+    entry = _new_entry(Entry, source_type, instance)
+    current = Entry.objects.filter(
+        source_type=source_type, object_id=instance.pk, deleted=False
+    ).first()
+    if current is not None and entry is not None and all(
+            getattr(current, f) == getattr(entry, f)
+            for f in ('airport_id', 'image_id', 'title', 'file')):
+        return
+    _replace(Entry, source_type, instance.pk, current, entry)
+
+
+def remove(source_type, pk):
+    """ Leaves a deleted entry for an image whose instance was deleted. """
+    from django.apps import apps
+    Entry = _entry_model(apps.get_model)
+    current = Entry.objects.filter(
+        source_type=source_type, object_id=pk, deleted=False).first()
+    if current is not None:
+        _replace(Entry, source_type, pk, current, None)
+
+
+def _replace(Entry, source_type, pk, current, entry):
+    # Entries are never updated, a change always gets a new id. A previous
+    # deleted entry of an image id is only dropped when a newer entry of
+    # the same image id replaces it.
+    new_entries = []
+    if current is not None and (
+            entry is None or entry.image_id != current.image_id
+            or entry.airport_id != current.airport_id):
+        new_entries.append(Entry(
+            airport_id=current.airport_id, source_type=source_type,
+            object_id=pk, image_id=current.image_id, deleted=True))
+    if entry is not None:
+        new_entries.append(entry)
+    with transaction.atomic():
+        _lock_entries({e.airport_id for e in new_entries + [current]
+                       if e is not None})
+        if current is not None:
+            current.delete()
+        Entry.objects.filter(
+            source_type=source_type, object_id=pk, deleted=True,
+            image_id__in=[e.image_id for e in new_entries]).delete()
+        for new_entry in new_entries:
+            new_entry.save()
+
+
+def rebuild(get_model):
+    """
+    Creates the entries of all the existing images. Takes the get_model
+    of an app registry.
+    """
+    Entry = _entry_model(get_model)
+    with transaction.atomic():
+        # Locking the shared entries holds off every writer
+        _lock_entries({None})
+        Entry.objects.all().delete()
+        for source_type, source in SOURCES.items():
+            instances = get_model(*source.model.split('.')).objects.all()
+            entries = []
+            for instance in instances.select_related(*source.select_related):
+                entry = _new_entry(Entry, source_type, instance)
+                if entry is not None:
+                    entries.append(entry)
+            Entry.objects.bulk_create(entries, batch_size=1000)
+
+
+def airport_entries(airport_id):
+    """ Entries visible to an airport, in the order they were made. """
+    from airport.models import MediaCatalogEntry
+    return MediaCatalogEntry.objects.filter(
+        Q(airport_id=airport_id) | Q(airport__isnull=True)
+    ).order_by('id')
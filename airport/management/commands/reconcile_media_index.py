@@ -0,0 +1,20 @@
+import boto3
+from botocore.client import Config
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from airport import media
+
+
+class Command(BaseCommand):
+    help = ("Syncs the media index with the content of the bucket. Run on "
+            "deploy, so the index is filled before the first listing.")
+
+    def handle(self, *args, **options):
+        client = boto3.client('s3', config=Config(signature_version='s3v4'))
+        for prefix in settings.MEDIA_INDEX_PREFIXES:
+            added, removed = media.reconcile(
+                client, settings.AWS_STORAGE_BUCKET_NAME, prefix)
+            self.stdout.write("'{}': {} added, {} removed".format(
+                prefix, added, removed))
+        self.stdout.write(self.style.SUCCESS("Media index reconciled"))
@@ -0,0 +1,129 @@
+"""
+Index of the objects stored in the media bucket.
+
+Listing the bucket is slow and list_objects returns at most 1000 keys per
+call, so the keys are kept in the MediaFile table instead. The media
+storage records every upload and delete, and reconcile() walks the whole
+bucket page by page to pick up the objects written by other means (app
+deploys, the static images upload) and to drop the ones removed. The
+'reconcile_media_index' command fills the index on deploy, before the
+first periodic run.
+"""
+
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('backend')
+
+# Listings are cached per prefix until the index changes, which increases
+# the version of all of them. The timeout only bounds how long a listing
+# read during a concurrent change can stay stale.
+LISTING_VERSION_KEY = 'media-index:version'
+LISTING_TIMEOUT = 60 * 10
+
+
+def listing_key(prefix):
+    # A version lost from the cache starts over from the current time, so
+    # it never matches the listings cached under an older one.
+    version = cache.get_or_set(
+        LISTING_VERSION_KEY, lambda: int(time.time()), None)
+    return 'media-index:listing:{}:{}'.format(version, prefix)
+
+
+def _invalidate():
+    try:
+        cache.incr(LISTING_VERSION_KEY)
+    except ValueError:
+        # No listing was cached
+        pass
+
+
+def record_upload(key, size=0, last_modified=None):
+    from airport.models import MediaFile
+    MediaFile.objects.update_or_create(key=key, defaults={
+        'size': size,
+        'last_modified': last_modified or timezone.now(),
+        'synced_date': timezone.now(),
+    })
+    transaction.on_commit(_invalidate)
+
+
+def record_delete(key):
+    from airport.models import MediaFile
+    MediaFile.objects.filter(key=key).delete()
+    transaction.on_commit(_invalidate)
+
+
+def list_keys(prefix):
+    """ Keys of the indexed objects under the prefix, sorted. """
+    from airport.models import MediaFile
+    key = listing_key(prefix)
+    keys = cache.get(key)
+    if keys is None:
+        keys = list(MediaFile.objects.filter(
+            key__startswith=prefix
+        ).order_by('key').values_list('key', flat=True))
+        cache.set(key, keys, LISTING_TIMEOUT)
+    return keys
+
+
+def reconcile(client, bucket, prefix, page_size=1000):
+    """
+    Makes the index of the prefix match the bucket. Returns the number of
+    keys added and removed.
+    """
+    from airport.models import MediaFile
+    started = timezone.now()
+    added = 0
+    paginator = client.get_paginator('list_objects_v2')
+    pages = paginator.paginate(
+        Bucket=bucket, Prefix=prefix,
+        PaginationConfig={'PageSize': page_size})
+    for page in pages:
+        objects = {o['Key']: o for o in page.get('Contents', [])}
+        if not objects:
+            continue
+        with transaction.atomic():
+            indexed = dict(MediaFile.objects.filter(
+                key__in=list(objects)).values_list('key', 'size'))
+            MediaFile.objects.filter(
+                key__in=list(indexed)).update(synced_date=started)
+            for key, size in indexed.items():
+                if objects[key]['Size'] != size:
+                    MediaFile.objects.filter(key=key).update(
+                        size=objects[key]['Size'],
+                        last_modified=objects[key]['LastModified'])
+            new_files = [
+                MediaFile(key=key, size=o['Size'],
+                          last_modified=o['LastModified'],
+                          synced_date=started)
+                for key, o in objects.items() if key not in indexed
+            ]
+            try:
+                with transaction.atomic():
+                    MediaFile.objects.bulk_create(new_files)
+            except IntegrityError:
+                # Some were uploaded meanwhile and already indexed
+                for media_file in new_files:
+                    _, created = MediaFile.objects.get_or_create(
+                        key=media_file.key, defaults={
+                            'size': media_file.size,
+                            'last_modified': media_file.last_modified,
+                            'synced_date': started})
+                    added += created
+            else:
+                added += len(new_files)
+
+    # Whatever was not seen in the walk nor uploaded since it started is
+    # no longer in the bucket.
+    removed, _ = MediaFile.objects.filter(
+        key__startswith=prefix, synced_date__lt=started).delete()
+    if added or removed:
+        _invalidate()
+    logger.info("Media index of '{}' reconciled: {} added, {} removed".format(
+        prefix, added, removed))
+    return added, removed
@@ -0,0 +1,23 @@
+# Generated by Django 2.1.3 on 2019-12-05 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0041_auto_20191128_1057'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=512, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('last_modified', models.DateTimeField(blank=True, null=True)),
+                ('synced_date', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 2.1.3 on 2019-12-05 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The images of every source as (model, related, function returning the
+# airport id, image id, title and file of an instance), as the catalog
+# described them when this migration was written.
+SOURCES = {
+    'airport': (
+        ('airport', 'Airport'), [],
+        lambda airport: (
+            airport.id, 'airport_' + airport.code, airport.name,
+            airport.logo)),
+    'assets': (
+        ('airport', 'AssetImage'), ['asset'],
+        lambda image: (
+            image.asset.airport_id, 'asset_image_' + str(image.id),
+            image.asset.name, image.image)),
+    'asset_types': (
+        ('airport', 'AssetType'), [],
+        lambda asset_type: (
+            None, 'asset_type_' + str(asset_type.id), asset_type.name,
+            asset_type.icon)),
+    'userProfile': (
+        ('users', 'AerosimpleUser'), ['user'],
+        lambda user: (
+            user.airport_id, 'user_' + user.user.username, user.first_name,
+            user.image)),
+    'workOrder': (
+        ('work_orders', 'WorkOrderImage'), ['work_order__form__form'],
+        lambda image: (
+            image.work_order.form.form.airport_id,
+            'workorder_' + str(image.id),
+            image.work_order.category + ' - ' + image.work_order.subcategory,
+            image.image)),
+}
+
+
+def build_catalog(apps, schema_editor):
+    Entry = apps.get_model('airport', 'MediaCatalogEntry')
+    for source_type, (model, related, describe) in SOURCES.items():
+        entries = []
+        for instance in apps.get_model(*model).objects.select_related(
+                *related):
+            airport_id, image_id, title, image = describe(instance)
+            if not image or (
+                    airport_id is None and source_type != 'asset_types'):
+                continue
+            entries.append(Entry(
+                airport_id=airport_id, source_type=source_type,
+                object_id=instance.pk, image_id=image_id, title=title or '',
+                file=image.name))
+        Entry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0042_mediafile'),
+        ('users', '0017_aerosimpleuser_notification_preferences'),
+        ('work_orders', '0009_workorder_zoom_level'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaCatalogEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_type', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('image_id', models.CharField(max_length=200)),
+                ('title', models.CharField(blank=True, default='', max_length=200)),
+                ('file', models.CharField(blank=True, default='', max_length=200)),
+                ('deleted', models.BooleanField(default=False)),
+                ('airport', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='media_catalog', to='airport.Airport')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='mediacatalogentry',
+            index_together={('source_type', 'object_id')},
+        ),
+        migrations.RunPython(build_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.1.3 on 2019-12-05 17:45
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+# Status of the published versions
+PUBLISHED = 1
+
+
+def update_version_pointers(form_model, version_model):
+    versions = version_model.objects.filter(
+        form_id=OuterRef('pk')).order_by('-number', '-id').values('id')
+    form_model.objects.update(
+        published_version=Subquery(
+            versions.filter(status=PUBLISHED)[:1]),
+        latest_version=Subquery(versions[:1]))
+
+
+def set_version_pointers(apps, schema_editor):
+    update_version_pointers(
+        apps.get_model('airport', 'AssetForm'),
+        apps.get_model('airport', 'AssetVersion'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0043_mediacatalogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetform',
+            name='latest_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='airport.AssetVersion'),
+        ),
+        migrations.AddField(
+            model_name='assetform',
+            name='published_version',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='airport.AssetVersion'),
+        ),
+        migrations.RunPython(
+            set_version_pointers, migrations.RunPython.noop),
+    ]
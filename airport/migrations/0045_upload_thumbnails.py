@@ -0,0 +1,35 @@
+# Generated by Django 2.1.3 on 2019-12-05 19:05
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_aerosimpleuser_notification_preferences'),
+        ('airport', '0044_form_version_pointers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField(default=0)),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Confirmed')], default=0)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('confirmed_date', models.DateTimeField(blank=True, null=True)),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='airport.Airport')),
+                ('uploaded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='users.AerosimpleUser')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='assetimage',
+            name='thumbnails',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.contrib.gis.db import models
 from django.core.exceptions import ValidationError
 from django.core.validators import MinLengthValidator
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.postgres.fields import JSONField
 from django.dispatch import receiver
 from forms.utils import PUBLISHED
@@ -9,10 +9,11 @@ from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import Group, User, Permission
 from django.conf import settings
 
+from airport import catalog, translations, uploads
 from airport.validators import logo_validator
-from work_orders.models import WorkOrderForm
+from work_orders.models import WorkOrder, WorkOrderForm, WorkOrderImage
 from operations_log.models import LogForm, LogVersion, LogType, LogSubType
-from forms.models import Form, Version, Answer
+from forms.models import Form, Version, Answer, version_pointer
 from users.models import Role, AerosimpleUser
 
 
@@ -299,6 +300,8 @@ class AssetForm(Form):
     )
     category = models.ForeignKey(
         AssetCategory, related_name="forms", on_delete=models.CASCADE)
+    published_version = version_pointer('AssetVersion')
+    latest_version = version_pointer('AssetVersion')
 
 
 class AssetVersion(Version):
@@ -309,11 +312,9 @@ class AssetVersion(Version):
         AssetForm, related_name="versions", on_delete=models.CASCADE)
 
     def save(self, *args, **kwargs):
-        translations = Translation.objects.filter(airport=self.form.airport)
-
-        for tr in translations:
-            tr.updateTranslationMap(self.title, self.schema['fields'])
         super(AssetVersion, self).save(*args, **kwargs)
+        translations.add_keys(
+            self.form.airport_id, translations.schema_keys(self.schema['fields']))
 
 
 class Asset(Answer):
@@ -364,6 +365,8 @@ class AssetImage(models.Model):
     asset = models.ForeignKey(
           Asset, related_name="images", on_delete=models.CASCADE)
     image = models.ImageField(upload_to='assets/', blank=True, null=True)
+    # names of the thumbnails by size, see airport.uploads
+    thumbnails = JSONField(default=dict, blank=True)
 
 # ******************************************************************
 # ****************** MODELS FOR TRANSLATIONS  **********************
@@ -381,49 +384,136 @@ class Translation(models.Model):
         return "{} - {}".format(self.airport, self.language)
 
     def save(self, *args, **kwargs):
-        from inspections.models import Inspection
-        from work_orders.models import WorkOrderSchema
-        from operations_log.models import LogVersion
-
         if self.pk is None:
-            result = {}
-            all_versions = Inspection.objects.filter(form__airport=self.airport)
-            for v in all_versions:
-                result[v.title] = ''
-                for f in v.schema['fields']:
-                    if f['type'] == 'inspection':
-                        result[f['title']] = ''
-                        for i in f['checklist']:
-                            result[i['value']] = ''
-                    else:
-                        result[f['title']] = ''
-
-            all_work_orders = WorkOrderSchema.objects.filter(form__airport=self.airport)
-            for wo in all_work_orders:
-                for f in wo.schema['fields']:
-                    result[f['title']] = ''
-
-            all_assets = AssetVersion.objects.filter(form__airport=self.airport)
-            for asset in all_assets:
-                for f in asset.schema['fields']:
-                    result[f['title']] = ''
-
-            all_ops_log = LogVersion.objects.filter(form__airport=self.airport)
-            for op in all_ops_log:
-                for f in op.schema['fields']:
-                    result[f['title']] = ''
-
-            self.translation_map = result
+            self.translation_map = dict.fromkeys(
+                translations.airport_keys(self.airport_id), '')
         super(Translation, self).save(*args, **kwargs)
 
-    def updateTranslationMap(self, title, fields):
-        if title not in self.translation_map:
-            self.translation_map[title] = ''
 
-        for f in fields:
-            if f['title'] not in self.translation_map:
-                self.translation_map[f['title']] = ''
+class MediaFile(models.Model):
+    """
+    Manifest of the objects stored in the media bucket, so listing them
+    doesn't need to go to S3. Kept up to date by the media storage and
+    reconciled periodically with the bucket.
+    """
+    key = models.CharField(max_length=512, unique=True)
+    size = models.BigIntegerField(default=0)
+    last_modified = models.DateTimeField(null=True, blank=True)
+    # last time the object was seen in the bucket or uploaded
+    synced_date = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+# Upload status constants
+PENDING = 0
+CONFIRMED = 1
+
+UPLOAD_STATUS = (
+    (PENDING, _("Pending")),
+    (CONFIRMED, _("Confirmed")),
+)
+
+
+class Upload(models.Model):
+    """
+    Photo uploaded by an app straight to the media bucket, named as the
+    file of the media storage it becomes. See airport.uploads.
+    """
+    airport = models.ForeignKey(
+        Airport, related_name="uploads", on_delete=models.CASCADE)
+    uploaded_by = models.ForeignKey(
+        AerosimpleUser, related_name="uploads", null=True,
+        on_delete=models.SET_NULL)
+    name = models.CharField(max_length=255, unique=True)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField(default=0)
+    status = models.IntegerField(choices=UPLOAD_STATUS, default=PENDING)
+    created_date = models.DateTimeField(auto_now_add=True)
+    confirmed_date = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return self.name
+
+
+class MediaCatalogEntry(models.Model):
+    """
+    Image of an airport as listed to the mobile app, see airport.catalog.
+    The id works as the sync cursor: changes always create new entries.
+    """
+    # Without a constraint so the images deleted along with an airport can
+    # still leave their deleted entries, the airport removes them all last.
+    airport = models.ForeignKey(
+        Airport, related_name="media_catalog", on_delete=models.DO_NOTHING,
+        db_constraint=False, blank=True, null=True)
+    source_type = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    image_id = models.CharField(max_length=200)
+    title = models.CharField(max_length=200, blank=True, default='')
+    file = models.CharField(max_length=200, blank=True, default='')
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        index_together = (('source_type', 'object_id'),)
+
+
+@receiver(post_save, sender=Airport, dispatch_uid="catalog_airport")
+@receiver(post_save, sender=AssetImage, dispatch_uid="catalog_asset_image")
+@receiver(post_save, sender=AssetType, dispatch_uid="catalog_asset_type")
+@receiver(post_save, sender=AerosimpleUser, dispatch_uid="catalog_user")
+@receiver(post_save, sender=WorkOrderImage,
+          dispatch_uid="catalog_work_order_image")
+def update_catalog_entry(sender, instance, raw=False, **kwargs):
+    if not raw:
+        catalog.refresh(CATALOG_SOURCE_TYPES[sender], instance)
+
+
+@receiver(post_delete, sender=AssetImage, dispatch_uid="catalog_asset_image")
+@receiver(post_delete, sender=AssetType, dispatch_uid="catalog_asset_type")
+@receiver(post_delete, sender=AerosimpleUser, dispatch_uid="catalog_user")
+@receiver(post_delete, sender=WorkOrderImage,
+          dispatch_uid="catalog_work_order_image")
+def remove_catalog_entry(sender, instance, **kwargs):
+    catalog.remove(CATALOG_SOURCE_TYPES[sender], instance.pk)
+
+
+@receiver(post_save, sender=Translation, dispatch_uid="translation_bundle")
+@receiver(post_delete, sender=Translation, dispatch_uid="translation_bundle")
+def invalidate_translation_bundle(sender, instance, **kwargs):
+    translations.invalidate_bundle(instance.airport_id)
+
+
+@receiver(post_save, sender=AssetImage, dispatch_uid="asset_image_thumbnails")
+def asset_image_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        uploads.schedule_thumbnails(instance)
+
+
+@receiver(post_delete, sender=Airport, dispatch_uid="catalog_airport")
+def remove_airport_catalog(sender, instance, **kwargs):
+    MediaCatalogEntry.objects.filter(airport_id=instance.pk).delete()
+
+
+# The titles of asset and work order images come from their parents
+@receiver(post_save, sender=Asset, dispatch_uid="catalog_asset")
+def update_asset_images_entries(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for image in instance.images.all():
+            catalog.refresh('assets', image)
+
+
+@receiver(post_save, sender=WorkOrder, dispatch_uid="catalog_work_order")
+def update_work_order_images_entries(sender, instance, raw=False, **kwargs):
+    if not raw:
+        for image in instance.images.all():
+            catalog.refresh('workOrder', image)
 
-        self.save()
-        return self
 
+CATALOG_SOURCE_TYPES = {
+    Airport: 'airport',
+    AssetImage: 'assets',
+    AssetType: 'asset_types',
+    AerosimpleUser: 'userProfile',
+    WorkOrderImage: 'workOrder',
+}
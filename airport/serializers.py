@@ -6,9 +6,11 @@ from rest_framework.serializers import (SerializerMethodField, ValidationError,
 
 from pulpoforms.forms import Form as PulpoForm
 
-from forms.utils import PUBLISHED
+from forms.utils import PUBLISHED, get_compiled_form
 from airport.models import SurfaceType, Airport, SurfaceShape, AssetType, \
     Asset, AssetVersion, AssetImage, Translation, AssetForm, AssetCategory
+from airport.uploads import ThumbnailImageField, ThumbnailsField, \
+    UploadedImageField
 
 
 class SurfaceTypeSerializer(serializers.ModelSerializer):
@@ -91,10 +93,16 @@ class AssetTypeSerializer(serializers.ModelSerializer):
 
 
 class AssetImageSerializer(serializers.ModelSerializer):
+    image = UploadedImageField(required=False, allow_null=True)
+    thumbnails = ThumbnailsField()
 
     class Meta:
         model = AssetImage
-        fields = ('id', 'asset', 'image')
+        fields = ('id', 'asset', 'image', 'thumbnails')
+
+
+class AssetImageListSerializer(AssetImageSerializer):
+    image = ThumbnailImageField()
 
 
 class AssetSerializer(serializers.ModelSerializer):
@@ -115,7 +123,7 @@ class AssetSerializer(serializers.ModelSerializer):
             form__category=data['asset_type'].category,
             status=PUBLISHED)
 
-        form = PulpoForm(published_version.schema)
+        form = get_compiled_form(published_version)
         answers = data['response']
         result = form.check_answers(answers)
 
@@ -141,7 +149,7 @@ class AssetCreateSerializer(serializers.ModelSerializer):
             form__category=data['asset_type'].category,
             status=PUBLISHED)
 
-        form = PulpoForm(published_version.schema)
+        form = get_compiled_form(published_version)
         answers = data['response']
         result = form.check_answers(answers)
 
@@ -159,7 +167,7 @@ class AssetCreateSerializer(serializers.ModelSerializer):
 
 class AssetListSerializer(serializers.ModelSerializer):
     asset_type = AssetTypeSerializer()
-    images = AssetImageSerializer(many=True)
+    images = AssetImageListSerializer(many=True)
     geometry = SerializerMethodField()
 
     class Meta:
@@ -240,7 +248,7 @@ class MobileSurfaceTypeSerializer(serializers.ModelSerializer):
 
 class MobileAirportAssetSerializer(serializers.ModelSerializer):
     asset_type = MobileAssetTypeSerializer()
-    images = AssetImageSerializer(many=True)
+    images = AssetImageListSerializer(many=True)
     geometry = SerializerMethodField()
 
     class Meta:
@@ -0,0 +1,28 @@
+import boto3
+from botocore.client import Config
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+
+from airport import media, uploads
+
+
+@shared_task(name='reconcile_media_index')
+def reconcile_media_index():
+    """ Syncs the media index with the content of the bucket. """
+    client = boto3.client('s3', config=Config(signature_version='s3v4'))
+    for prefix in settings.MEDIA_INDEX_PREFIXES:
+        media.reconcile(client, settings.AWS_STORAGE_BUCKET_NAME, prefix)
+
+
+@shared_task(name='generate_thumbnails')
+def generate_thumbnails(label, pk):
+    """ Makes the thumbnails of the photo of an instance of an image model. """
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return
+    thumbnails = uploads.make_thumbnails(instance.image.name)
+    # The photo may have been replaced meanwhile, its own task handles it
+    model.objects.filter(pk=pk, image=instance.image.name).update(
+        thumbnails=thumbnails)
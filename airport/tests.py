@@ -1,8 +1,16 @@
+import json
+
 from rest_framework.test import APITestCase
 from users.factories import AerosimpleUserFactory, GroupFactory, RoleFactory
 from rest_framework.test import APIClient, APIRequestFactory
 from users.models import PermissionConfig, AerosimpleUser
 from django.contrib.auth.models import Permission
+from django.utils import timezone
+from django.core.cache import cache
+from rest_framework.serializers import ValidationError
+from airport import media, translations, uploads
+from airport.models import AssetCategory, AssetType, MediaFile, \
+    Translation, Upload, CONFIRMED
 
 
 class FormTestCase(APITestCase):
@@ -86,3 +94,171 @@ class FormTestCase(APITestCase):
         self.apiClient.force_authenticate(user=user.user)
         response = self.apiClient.post('/api/inspections/', data, format='json')
         self.assertEqual(response.status_code, 403)
+
+
+class MediaIndexTestCase(APITestCase):
+
+    class Bucket:
+        """ Stands for the S3 client, listing the given objects. """
+
+        def __init__(self, keys):
+            self.keys = keys
+
+        def get_paginator(self, operation):
+            return self
+
+        def paginate(self, Bucket, Prefix, PaginationConfig):
+            size = PaginationConfig['PageSize']
+            keys = sorted(k for k in self.keys if k.startswith(Prefix))
+            for start in range(0, len(keys), size):
+                yield {'Contents': [
+                    {'Key': k, 'Size': 1, 'LastModified': timezone.now()}
+                    for k in keys[start:start + size]]}
+
+    def test_reconcile(self):
+        media.record_upload('media/remarks/old.png', 1)
+        bucket = self.Bucket(
+            ['media/icon-{}.png'.format(i) for i in range(5)]
+            + ['static/media/icon.png'])
+
+        self.assertEqual(
+            media.reconcile(bucket, 'bucket', 'media/', page_size=2), (5, 1))
+        self.assertEqual(
+            media.list_keys('media/'),
+            ['media/icon-{}.png'.format(i) for i in range(5)])
+
+        bucket.keys.remove('media/icon-0.png')
+        self.assertEqual(
+            media.reconcile(bucket, 'bucket', 'media/', page_size=2), (0, 1))
+        self.assertEqual(len(media.list_keys('media/')), 4)
+        self.assertEqual(MediaFile.objects.count(), 4)
+
+    def test_list_keys(self):
+        cache.clear()
+        media.record_upload('media/icon.png', 1)
+        media.record_upload('static/media/icon.png', 1)
+        self.assertEqual(media.list_keys('media/'), ['media/icon.png'])
+        self.assertEqual(
+            media.list_keys('static/'), ['static/media/icon.png'])
+
+        # Every listing is dropped when the index changes
+        MediaFile.objects.all().delete()
+        self.assertEqual(media.list_keys('media/'), ['media/icon.png'])
+        media._invalidate()
+        self.assertEqual(media.list_keys('media/'), [])
+        self.assertEqual(media.list_keys('static/'), [])
+
+
+class MediaCatalogTestCase(APITestCase):
+    def setUp(self):
+        self.aerouser = AerosimpleUserFactory()
+        self.apiClient = APIClient()
+        self.apiClient.force_authenticate(user=self.aerouser.user)
+
+    def get_images(self, **params):
+        response = self.apiClient.get('/api/mobile/images/', params)
+        return response, json.loads(b''.join(response.streaming_content))
+
+    def test_delta_sync(self):
+        self.aerouser.image = 'profile/first.png'
+        self.aerouser.save()
+
+        response, data = self.get_images()
+        user_id = 'user_' + self.aerouser.user.username
+        self.assertIn(user_id, [i['id'] for i in data['items']])
+        self.assertFalse(data['more'])
+
+        response, delta = self.get_images(since=data['cursor'])
+        self.assertEqual((delta['items'], delta['deleted']), ([], []))
+        response = self.apiClient.get(
+            '/api/mobile/images/', {'since': data['cursor']},
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.aerouser.image = 'profile/second.png'
+        self.aerouser.save()
+        _, delta = self.get_images(since=data['cursor'])
+        self.assertEqual(
+            [(i['id'], i['path'].endswith('second.png'))
+             for i in delta['items']], [(user_id, True)])
+        self.assertEqual(delta['deleted'], [])
+
+        self.aerouser.image = None
+        self.aerouser.save()
+        _, delta = self.get_images(since=delta['cursor'])
+        self.assertEqual((delta['items'], delta['deleted']), ([], [user_id]))
+
+    def test_shared_entries(self):
+        _, data = self.get_images()
+        category = AssetCategory.objects.create(name='Lights')
+        asset_type = AssetType.objects.create(
+            name='Edge light', icon='asset_types/edge.png', category=category)
+        self.aerouser.image = 'profile/first.png'
+        self.aerouser.save()
+
+        _, delta = self.get_images(since=data['cursor'])
+        self.assertEqual(
+            [i['id'] for i in delta['items']],
+            ['asset_type_' + str(asset_type.id),
+             'user_' + self.aerouser.user.username])
+
+
+class TranslationsTestCase(APITestCase):
+    def setUp(self):
+        self.aerouser = AerosimpleUserFactory()
+        self.apiClient = APIClient()
+        self.apiClient.force_authenticate(user=self.aerouser.user)
+
+    def test_add_keys(self):
+        airport_id = self.aerouser.airport_id
+        translation = Translation.objects.create(
+            airport_id=airport_id, language='es')
+        Translation.objects.filter(pk=translation.pk).update(
+            translation_map={'Hello': 'Hola'})
+        cache.delete(translations.bundle_key(airport_id))
+
+        # add_keys defers this to the commit, which tests never reach
+        translations._add_keys(airport_id, ['Hello', 'World'])
+        translation.refresh_from_db()
+        self.assertEqual(
+            translation.translation_map, {'Hello': 'Hola', 'World': ''})
+
+        response = self.apiClient.get('/api/airports/translations/')
+        self.assertEqual(
+            json.loads(response.content)['es'], translation.translation_map)
+        response = self.apiClient.get(
+            '/api/airports/translations/',
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class UploadsTestCase(APITestCase):
+    def setUp(self):
+        self.aerouser = AerosimpleUserFactory()
+
+    def test_uploaded_image_field(self):
+        request = APIRequestFactory().post('/api/assets/')
+        request.user = self.aerouser.user
+        field = uploads.UploadedImageField()
+        field._context = {'request': request}
+
+        upload = Upload.objects.create(
+            airport=self.aerouser.airport, uploaded_by=self.aerouser,
+            name='assets/photo.jpg', content_type='image/jpeg')
+        with self.assertRaises(ValidationError):
+            field.run_validation(upload.name)
+
+        upload.status = CONFIRMED
+        upload.save()
+        self.assertEqual(field.run_validation(upload.name), upload.name)
+        with self.assertRaises(ValidationError):
+            field.run_validation('assets/other.jpg')
+
+    def test_thumbnail_urls(self):
+        self.assertEqual(uploads.thumbnail_urls({}), {})
+        urls = uploads.thumbnail_urls({
+            'source': 'assets/photo.jpg',
+            'small': uploads.thumbnail_name('assets/photo.jpg', 'small')})
+        self.assertEqual(list(urls), ['small'])
+        self.assertTrue(urls['small'].endswith(
+            'thumbnails/small/assets/photo.jpg'))
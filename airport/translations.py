@@ -0,0 +1,111 @@
+"""
+Translation maps of the airports.
+
+Every language of an airport maps the texts shown by its forms to their
+translation, an empty one until somebody translates it. Saving a schema
+adds the texts that are new to all the languages of the airport with a
+single UPDATE once the transaction commits, and the maps are served to the
+apps as one cached bundle.
+"""
+
+import hashlib
+import json
+
+from django.contrib.postgres.fields import JSONField
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Func, Value
+from django.db.models.functions import Cast, Coalesce
+
+BUNDLE_TIMEOUT = 60 * 60 * 24
+
+
+def bundle_key(airport_id):
+    return 'translations:{}'.format(airport_id)
+
+
+def invalidate_bundle(airport_id):
+    transaction.on_commit(lambda: cache.delete(bundle_key(airport_id)))
+
+
+def schema_keys(fields, title=None, checklists=False):
+    """
+    Texts of a schema to translate: its title, the titles of its fields
+    and, for inspections, the items of their checklists.
+    """
+    keys = {title} if title else set()
+    for field in fields:
+        keys.add(field['title'])
+        if checklists and field.get('type') == 'inspection':
+            keys.update(item['value'] for item in field['checklist'])
+    return keys
+
+
+class _MergeMaps(Func):
+    # Merging the map of a language last keeps the translations it has
+    template = '(%(expressions)s)'
+    arg_joiner = ' || '
+    output_field = JSONField()
+
+
+def _add_keys(airport_id, keys):
+    from airport.models import Translation
+    empty = Cast(Value('{}'), JSONField())
+    updated = Translation.objects.filter(airport_id=airport_id).exclude(
+        translation_map__has_keys=keys
+    ).update(translation_map=_MergeMaps(
+        Cast(Value(json.dumps(dict.fromkeys(keys, ''))), JSONField()),
+        Coalesce(F('translation_map'), empty)))
+    if updated:
+        cache.delete(bundle_key(airport_id))
+
+
+def add_keys(airport_id, keys):
+    """
+    Adds the keys missing from the languages of the airport once the
+    current transaction commits, leaving the existing ones untouched.
+    """
+    keys = sorted(k for k in keys if k)
+    if keys:
+        transaction.on_commit(lambda: _add_keys(airport_id, keys))
+
+
+def airport_keys(airport_id):
+    """ Texts of all the schemas of an airport, for a new language. """
+    from airport.models import AssetVersion
+    from inspections.models import Inspection
+    from operations_log.models import LogVersion
+    from work_orders.models import WorkOrderSchema
+
+    keys = set()
+    inspections = Inspection.objects.filter(
+        form__airport_id=airport_id).values_list('title', 'schema')
+    for title, schema in inspections.iterator():
+        keys |= schema_keys(schema['fields'], title, checklists=True)
+    for model in (WorkOrderSchema, AssetVersion, LogVersion):
+        schemas = model.objects.filter(
+            form__airport_id=airport_id).values_list('schema', flat=True)
+        for schema in schemas.iterator():
+            keys |= schema_keys(schema['fields'])
+    return keys
+
+
+def get_bundle(airport_id):
+    """
+    Maps of all the languages of the airport, with an ETag that changes
+    whenever any of them does.
+    """
+    from airport.models import Translation
+    key = bundle_key(airport_id)
+    bundle = cache.get(key)
+    if bundle is None:
+        maps = dict(Translation.objects.filter(
+            airport_id=airport_id).values_list('language', 'translation_map'))
+        content = json.dumps(maps, sort_keys=True)
+        bundle = {
+            'etag': '"{}"'.format(
+                hashlib.sha256(content.encode('utf-8')).hexdigest()),
+            'content': content,
+        }
+        cache.set(key, bundle, BUNDLE_TIMEOUT)
+    return bundle
@@ -0,0 +1,203 @@
+"""
+Photos uploaded by the apps straight to the media bucket.
+
+The apps ask for upload slots, each one a presigned POST for a new object
+of the media storage, send the files to S3 and confirm them. A confirmed
+upload is then attached to a remark, work order or asset by sending its
+name in place of the file, so the API never receives the photo itself.
+
+Every stored photo gets thumbnails of the sizes below, made by a worker
+once the photo is saved. Listings show them instead of the original.
+"""
+
+import io
+import os
+import uuid
+
+import boto3
+from botocore.client import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from rest_framework import serializers
+
+from airport import media
+from backend.utils import enqueue_task
+
+# Folders of the media storage the apps can upload photos to
+FOLDERS = ('remarks/', 'work_orders/', 'assets/')
+
+# Largest side in pixels of every thumbnail size
+THUMBNAIL_SIZES = {
+    'small': 160,
+    'medium': 640,
+}
+
+def get_client():
+    return boto3.client('s3', config=Config(signature_version='s3v4'))
+
+
+def object_key(name):
+    """ Key in the bucket of a file of the media storage. """
+    location = getattr(default_storage, 'location', '')
+    return '/'.join(p for p in (location, name) if p)
+
+
+def create_slots(airport, user, folder, files):
+    """
+    Creates an upload for each of the (filename, content type) pairs and
+    returns the presigned POST the app must send each file with.
+    """
+    from airport.models import Upload
+    client = get_client()
+    slots = []
+    for filename, content_type in files:
+        extension = os.path.splitext(filename or '')[1].lower()
+        upload = Upload.objects.create(
+            airport=airport, uploaded_by=user, content_type=content_type,
+            name='{}{}{}'.format(folder, uuid.uuid4().hex, extension))
+        post = client.generate_presigned_post(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=object_key(upload.name),
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, settings.MAX_UPLOAD_SIZE],
+            ],
+            ExpiresIn=settings.UPLOAD_URL_EXPIRY)
+        slots.append({
+            'id': upload.id,
+            'name': upload.name,
+            'url': post['url'],
+            'fields': post['fields'],
+        })
+    return slots
+
+
+def confirm(upload):
+    """
+    Marks an upload as confirmed once its object is in the bucket. Returns
+    False if the object was not uploaded.
+    """
+    from airport.models import CONFIRMED
+    try:
+        head = get_client().head_object(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=object_key(upload.name))
+    except ClientError:
+        return False
+    upload.size = head['ContentLength']
+    upload.status = CONFIRMED
+    upload.confirmed_date = timezone.now()
+    upload.save(update_fields=['size', 'status', 'confirmed_date'])
+    media.record_upload(
+        object_key(upload.name), upload.size, head.get('LastModified'))
+    return True
+
+
+class UploadedImageField(serializers.ImageField):
+    """
+    Image field also taking the name of a confirmed upload of the airport
+    of the user, which is stored without going through the API.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            return super().to_internal_value(data)
+
+        from airport.models import Upload, CONFIRMED
+        uploads = Upload.objects.filter(name=data, status=CONFIRMED)
+        request = self.context.get('request')
+        if request is not None:
+            uploads = uploads.filter(
+                airport_id=request.user.aerosimple_user.airport_id)
+        if not uploads.exists():
+            raise serializers.ValidationError(
+                "'{}' is not a confirmed upload".format(data))
+        return data
+
+
+class ThumbnailsField(serializers.Field):
+    """ URLs of the thumbnails of the photo, by size. """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return thumbnail_urls(value)
+
+
+class ThumbnailImageField(serializers.ImageField):
+    """
+    Image field for listings: shows the thumbnail of the photo once it was
+    made, and the photo itself until then.
+    """
+    size = 'medium'
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        thumbnails = getattr(value.instance, 'thumbnails', None) or {}
+        if not value or self.size not in thumbnails:
+            return super().to_representation(value)
+        url = default_storage.url(thumbnails[self.size])
+        request = self.context.get('request')
+        if request is not None and url.startswith('/'):
+            return request.build_absolute_uri(url)
+        return url
+
+
+def thumbnail_name(name, size):
+    return 'thumbnails/{}/{}.jpg'.format(size, os.path.splitext(name)[0])
+
+
+def thumbnail_urls(thumbnails):
+    """ URLs of the thumbnails of a photo, empty until they are made. """
+    return {
+        size: default_storage.url(thumbnails[size])
+        for size in THUMBNAIL_SIZES if size in (thumbnails or {})
+    }
+
+
+def make_thumbnails(name):
+    """
+    Stores the thumbnails of a photo of the media storage and returns
+    their names by size, plus the name of the photo as 'source'.
+    """
+    from PIL import Image
+
+    with default_storage.open(name) as original:
+        image = Image.open(original)
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    thumbnails = {'source': name}
+    for size, pixels in THUMBNAIL_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail((pixels, pixels), Image.LANCZOS)
+        content = io.BytesIO()
+        thumbnail.save(content, 'JPEG', quality=85)
+        thumb_name = thumbnail_name(name, size)
+        if default_storage.exists(thumb_name):
+            default_storage.delete(thumb_name)
+        thumbnails[size] = default_storage.save(
+            thumb_name, ContentFile(content.getvalue()))
+    return thumbnails
+
+
+def schedule_thumbnails(instance):
+    """
+    Makes the thumbnails of a saved photo once committed. Without them the
+    listings show the photo itself, so not reaching the broker doesn't
+    fail the save.
+    """
+    if not instance.image or instance.thumbnails.get('source') == \
+            instance.image.name:
+        return
+    enqueue_task('generate_thumbnails', instance._meta.label, instance.pk)
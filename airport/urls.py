@@ -3,7 +3,7 @@ from rest_framework import routers
 from airport.views import SurfaceTypeViewSet, AirportViewSet, \
   SurfaceShapeViewSet, AssetTypeViewSet, AssetViewSet, MobileAssetTypeViewSet, \
   MobileSurfaceTypeViewSet, MobileAirportAssetViewSet, MobileSurfaceShapeViewSet, \
-  AssetConfigurationViewSet
+  AssetConfigurationViewSet, UploadViewSet
 
 router = routers.SimpleRouter()
 router.register(r'surface_types', SurfaceTypeViewSet,
@@ -25,5 +25,6 @@ router.register(r'asset_configuration', AssetConfigurationViewSet, base_name='as
 
 router.register(r'mobile/asset_configuration', AssetConfigurationViewSet, base_name='mobile_asset_configuration')
 router.register(r'mobile/airports', AirportViewSet, base_name='mobile_airports')
+router.register(r'uploads', UploadViewSet, base_name='uploads')
 urlpatterns = [
 ]
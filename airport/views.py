@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
+from django.http import HttpResponse
 import logging
 import json
 import boto3
@@ -14,7 +15,7 @@ from backend.utils import status_json
 
 from airport.models import (SurfaceType, Airport, SurfaceShape, AssetType,
                             Asset, AssetForm, AssetImage, AssetVersion,
-                            Translation, AssetCategory)
+                            Translation, AssetCategory, Upload, PENDING)
 
 from airport.serializers import (SurfaceTypeSerializer, AirportSerializer, AirportDetailSerializer,
                                  SurfaceShapeSerializer, AssetSerializer,
@@ -31,6 +32,8 @@ from airport.permissions import CanEditAirportSettings, CanViewAirportSettings,
     CanViewSurfaceShapes, CanViewAssets, CanAddAssets, CanAddAirport
 
 from airport.utils import DynamoDbModuleUtility
+from airport.translations import get_bundle
+from airport import uploads
 
 from inspections.models import InspectionParent, Inspection
 
@@ -275,12 +278,15 @@ class AirportViewSet(mixins.RetrieveModelMixin,
     @action(detail=False, methods=['get'])
     def translations(self, request):
         if self.request.user:
-            translations = Translation.objects.filter(
-                airport=self.request.user.aerosimple_user.airport)
-            result = {}
-            for tr in translations:
-                result[tr.language] = tr.translation_map
-            return Response(result, status=status.HTTP_200_OK)
+            bundle = get_bundle(
+                self.request.user.aerosimple_user.airport_id)
+            if request.META.get('HTTP_IF_NONE_MATCH') == bundle['etag']:
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = HttpResponse(
+                    bundle['content'], content_type='application/json')
+            response['ETag'] = bundle['etag']
+            return response
 
         return Response(status=status.HTTP_401_UNAUTHORIZED)
     
@@ -416,7 +422,8 @@ class AssetViewSet(viewsets.ModelViewSet):
             with transaction.atomic():
                 for photo in photos:
                     serializer_photo = AssetImageSerializer(
-                        data={'asset': asset.instance.id, 'image': photo})
+                        data={'asset': asset.instance.id, 'image': photo},
+                        context={'request': request})
                     serializer_photo.is_valid(raise_exception=True)
                     serializer_photo.save()
         except ValidationError:
@@ -450,7 +457,8 @@ class AssetViewSet(viewsets.ModelViewSet):
                 with transaction.atomic():
                     for photo in photos:
                         serializer_photo = AssetImageSerializer(
-                            data={'asset': asset.id, 'image': photo})
+                            data={'asset': asset.id, 'image': photo},
+                            context={'request': request})
                         serializer_photo.is_valid(raise_exception=True)
                         serializer_photo.save()
             except ValidationError:
@@ -653,3 +661,50 @@ class AssetConfigurationViewSet(viewsets.ViewSet):
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated, CanViewAssets]
         return super(self.__class__, self).get_permissions()
+
+
+class UploadViewSet(viewsets.GenericViewSet):
+    """
+    Photos sent by the apps straight to the bucket.
+
+    POST /uploads/ with a 'folder' and a list of 'files', each with its
+    'name' and 'content_type', returns an upload slot per file. Once the
+    file is sent, POST /uploads/<id>/confirm/ and use the name of the
+    upload as the image of a remark, work order or asset.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Upload.objects.filter(
+            airport_id=self.request.user.aerosimple_user.airport_id)
+
+    def create(self, request):
+        folder = request.data.get('folder')
+        if folder not in uploads.FOLDERS:
+            return Response(
+                {'folder': ["Must be one of: {}".format(
+                    ', '.join(uploads.FOLDERS))]},
+                status=status.HTTP_400_BAD_REQUEST)
+        files = request.data.get('files')
+        if not isinstance(files, list) or not files or not all(
+                isinstance(f, dict) and str(f.get('content_type', ''))
+                .startswith('image/') for f in files):
+            return Response(
+                {'files': ["Must be a list of images with their "
+                           "'name' and 'content_type'"]},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user.aerosimple_user
+        slots = uploads.create_slots(
+            user.airport, user, folder,
+            [(f.get('name'), f['content_type']) for f in files])
+        return Response(slots, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        upload = self.get_object()
+        if upload.status == PENDING and not uploads.confirm(upload):
+            return Response(
+                {'upload': ["The file was not uploaded"]},
+                status=status.HTTP_400_BAD_REQUEST)
+        return Response({'id': upload.id, 'name': upload.name})
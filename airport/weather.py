@@ -0,0 +1,197 @@
+"""
+Weather observations lookup.
+
+Observations are stored in the DynamoDB weather table, one item per airport
+and hour, with ids like 'KJFK_2019_12_5_14'. A lookup asks for the most
+recent observation in a window of hours before a date: all the hour keys
+of the window are read with a single batch_get_item, and every hour is
+kept in the shared cache so the next lookups of the same airport don't go
+to DynamoDB at all.
+"""
+
+from datetime import timedelta
+import logging
+import threading
+import time
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('backend')
+
+MAX_HOURS = 24
+# An observation never changes once stored, but an hour without one may
+# still get it later, so misses are kept for a shorter time.
+HIT_TIMEOUT = 60 * 60 * 6
+MISS_TIMEOUT = 60 * 5
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.1
+# How long a worker waits for another one fetching the same keys before
+# fetching them itself. A fetch, retries included, takes well below it.
+LOAD_WAIT = 1.5
+# batch_get_item accepts up to 100 keys per request
+BATCH_SIZE = 100
+# The keys left unprocessed by a throttled batch_get_item are asked again
+# up to MAX_RETRIES times, waiting RETRY_WAIT * 2 ** retry seconds before.
+MAX_RETRIES = 4
+RETRY_WAIT = 0.05
+
+_MISSING = '__missing__'
+
+_client = None
+_client_lock = threading.Lock()
+_deserializer = TypeDeserializer()
+
+# Lookups being fetched by this process, to collapse identical requests
+# of concurrent threads in a single call.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def get_client():
+    """ boto3 clients are thread safe, so one per process is enough. """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client(
+                    'dynamodb', region_name=settings.AWS_DEFAULT_REGION)
+    return _client
+
+
+def get_table_name():
+    return settings.MAIN_APP_PREFIX + 'weather'
+
+
+def hour_key(icao_code, date):
+    return '{}_{}_{}_{}_{}'.format(
+        icao_code, date.year, date.month, date.day, date.hour)
+
+
+def window_keys(icao_code, date, hours=MAX_HOURS):
+    """ Hour keys to look up, from the most recent to the oldest. """
+    return [hour_key(icao_code, date - timedelta(hours=diff - 1))
+            for diff in range(hours)]
+
+
+def cache_key(key):
+    return 'weather:{}'.format(key)
+
+
+def fetch_items(keys):
+    """
+    Reads the given hour keys from DynamoDB with batch_get_item. Returns a
+    dictionary with the items found and the set of keys still unprocessed
+    after the retries, which can't be told missing.
+    """
+    table = get_table_name()
+    items = {}
+    unprocessed = set()
+    for start in range(0, len(keys), BATCH_SIZE):
+        batch = keys[start:start + BATCH_SIZE]
+        request = {table: {'Keys': [{'id': {'S': key}} for key in batch]}}
+        retries = 0
+        while request:
+            response = get_client().batch_get_item(RequestItems=request)
+            for raw in response.get('Responses', {}).get(table, []):
+                item = {k: _deserializer.deserialize(v)
+                        for k, v in raw.items()}
+                items[item['id']] = item
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+            if retries == MAX_RETRIES:
+                left = [key['id']['S'] for key in request[table]['Keys']]
+                logger.warning("Weather keys left unprocessed: {}".format(
+                    ', '.join(left)))
+                unprocessed.update(left)
+                break
+            time.sleep(RETRY_WAIT * 2 ** retries)
+            retries += 1
+    return items, unprocessed
+
+
+def _load(keys):
+    """
+    Fetches the keys missing in the cache and stores them. Only one worker
+    fetches a given set of keys at a time; the others wait briefly for its
+    result in the cache and fall back to DynamoDB if it doesn't show up.
+    The lock outlives the wait, only so a dead worker doesn't hold it.
+    """
+    lock = cache_key('lock:' + keys[0] + ':' + str(len(keys)))
+    acquired = cache.add(lock, 1, LOCK_TIMEOUT)
+    if not acquired:
+        deadline = time.time() + LOAD_WAIT
+        while time.time() < deadline:
+            time.sleep(LOCK_WAIT)
+            cached = cache.get_many([cache_key(k) for k in keys])
+            if len(cached) == len(keys):
+                return {k: cached[cache_key(k)] for k in keys}
+    try:
+        items, unprocessed = fetch_items(keys)
+        found = {}
+        for key in keys:
+            found[key] = items.get(key, _MISSING)
+        cache.set_many({cache_key(k): v for k, v in found.items()
+                        if v != _MISSING}, HIT_TIMEOUT)
+        cache.set_many({cache_key(k): v for k, v in found.items()
+                        if v == _MISSING and k not in unprocessed},
+                       MISS_TIMEOUT)
+        return found
+    finally:
+        if acquired:
+            cache.delete(lock)
+
+
+def _load_once(keys):
+    """ Collapses concurrent loads of the same keys in this process. """
+    flight_key = tuple(keys)
+    with _inflight_lock:
+        flight = _inflight.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = {'event': threading.Event(), 'result': None}
+            _inflight[flight_key] = flight
+
+    if not leader:
+        flight['event'].wait(LOCK_TIMEOUT)
+        if flight['result'] is not None:
+            return flight['result']
+        return _load(keys)
+
+    try:
+        flight['result'] = _load(keys)
+        return flight['result']
+    finally:
+        flight['event'].set()
+        with _inflight_lock:
+            _inflight.pop(flight_key, None)
+
+
+def get_observation(icao_code, date, hours=MAX_HOURS):
+    """
+    Returns the most recent weather observation of the airport in the
+    'hours' before the date, or None if there is none.
+    """
+    keys = window_keys(icao_code, date, hours)
+    cached = cache.get_many([cache_key(k) for k in keys])
+    found = {k: cached[cache_key(k)] for k in keys if cache_key(k) in cached}
+
+    # The window is ordered from the most recent hour, so if a cached hour
+    # has an observation there's no need to look at the older ones.
+    for key in keys:
+        if key not in found:
+            break
+        if found[key] != _MISSING:
+            return found[key]
+
+    missing = [k for k in keys if k not in found]
+    if missing:
+        found.update(_load_once(missing))
+
+    for key in keys:
+        if found.get(key, _MISSING) != _MISSING:
+            return found[key]
+    return None
@@ -1,5 +1,30 @@
+import logging
+
 from django.conf import settings
 from storages.backends.s3boto3 import S3Boto3Storage
 
+from airport import media
+
+logger = logging.getLogger('backend')
+
+
 class MediaStorage(S3Boto3Storage):
     location = 'media'
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        # The index is only a shortcut for listings, a failure to update it
+        # is fixed by the next reconciliation.
+        try:
+            media.record_upload(
+                self._normalize_name(self._clean_name(name)), content.size)
+        except Exception:
+            logger.exception("Could not index the upload of " + name)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        try:
+            media.record_delete(self._normalize_name(self._clean_name(name)))
+        except Exception:
+            logger.exception("Could not index the removal of " + name)
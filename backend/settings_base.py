@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'schedule',
     'operations_log',
     'notification',
+    'exports',
     'django_sysinfo',
 
 ]
@@ -129,6 +130,18 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Cache shared by the app workers. It defaults to a table of the database,
+# created on deploy with 'manage.py createcachetable'; deployments can
+# point it to memcached or Redis through the environment. A per process
+# backend like LocMemCache is only fit for a single worker.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'django_cache'),
+    }
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/2.1/topics/i18n/
 
@@ -162,7 +175,12 @@ BUILD_VERSION = os.environ.get('BUILD_VERSION', 'latest')
 BASE_DOMAIN = os.environ.get('BASE_DOMAIN', 'localhost')
 UI_DOMAIN = BACKEND_ID + '.' + BASE_DOMAIN
 EXPIRY_FOR_EXPORT_DOCUMENT = os.environ.get('EXPIRY_FOR_EXPORT_DOCUMENT', 300)
+# Photos uploaded by the apps straight to the bucket, see airport.uploads
+UPLOAD_URL_EXPIRY = int(os.environ.get('UPLOAD_URL_EXPIRY', 900))
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 20 * 1024 * 1024))
 APP_IMAGES_PREFIX = 'static/media/'
+# Folders of the storage bucket kept in the media index
+MEDIA_INDEX_PREFIXES = [APP_IMAGES_PREFIX, 'media/']
 
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'email-smtp.us-east-1.amazonaws.com')
 EMAIL_PORT = os.environ.get('EMAIL_PORT', 587)
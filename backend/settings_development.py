@@ -115,6 +115,18 @@ CELERYBEAT_SCHEDULE = {
     'fetch_templates': {
         'task': 'fetch_templates',
         'schedule': crontab(hour='*/1'),
+    },
+    'reconcile_media_index': {
+        'task': 'reconcile_media_index',
+        'schedule': crontab(minute=30, hour='*/6'),
+    },
+    'store_task_occurrences': {
+        'task': 'store_task_occurrences',
+        'schedule': crontab(minute=15, hour=2),
+    },
+    'send_pending_notifications': {
+        'task': 'send_pending_notifications',
+        'schedule': crontab(minute='*/10'),
     }
 }
 
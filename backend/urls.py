@@ -28,6 +28,7 @@ from work_orders.urls import router as work_orders_router
 from tasks.urls import router as tasks_router
 from operations_log.urls import router as operations_log_router
 from notification.urls import router as notification_router
+from exports.urls import router as exports_router
 from backend.views import CreateMigrate, RunViewSet, RunCollectStatic, VersionUtil, BuildUtil, StaticImages
 
 router = routers.DefaultRouter()
@@ -39,6 +40,7 @@ router.registry.extend(work_orders_router.registry)
 router.registry.extend(tasks_router.registry)
 router.registry.extend(operations_log_router.registry)
 router.registry.extend(notification_router.registry)
+router.registry.extend(exports_router.registry)
 
 runRouter = routers.SimpleRouter()
 runRouter.register(r'run', RunViewSet, base_name='run')
@@ -1,5 +1,19 @@
+import logging
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
 from django.utils.translation import ugettext_lazy as _
 
+logger = logging.getLogger('backend')
+
+# Cache backends that live in each process, so a worker never sees what
+# another one cached or dropped.
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
 def status_json(code, success, message, show_message=False):
     return {
             'status': {
@@ -10,3 +24,21 @@ def status_json(code, success, message, show_message=False):
                 'show_message': show_message
             }
         }
+
+
+def cache_is_shared():
+    """ Whether the default cache is shared by all the workers. """
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def enqueue_task(name, *args):
+    """
+    Sends a task to the workers once the current transaction commits. Not
+    reaching the broker is logged, it must not fail the request.
+    """
+    def send():
+        try:
+            current_app.send_task(name, args=args)
+        except Exception as e:
+            logger.error("Could not enqueue task {}: {}".format(name, e))
+    transaction.on_commit(send)
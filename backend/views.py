@@ -12,6 +12,7 @@ from backend.perm_config import fill_config_with_all_permissions
 from backend.init_roles import init_groups, create_super_user
 from backend.auth import AerosimpleBackend
 from airport.views import AirportViewSet
+from airport import media
 import os
 import boto3
 from botocore.client import Config
@@ -64,6 +65,7 @@ class StaticImages(View):
         for asset in assets:
             try:
                 client.upload_file(os.path.join(assetDir, asset), settings.AWS_STORAGE_BUCKET_NAME, settings.ASSET_IMAGES_PREFIX + asset)
+                media.record_upload(settings.ASSET_IMAGES_PREFIX + asset, os.path.getsize(os.path.join(assetDir, asset)))
             except Exception as e:
                 logger.error("there was an error trying to upload file: " + e )
         
@@ -73,6 +75,7 @@ class StaticImages(View):
         for img in commonImgs:
             try:
                 client.upload_file(os.path.join(commonDir, img), settings.AWS_STORAGE_BUCKET_NAME, settings.NOTIFICATION_IMAGES_PREFIX + img)
+                media.record_upload(settings.NOTIFICATION_IMAGES_PREFIX + img, os.path.getsize(os.path.join(commonDir, img)))
             except Exception as e:
                 logger.error("there was an error trying to upload file: " + e )
 
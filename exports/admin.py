@@ -0,0 +1,5 @@
+from django.contrib import admin
+
+from exports.models import ExportJob
+
+admin.site.register(ExportJob)
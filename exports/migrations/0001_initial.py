@@ -0,0 +1,33 @@
+# Generated by Django 2.1.3 on 2019-12-05 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('airport', '0041_auto_20191128_1057'),
+        ('users', '0017_aerosimpleuser_notification_preferences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('export_type', models.CharField(max_length=50)),
+                ('object_id', models.IntegerField()),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Running'), (2, 'Completed'), (3, 'Failed')], default=0)),
+                ('content_hash', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('file_key', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('completed_date', models.DateTimeField(blank=True, null=True)),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='airport.Airport')),
+                ('requested_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to='users.AerosimpleUser')),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.contrib.postgres.fields import JSONField
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+from airport.models import Airport
+from users.models import AerosimpleUser
+
+# Export job status constants
+PENDING = 0
+RUNNING = 1
+COMPLETED = 2
+FAILED = 3
+
+STATUS = (
+    (PENDING, _("Pending")),
+    (RUNNING, _("Running")),
+    (COMPLETED, _("Completed")),
+    (FAILED, _("Failed"))
+)
+
+
+class ExportJob(models.Model):
+    """
+    A PDF export rendered in the background. The content hash is the hash
+    of the rendered document, so identical exports share the same file.
+    Exports of many objects, like the batch of inspections of a date
+    range, select them with 'params' instead of 'object_id'.
+    """
+    export_type = models.CharField(max_length=50)
+    object_id = models.IntegerField()
+    params = JSONField(default=dict, blank=True)
+    airport = models.ForeignKey(
+        Airport, related_name="export_jobs", on_delete=models.CASCADE)
+    requested_by = models.ForeignKey(
+        AerosimpleUser, related_name="export_jobs", null=True,
+        on_delete=models.SET_NULL)
+    status = models.IntegerField(choices=STATUS, default=PENDING)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    file_key = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    completed_date = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return "{} {} ({})".format(
+            self.export_type, self.object_id, self.get_status_display())
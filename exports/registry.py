@@ -0,0 +1,47 @@
+from collections import namedtuple
+
+from rest_framework.permissions import IsAuthenticated
+
+from airport.permissions import AirportHasInspectionPermission, \
+    AirportHasWorkOrderPermission
+from inspections.exports import empty_inspection_document, \
+    inspection_batch_params, inspection_data_batch_documents, \
+    inspection_data_batch_fingerprint, inspection_data_document, \
+    store_empty_inspection, store_inspection_zip
+from inspections.permissions import CanViewInspectionAnswers
+from work_orders.exports import workorder_data_document
+from work_orders.permissions import CanViewWorkOrders
+
+# 'builder' receives the object id, the airport and the params of the job
+# and returns the ExportDocument to render, 'permissions' are checked for
+# the requester. 'store', if any, receives the object id, the airport and
+# the document and returns the key of the stored file, in place of storing
+# the document by content; it may then build a list of documents.
+# 'params', if any, validates the request data and returns the params of
+# the job, which then has no object id. 'fingerprint', if any, receives the
+# same arguments as the builder and returns the hash identifying the job,
+# for exports too large to build on the request just to hash them.
+ExportType = namedtuple(
+    'ExportType', ['builder', 'permissions', 'store', 'params', 'fingerprint'],
+    defaults=(None, None, None))
+
+EXPORT_TYPES = {
+    'inspection': ExportType(
+        empty_inspection_document,
+        [IsAuthenticated, CanViewInspectionAnswers,
+         AirportHasInspectionPermission],
+        store_empty_inspection),
+    'inspection_data': ExportType(
+        inspection_data_document,
+        [IsAuthenticated, CanViewInspectionAnswers,
+         AirportHasInspectionPermission]),
+    'inspection_data_batch': ExportType(
+        inspection_data_batch_documents,
+        [IsAuthenticated, CanViewInspectionAnswers,
+         AirportHasInspectionPermission],
+        store_inspection_zip, inspection_batch_params,
+        inspection_data_batch_fingerprint),
+    'workorder_data': ExportType(
+        workorder_data_document,
+        [IsAuthenticated, AirportHasWorkOrderPermission, CanViewWorkOrders]),
+}
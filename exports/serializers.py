@@ -0,0 +1,16 @@
+from rest_framework import serializers
+from rest_framework.serializers import SerializerMethodField
+
+from exports.models import ExportJob
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    status = SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ('id', 'export_type', 'object_id', 'params', 'status',
+                  'error', 'created_date', 'completed_date')
+
+    def get_status(self, obj):
+        return obj.get_status_display()
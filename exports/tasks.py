@@ -0,0 +1,45 @@
+from datetime import timedelta
+import logging
+
+from celery import shared_task
+from django.utils import timezone
+
+from exports.models import ExportJob, RUNNING, COMPLETED, FAILED
+from exports.registry import EXPORT_TYPES
+from exports.utils import document_hash, store_pdf
+
+logger = logging.getLogger('backend')
+
+# A job not finished this long after being requested was lost by the
+# workers, and an export of the same document starts a new one.
+EXPORT_STALE_AFTER = timedelta(minutes=30)
+
+
+@shared_task(name='run_export_job')
+def run_export_job(job_id):
+    """
+    Renders the PDF of an export job and uploads it. The document is
+    rendered again from the current data, so the stored hash always
+    matches the uploaded file. Exports hashed by a fingerprint keep it.
+    """
+    job = ExportJob.objects.select_related('airport').get(id=job_id)
+    job.status = RUNNING
+    job.save(update_fields=['status'])
+    try:
+        export_type = EXPORT_TYPES[job.export_type]
+        document = export_type.builder(
+            job.object_id, job.airport, **job.params)
+        if export_type.fingerprint is None:
+            job.content_hash = document_hash(document)
+        if export_type.store is not None:
+            job.file_key = export_type.store(
+                job.object_id, job.airport, document)
+        else:
+            job.file_key = store_pdf(document)
+        job.status = COMPLETED
+    except Exception as e:
+        logger.error("Export job {} failed: {}".format(job.id, e))
+        job.status = FAILED
+        job.error = str(e)
+    job.completed_date = timezone.now()
+    job.save()
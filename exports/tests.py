@@ -0,0 +1,231 @@
+import io
+import uuid
+import zipfile
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from rest_framework.test import APIClient, APITestCase
+
+from airport.models import create_default_log_types_subtypes
+from exports.models import ExportJob, COMPLETED, FAILED, PENDING
+from exports.tasks import EXPORT_STALE_AFTER, run_export_job
+from exports.utils import document_hash, render_html
+from inspections.exports import get_blank_inspection_pdf, \
+    inspection_data_document
+from inspections.models import InspectionAnswer, InspectionParent
+from users.factories import AerosimpleUserFactory, RoleFactory, GroupFactory
+
+
+class ExportJobTestCase(APITestCase):
+
+    class Bucket:
+        """ Stands for the S3 client, keeping the objects in memory. """
+
+        class exceptions:
+            class NoSuchKey(Exception):
+                pass
+
+        def __init__(self):
+            self.objects = {}
+
+        def get_object(self, Bucket, Key):
+            if Key not in self.objects:
+                raise self.exceptions.NoSuchKey(Key)
+            return {'Body': io.BytesIO(self.objects[Key])}
+
+        def head_object(self, Bucket, Key):
+            if Key not in self.objects:
+                raise ClientError(
+                    {'Error': {'Code': '404'}}, 'HeadObject')
+            return {'ContentLength': len(self.objects[Key])}
+
+        def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+            self.objects[Key] = Fileobj.read()
+
+        def put_object(self, Bucket, Key, Body, ContentType):
+            self.objects[Key] = Body
+
+        def generate_presigned_url(self, operation, Params, ExpiresIn):
+            return 'https://bucket/{}'.format(Params['Key'])
+
+    def setUp(self):
+        self.aerouser = AerosimpleUserFactory()
+        group = GroupFactory(permissions=Permission.objects.filter(
+            codename='view_inspectionanswer'))
+        role = RoleFactory(
+            airport=self.aerouser.airport, permission_group=group)
+        self.aerouser.roles.add(role)
+
+        self.apiClient = APIClient()
+        self.apiClient.force_authenticate(user=self.aerouser.user)
+
+        # The factories mute the signal creating the activity types
+        create_default_log_types_subtypes(self.aerouser.airport)
+        schema = {
+            "id": "inspection", "version": 1,
+            "fields": [{"id": "d1", "type": "string", "title": "Shift",
+                        "required": True}],
+            "sections": [{"id": "SEC1", "title": "Details",
+                          "fields": ["d1"]}],
+            "pages": [{"id": "PAGE1", "title": "Inspection",
+                       "sections": ["SEC1"]}]
+        }
+        parent = InspectionParent.objects.create(
+            title='Daily', icon='icon-1', airport=self.aerouser.airport)
+        version = parent.versions.create(
+            title='Daily', icon='icon-1', schema=schema, status=1)
+        self.answer = InspectionAnswer.objects.create(
+            inspection=version, inspected_by=self.aerouser,
+            created_by=self.aerouser,
+            inspection_date="2019-01-11T19:36:55.975Z", issues=0,
+            response={"d1": "Day shift"})
+
+        cache.clear()
+        self.bucket = self.Bucket()
+        for target in ('exports.utils.get_client',
+                       'inspections.exports.get_client'):
+            patcher = mock.patch(target, return_value=self.bucket)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch('exports.utils.HTML', **{
+            'return_value.write_pdf.return_value': b'%PDF'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def export(self):
+        return self.apiClient.post('/api/exports/', {
+            'export_type': 'inspection_data', 'object_id': self.answer.id
+        }, format='json')
+
+    def test_create(self):
+        response = self.export()
+        self.assertEqual(response.status_code, 202)
+        job = ExportJob.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, PENDING)
+
+        # The same document is not exported twice
+        response = self.export()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], job.id)
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+        response = self.apiClient.post('/api/exports/', {
+            'export_type': 'unknown', 'object_id': self.answer.id
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_stale_job(self):
+        job = ExportJob.objects.get(id=self.export().data['id'])
+        # The job was lost by the workers
+        ExportJob.objects.filter(id=job.id).update(
+            created_date=job.created_date - EXPORT_STALE_AFTER)
+        response = self.export()
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.data['id'], job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, FAILED)
+
+    def test_run_export_job(self):
+        job = ExportJob.objects.get(id=self.export().data['id'])
+        response = self.apiClient.get(
+            '/api/exports/{}/result/'.format(job.id))
+        self.assertEqual(response.status_code, 409)
+
+        run_export_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, COMPLETED)
+        self.assertEqual(list(self.bucket.objects), [job.file_key])
+
+        response = self.apiClient.get(
+            '/api/exports/{}/result/'.format(job.id))
+        self.assertEqual(
+            response.data['url'], 'https://bucket/{}'.format(job.file_key))
+
+    def test_unchanged_document_reused(self):
+        first = ExportJob.objects.get(id=self.export().data['id'])
+        run_export_job(first.id)
+        first.refresh_from_db()
+
+        # A job of an unchanged document reuses the stored PDF
+        second = ExportJob.objects.create(
+            export_type='inspection_data', object_id=self.answer.id,
+            airport=self.aerouser.airport)
+        run_export_job(second.id)
+        second.refresh_from_db()
+        self.assertEqual(second.file_key, first.file_key)
+        self.assertEqual(len(self.bucket.objects), 1)
+
+        # Changing what the document shows changes it
+        self.answer.issues = 1
+        self.answer.save()
+        response = self.export()
+        self.assertEqual(response.status_code, 202)
+        run_export_job(response.data['id'])
+        self.assertEqual(len(self.bucket.objects), 2)
+
+    def test_document_hash_ignores_signed_logo_url(self):
+        airport = self.aerouser.airport
+        airport.logo.name = 'logos/bcn.png'
+        storage = airport.logo.storage
+        with mock.patch.object(storage, 'url', side_effect=lambda name: (
+                '{}?signature={}'.format(name, uuid.uuid4().hex))):
+            first = inspection_data_document(self.answer.id, airport)
+            second = inspection_data_document(self.answer.id, airport)
+            self.assertNotEqual(render_html(first), render_html(second))
+            self.assertEqual(document_hash(first), document_hash(second))
+
+    def test_blank_inspection_shares_published_pdf(self):
+        version = self.answer.inspection
+        response = self.apiClient.post('/api/exports/', {
+            'export_type': 'inspection', 'object_id': version.id
+        }, format='json')
+        run_export_job(response.data['id'])
+        job = ExportJob.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, COMPLETED)
+        self.assertEqual(job.file_key, get_blank_inspection_pdf(
+            version, self.aerouser.airport))
+        self.assertEqual(len(self.bucket.objects), 1)
+
+    def test_inspection_data_batch(self):
+        # Only completed inspections are exported
+        self.answer.status = 1
+        self.answer.save()
+        # A second inspection completed on the same minute
+        InspectionAnswer.objects.create(
+            inspection=self.answer.inspection, inspected_by=self.aerouser,
+            created_by=self.aerouser, status=1,
+            inspection_date="2019-01-11T19:36:20.000Z", issues=0,
+            response={"d1": "Night shift"})
+        batch = {'export_type': 'inspection_data_batch',
+                 's': '2019-01-01', 'f': '2019-01-31'}
+
+        response = self.apiClient.post('/api/exports/', dict(
+            batch, f='2019-03-01'), format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.apiClient.post('/api/exports/', dict(
+            batch, s='2019-02-01', f='2019-02-02'), format='json')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.apiClient.post('/api/exports/', batch, format='json')
+        self.assertEqual(response.status_code, 202)
+        run_export_job(response.data['id'])
+        job = ExportJob.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, COMPLETED)
+        self.assertTrue(job.file_key.endswith('.zip'))
+        archive = zipfile.ZipFile(
+            io.BytesIO(self.bucket.objects[job.file_key]))
+        self.assertEqual(len(set(archive.namelist())), 2)
+
+        # The unchanged batch is not exported again
+        response = self.apiClient.post('/api/exports/', batch, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], job.id)
+
+        # Editing an inspection of the range exports the batch again
+        self.answer.issues = 2
+        self.answer.save()
+        response = self.apiClient.post('/api/exports/', batch, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.data['id'], job.id)
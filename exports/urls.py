@@ -0,0 +1,9 @@
+from rest_framework import routers
+from exports.views import ExportJobViewSet
+
+
+router = routers.SimpleRouter()
+router.register(r'exports', ExportJobViewSet, base_name='exports')
+
+urlpatterns = [
+]
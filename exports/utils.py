@@ -0,0 +1,199 @@
+from collections import namedtuple
+import hashlib
+import io
+import logging
+import zipfile
+
+import boto3
+from botocore.client import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.template.loader import get_template, render_to_string
+from weasyprint import HTML
+
+logger = logging.getLogger('backend')
+
+# What an export renders: the template and its context, plus the file name
+# and the bucket folder of the resulting PDF. 'stable' replaces the entries
+# of the context that change on every render without changing the document,
+# like signed URLs, when hashing it.
+ExportDocument = namedtuple(
+    'ExportDocument', ['template', 'context', 'filename', 'prefix', 'stable'],
+    defaults=(None,))
+
+
+def get_client():
+    return boto3.client('s3', config=Config(signature_version='s3v4'))
+
+
+def render_html(document, stable=False):
+    context = document.context
+    if stable and document.stable:
+        context = dict(context, **document.stable)
+    return render_to_string(document.template, context=context)
+
+
+def content_hash(html):
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def document_hash(document):
+    """
+    Hash of the content of a document, the same for every render of an
+    unchanged document. A list of documents hashes as a whole.
+    """
+    if isinstance(document, list):
+        return content_hash(''.join(document_hash(d) for d in document))
+    return content_hash(render_html(document, stable=True))
+
+
+def logo_context(airport):
+    """
+    Context entries of the logo of the airport, and their stable values:
+    the URL of the logo is signed anew on every render, its name is not.
+    """
+    if not airport.logo:
+        return {'logo_url': ''}, {}
+    return {'logo_url': airport.logo.url}, {'logo_url': airport.logo.name}
+
+
+def get_object_key(document, digest):
+    """
+    The key contains the hash of the document, so an unchanged
+    document is always stored under the same key.
+    """
+    return '{}/{}/{}.pdf'.format(
+        document.prefix, digest, document.filename.replace(' ', '-'))
+
+
+def object_exists(client, key):
+    try:
+        client.head_object(Bucket=settings.ATTACHMENTS_BUCKET_NAME, Key=key)
+    except ClientError:
+        return False
+    return True
+
+
+def store_pdf(document):
+    """
+    Renders the document to PDF and uploads it, unless a PDF of the same
+    content was already uploaded. Returns the key of the object.
+    """
+    key = get_object_key(document, document_hash(document))
+    client = get_client()
+    if not object_exists(client, key):
+        upload_pdf(client, key, render_html(document))
+    return key
+
+
+def upload_pdf(client, key, html):
+    pdf = HTML(string=html).write_pdf()
+    client.put_object(
+        Bucket=settings.ATTACHMENTS_BUCKET_NAME, Key=key, Body=pdf,
+        ContentType='application/pdf')
+    return pdf
+
+
+def get_pdf(client, document):
+    """
+    Returns the PDF of the document, reading it from the bucket if it was
+    already exported and rendering and storing it otherwise.
+    """
+    key = get_object_key(document, document_hash(document))
+    try:
+        response = client.get_object(
+            Bucket=settings.ATTACHMENTS_BUCKET_NAME, Key=key)
+        return response['Body'].read()
+    except client.exceptions.NoSuchKey:
+        return upload_pdf(client, key, render_html(document))
+
+
+class _StreamBuffer:
+    """ Write only file that hands out what was written since last read. """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read_written(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _ChunksReader(io.RawIOBase):
+    """ Read only file over an iterable of byte strings. """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending:
+            try:
+                self.pending = next(self.chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def upload_stream(client, key, chunks, content_type):
+    """
+    Uploads the byte strings generated by chunks as one object. The
+    transfer sends it in parts as they are generated, so the object is
+    never held in memory as a whole.
+    """
+    client.upload_fileobj(
+        io.BufferedReader(_ChunksReader(chunks)),
+        settings.ATTACHMENTS_BUCKET_NAME, key,
+        ExtraArgs={'ContentType': content_type})
+
+
+def stream_zip(files):
+    """
+    Generates a zip archive of the (name, content) pairs chunk by chunk,
+    so it can be streamed while the next files are still being produced.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w',
+                         compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+            yield buffer.read_written()
+    yield buffer.read_written()
+
+
+_template_fingerprints = {}
+
+
+def template_fingerprint(template_name):
+    """ Hash of the source of a template, changes only on deploys. """
+    fingerprint = _template_fingerprints.get(template_name)
+    if fingerprint is None:
+        source = get_template(template_name).template.source
+        fingerprint = content_hash(source)
+        _template_fingerprints[template_name] = fingerprint
+    return fingerprint
+
+
+def get_presigned_url(key):
+    return get_client().generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': settings.ATTACHMENTS_BUCKET_NAME,
+            'Key': key
+        },
+        ExpiresIn=settings.EXPIRY_FOR_EXPORT_DOCUMENT
+    )
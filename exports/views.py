@@ -0,0 +1,118 @@
+import logging
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from backend.utils import enqueue_task
+from exports.models import ExportJob, PENDING, RUNNING, COMPLETED, FAILED
+from exports.registry import EXPORT_TYPES
+from exports.serializers import ExportJobSerializer
+from exports.tasks import EXPORT_STALE_AFTER
+from exports.utils import document_hash, get_presigned_url
+
+logger = logging.getLogger('backend')
+
+
+class ExportJobViewSet(mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    PDF exports rendered in the background.
+
+    POST /exports/ with 'export_type' and 'object_id' submits a job (the
+    exports of many objects take their own params instead of 'object_id'),
+    GET /exports/<id>/ returns its status and GET /exports/<id>/result/
+    the URL of the PDF once it is completed. Exporting a document whose
+    content didn't change returns the previous job right away.
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user:
+            return ExportJob.objects.filter(
+                airport_id=self.request.user.aerosimple_user.airport_id)
+        return ExportJob.objects.none()
+
+    def check_export_permissions(self, request, export_type):
+        for permission in EXPORT_TYPES[export_type].permissions:
+            if not permission().has_permission(request, self):
+                self.permission_denied(request)
+
+    def get_object(self):
+        job = super().get_object()
+        self.check_export_permissions(self.request, job.export_type)
+        return job
+
+    def create(self, request):
+        export_type = request.data.get('export_type')
+        if export_type not in EXPORT_TYPES:
+            return Response(
+                {'export_type': ["Must be one of: {}".format(
+                    ', '.join(sorted(EXPORT_TYPES)))]},
+                status=status.HTTP_400_BAD_REQUEST)
+        validate_params = EXPORT_TYPES[export_type].params
+        if validate_params is not None:
+            object_id = 0
+            params = validate_params(request.data)
+        else:
+            params = {}
+            try:
+                object_id = int(request.data.get('object_id'))
+            except (TypeError, ValueError):
+                return Response(
+                    {'object_id': ["'object_id' must be an integer"]},
+                    status=status.HTTP_400_BAD_REQUEST)
+        self.check_export_permissions(request, export_type)
+
+        airport = request.user.aerosimple_user.airport
+        fingerprint = EXPORT_TYPES[export_type].fingerprint
+        try:
+            if fingerprint is not None:
+                digest = fingerprint(object_id, airport, **params)
+            else:
+                # Rendering the HTML is cheap compared to the PDF, and
+                # tells if an identical document was already exported or
+                # is being exported.
+                digest = document_hash(EXPORT_TYPES[export_type].builder(
+                    object_id, airport, **params))
+        except ObjectDoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        jobs = self.get_queryset().filter(
+            export_type=export_type, object_id=object_id, params=params,
+            content_hash=digest)
+        # A job that never finished was lost by the workers
+        now = timezone.now()
+        jobs.filter(
+            status__in=[PENDING, RUNNING],
+            created_date__lt=now - EXPORT_STALE_AFTER
+        ).update(status=FAILED, error="Timed out", completed_date=now)
+        job = jobs.filter(
+            status__in=[PENDING, RUNNING, COMPLETED]
+        ).order_by('-status', '-id').first()
+        if job is not None:
+            return Response(self.get_serializer(job).data)
+
+        job = ExportJob.objects.create(
+            export_type=export_type,
+            object_id=object_id,
+            params=params,
+            airport=airport,
+            requested_by=request.user.aerosimple_user,
+            content_hash=digest
+        )
+        enqueue_task('run_export_job', job.id)
+        return Response(self.get_serializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def result(self, request, pk=None):
+        job = self.get_object()
+        if job.status != COMPLETED:
+            return Response(self.get_serializer(job).data,
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'url': get_presigned_url(job.file_key)})
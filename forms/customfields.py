@@ -120,5 +120,39 @@ class InspectionField(Field):
         for validator in self.validation_classes:
             validator.validate(value)
 
+    @classmethod
+    def add_statistic_data(cls, stat_template, value, count=1):
+        for key, passed in value.items():
+            if passed is None:
+                # Not answered
+                continue
+            item = stat_template['items'][key]
+            if passed:
+                item['pass'] += count
+            else:
+                item['fail'] += count
+        stat_template['count'] += count
+
+        return stat_template
+
+    def post_process_data(self, stat_template):
+        items = []
+        for item in self.checklist:
+            items.append(stat_template['items'][item['key']])
+
+        stat_template['items'] = items
+
+    def get_statistic_template(self):
+        template = {'items': {}, 'count': 0}
+        for item in self.checklist:
+            template['items'][item['key']] = {
+                'key': item['key'],
+                'value': item['value'],
+                'pass': 0,
+                'fail': 0
+            }
+
+        return template, True
+
 
 FieldFactory.register('inspection', InspectionField)
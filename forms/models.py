@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery
 from django.contrib.postgres.fields import JSONField
 from forms.utils import STATUS, DRAFT, PUBLISHED, EXPIRED
 from datetime import datetime
@@ -16,6 +17,10 @@ class PasswordModelField(models.CharField):
         defaults.update(kwargs)
         return super(PasswordModelField, self).formfield(**defaults)
 
+# Fields of the forms pointing to their published and latest versions
+VERSION_POINTERS = ('published_version', 'latest_version')
+
+
 class Form(models.Model):
     """
     Forms of the app.
@@ -31,6 +36,62 @@ class Form(models.Model):
         ordering = ('title',)
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Form, cls).from_db(db, field_names, values)
+        instance._loaded_pointers = instance.version_pointer_ids()
+        return instance
+
+    def version_pointer_ids(self):
+        return {name: self.__dict__.get(name + '_id')
+                for name in VERSION_POINTERS}
+
+    def save(self, *args, **kwargs):
+        # The version pointers are only written by Version.save, a form
+        # loaded before one of its versions changed would write them back
+        # stale. Those left as loaded are kept out of the update.
+        loaded = getattr(self, '_loaded_pointers', {})
+        unchanged = [name for name, pk in self.version_pointer_ids().items()
+                     if name in loaded and loaded[name] == pk]
+        if (unchanged and not self._state.adding
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in unchanged]
+        super(Form, self).save(*args, **kwargs)
+        self._loaded_pointers = self.version_pointer_ids()
+
+    def refresh_version_pointers(self):
+        self.refresh_from_db(fields=VERSION_POINTERS)
+        self._loaded_pointers = self.version_pointer_ids()
+
+
+def version_pointer(version_model):
+    """
+    Pointer of a form to one of its versions, kept up to date by
+    Version.save so listings don't need to look for it.
+    """
+    return models.ForeignKey(
+        version_model, related_name='+', on_delete=models.SET_NULL,
+        null=True, blank=True, editable=False)
+
+
+def update_version_pointers(form_model, version_model, form_ids=None):
+    """
+    Points the forms to their published and latest versions with a single
+    UPDATE. Takes the models as arguments so migrations can use it too.
+    """
+    versions = version_model.objects.filter(
+        form_id=OuterRef('pk')).order_by('-number', '-id').values('id')
+    forms = form_model.objects.all()
+    if form_ids is not None:
+        forms = forms.filter(pk__in=form_ids)
+    forms.update(
+        published_version=Subquery(
+            versions.filter(status=PUBLISHED)[:1]),
+        latest_version=Subquery(versions[:1]))
+
 
 def version_default():
     return {
@@ -62,21 +123,40 @@ class Version(models.Model):
             title=self.form.__str__(), version=str(self.number))
 
     def save(self, *args, **kwargs):
-        if self.pk is None:
-            self.number = self.form.versions.count() + 1
-
-        if ((self.status == PUBLISHED) and
-                (self.publish_date is None or self.publish_date == '')):
-            self.publish_date = timezone.now()
-            # If there are previous published version,
-            # its status is changed to expired.
-            prev_versions = self.form.versions.filter(status=PUBLISHED)
-            if len(prev_versions) > 0:
-                for prev in prev_versions:
-                    prev.status = EXPIRED
-                    prev.expiry_date = datetime.now()
-                    prev.save()
-        super(Version, self).save(*args, **kwargs)
+        form_model = self._meta.get_field('form').related_model
+        with transaction.atomic():
+            # Versions of the same form are saved one at a time, so the
+            # numbering, the published version and the pointers agree.
+            form_model.objects.select_for_update().filter(
+                pk=self.form_id).values_list('pk').first()
+
+            if self.pk is None:
+                self.number = self.form.versions.count() + 1
+
+            if ((self.status == PUBLISHED) and
+                    (self.publish_date is None or self.publish_date == '')):
+                self.publish_date = timezone.now()
+                # If there are previous published version,
+                # its status is changed to expired.
+                prev_versions = self.form.versions.filter(status=PUBLISHED)
+                if len(prev_versions) > 0:
+                    for prev in prev_versions:
+                        prev.status = EXPIRED
+                        prev.expiry_date = datetime.now()
+                        prev.save()
+            super(Version, self).save(*args, **kwargs)
+            update_version_pointers(form_model, type(self), [self.form_id])
+            form_field = self._meta.get_field('form')
+            if form_field.is_cached(self):
+                form_field.get_cached_value(self).refresh_version_pointers()
+
+    def delete(self, *args, **kwargs):
+        form_model = self._meta.get_field('form').related_model
+        form_id = self.form_id
+        with transaction.atomic():
+            result = super(Version, self).delete(*args, **kwargs)
+            update_version_pointers(form_model, type(self), [form_id])
+        return result
 
 
 class Answer(models.Model):
@@ -0,0 +1,95 @@
+"""
+JSON patches (RFC 6902) for the responses of the answers.
+
+Only the operations the apps need to save a draft are supported: add,
+replace, remove and test. The patch is applied to a copy of the document,
+so a failing operation leaves the original untouched.
+"""
+
+import copy
+
+OPERATIONS = ('add', 'replace', 'remove', 'test')
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _parse_pointer(pointer):
+    if not isinstance(pointer, str) or not pointer.startswith('/'):
+        raise PatchError("Invalid path '{}'".format(pointer))
+    return [
+        token.replace('~1', '/').replace('~0', '~')
+        for token in pointer[1:].split('/')
+    ]
+
+
+def _index(container, token, pointer, adding=False):
+    if isinstance(container, dict):
+        return token
+    if isinstance(container, list):
+        if adding and token == '-':
+            return len(container)
+        if token.isdigit():
+            index = int(token)
+            if index < len(container) + (1 if adding else 0):
+                return index
+    raise PatchError("Path '{}' does not exist".format(pointer))
+
+
+def _resolve(document, pointer):
+    """ Container of the target of the pointer and its key in it. """
+    tokens = _parse_pointer(pointer)
+    container = document
+    for token in tokens[:-1]:
+        key = _index(container, token, pointer)
+        if isinstance(container, dict) and key not in container:
+            raise PatchError("Path '{}' does not exist".format(pointer))
+        container = container[key]
+    return container, tokens[-1]
+
+
+def apply_patch(document, operations):
+    """
+    Returns a copy of the document with the operations applied. Raises
+    PatchError if an operation is malformed, targets a missing path or a
+    test operation fails.
+    """
+    if not isinstance(operations, list):
+        raise PatchError("The patch must be a list of operations")
+    document = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or \
+                operation.get('op') not in OPERATIONS:
+            raise PatchError("Invalid operation '{}'".format(operation))
+        op, pointer = operation['op'], operation.get('path')
+        if op != 'remove' and 'value' not in operation:
+            raise PatchError("Operation '{}' needs a value".format(op))
+
+        if pointer == '':
+            if op == 'test':
+                if document != operation['value']:
+                    raise PatchError("Test of '' failed")
+            elif op == 'remove':
+                raise PatchError("The whole document can't be removed")
+            else:
+                document = copy.deepcopy(operation['value'])
+            continue
+
+        container, token = _resolve(document, pointer)
+        key = _index(container, token, pointer, adding=op == 'add')
+        exists = isinstance(container, list) or key in container
+        if op == 'add':
+            if isinstance(container, list):
+                container.insert(key, copy.deepcopy(operation['value']))
+            else:
+                container[key] = copy.deepcopy(operation['value'])
+        elif not exists:
+            raise PatchError("Path '{}' does not exist".format(pointer))
+        elif op == 'replace':
+            container[key] = copy.deepcopy(operation['value'])
+        elif op == 'remove':
+            del container[key]
+        elif container[key] != operation['value']:
+            raise PatchError("Test of '{}' failed".format(pointer))
+    return document
@@ -2,7 +2,7 @@ from rest_framework import serializers
 from pulpoforms.forms import Form as PulpoForm
 
 from forms.models import Form, Version
-from forms.utils import DRAFT, PUBLISHED
+from forms.utils import DRAFT, PUBLISHED, form_cache, get_compiled_form
 import logging
 
 logger = logging.getLogger('backend')
@@ -75,26 +75,38 @@ class VersionUpdateSerializer(serializers.ModelSerializer):
 #         fields = '__all__'
 
 
-class AnswerSerializer(serializers.Serializer):
+class CompiledFormMixin:
+
+    def get_form(self, data):
+        """
+        Returns the compiled form for the submitted schema. When the view
+        passes the published version in the context it is used as the key.
+        """
+        version = self.context.get('version')
+        if version is not None:
+            return get_compiled_form(version)
+        return form_cache.get(data['schema'])
+
+
+class AnswerSerializer(CompiledFormMixin, serializers.Serializer):
     status = serializers.IntegerField()
     schema = serializers.JSONField()
     response = serializers.JSONField()
-    
+
     def validate(self, data):
         """Check that the answers are appropiate for the version."""
         if data['status'] != PUBLISHED:
             raise serializers.ValidationError(
                 "Can not submit a response for an unpublished version.")
 
-       
-        form = PulpoForm(data['schema'])
+        form = self.get_form(data)
         result = form.check_answers(data['response'])
         if result['result'] != 'OK':
             raise serializers.ValidationError(result['errors'])
 
         return data
 
-class MobileAnswerSerializer(serializers.Serializer):
+class MobileAnswerSerializer(CompiledFormMixin, serializers.Serializer):
     status = serializers.IntegerField()
     schema = serializers.JSONField()
     response = serializers.JSONField()
@@ -105,7 +117,7 @@ class MobileAnswerSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 "Can not submit a response for an unpublished version.")
 
-        form = PulpoForm(data['schema'])
+        form = self.get_form(data)
         result = form.check_answers(data['response'])
         if result['result'] != 'OK':
             raise serializers.ValidationError(result['errors'])
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
+from pulpoforms.cache import FormCache
+from pulpoforms.forms import Form as PulpoForm
+
 # Form status constants
 DRAFT = 0
 PUBLISHED = 1
@@ -9,4 +13,18 @@ STATUS = (
     (DRAFT, _("Draft")),
     (PUBLISHED, _("Published")),
     (EXPIRED, _("Expired")),
-)
\ No newline at end of file
+)
+
+# Compiled pulpoforms of published versions, shared by the whole process.
+form_cache = FormCache(getattr(settings, 'FORM_CACHE_SIZE', 256))
+
+
+def get_compiled_form(version):
+    """
+    Returns the pulpoforms Form for a Version instance. Published versions
+    never change, so their compiled form is reused across requests.
+    """
+    if version.status != PUBLISHED:
+        return PulpoForm(version.schema)
+    key = '{}:{}'.format(version._meta.label_lower, version.pk)
+    return form_cache.get(version.schema, key=key)
@@ -1,4 +1,35 @@
-from rest_framework import viewsets
+import math
+
+from django.contrib.postgres.fields.jsonb import KeyTextTransform, \
+    KeyTransform
+from django.db.models import Count, FloatField
+from django.db.models.functions import Cast
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+
+from forms.utils import get_compiled_form
+from pulpoforms.statistics import DEFAULT_BINS, DEFAULT_PERCENTILES, \
+    field_statistics
+
+MAX_BINS = 100
+# Answers of number fields are JSON numbers or numeric strings
+NUMBER_PATTERN = r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$'
+
+
+class FieldValue(KeyTransform):
+    """
+    Answer of a field in the response JSON. KeyTransform reads keys made of
+    digits, like most field ids, as array indexes; the key is passed as a
+    string parameter instead so it is always looked up in the object.
+    """
+
+    def as_sql(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        return '(%s %s %%s)' % (lhs, self.operator), params + [self.key_name]
+
+
+class FieldText(FieldValue, KeyTextTransform):
+    """ Answer of a field in the response JSON as text. """
 
 # from forms.models import Form, Version, Answer
 # from forms.serializers import FormSerializer, VersionSerializer, \
@@ -30,3 +61,73 @@ from rest_framework import viewsets
 #         if self.action == 'retrieve':
 #             return DetailAnswerSerializer
 #         return AnswerSerializer
+
+
+class VersionStatisticsViewSet(viewsets.GenericViewSet):
+    """
+    Aggregates the answers given to one field of a form version.
+
+    Subclasses set the version model and the name of the relation holding
+    its answers. Only the requested field is read from the database, the
+    rest of the response JSON is left out of the query.
+    """
+    version_model = None
+    answers_relation = None
+
+    def get_queryset(self):
+        if self.request.user:
+            return self.version_model.objects.filter(
+                form__airport__id=self.request.user.aerosimple_user.airport_id
+            )
+        return self.version_model.objects.none()
+
+    def get_answers(self, version):
+        return getattr(version, self.answers_relation).all()
+
+    def retrieve(self, request, pk=None):
+        version = self.get_object()
+        form = get_compiled_form(version)
+
+        field_id = request.query_params.get('field')
+        if field_id not in form.fields:
+            return Response(
+                {'field': ["'field' must be the id of a field of the form"]},
+                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            bins = int(request.query_params.get('bins', DEFAULT_BINS))
+            points = [
+                float(p) for p in
+                request.query_params.get('percentiles', '').split(',') if p
+            ] or DEFAULT_PERCENTILES
+        except ValueError:
+            return Response(
+                {'detail': "'bins' and 'percentiles' must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= bins <= MAX_BINS:
+            return Response(
+                {'bins': ["'bins' must be between 1 and {}".format(MAX_BINS)]},
+                status=status.HTTP_400_BAD_REQUEST)
+        if any(not math.isfinite(p) or p < 0 or p > 100 for p in points):
+            return Response(
+                {'percentiles': ["percentiles must be between 0 and 100"]},
+                status=status.HTTP_400_BAD_REQUEST)
+        points = [int(p) if float(p).is_integer() else p for p in points]
+
+        field = form.fields[field_id]
+        answers = self.get_answers(version).filter(response__has_key=field_id)
+        # The answers are counted by distinct value in the database
+        if field.type == 'number':
+            answers = answers.annotate(
+                text=FieldText(field_id, 'response')
+            ).filter(text__regex=NUMBER_PATTERN).annotate(
+                value=Cast('text', FloatField()))
+        else:
+            answers = answers.annotate(
+                value=FieldValue(field_id, 'response'))
+        values = answers.values('value').annotate(
+            count=Count('pk')).order_by().values_list('value', 'count')
+
+        data = field_statistics(field, values, bins, points)
+        data['field'] = field_id
+        data['version'] = version.id
+        return Response(data)
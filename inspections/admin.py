@@ -2,7 +2,8 @@ from django.contrib.gis import admin
 
 from inspections.models import (
     InspectionParent, Inspection, InspectionAnswer, Remark,
-    InspectionTemplateVersion, InspectionTemplateForm, AirportTemplatesRelation
+    InspectionTemplateVersion, InspectionTemplateForm, AirportTemplatesRelation,
+    TemplateSyncJob
 )
 
 
@@ -13,3 +14,4 @@ admin.site.register(InspectionTemplateVersion)
 admin.site.register(InspectionAnswer)
 admin.site.register(Remark)
 admin.site.register(AirportTemplatesRelation)
+admin.site.register(TemplateSyncJob)
@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+import json
+
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+
+from exports.utils import ExportDocument, content_hash, document_hash, \
+    get_client, get_pdf, logo_context, object_exists, render_html, \
+    store_pdf, stream_zip, template_fingerprint, upload_pdf, upload_stream
+from forms.utils import PUBLISHED
+from inspections.filters import InspectionAnswerFilter
+from inspections.models import Inspection, InspectionAnswer
+from work_orders.models import WorkOrder, COMPLETED
+
+
+BLANK_TEMPLATE = 'empty-inspection.html'
+DATA_TEMPLATE = 'inspection-data.html'
+
+# Widest date range of a batch export of inspection PDFs
+BATCH_MAX_DAYS = 31
+
+
+def empty_inspection_document(pk, airport):
+    """ Blank inspection form of a version, ready to be printed. """
+    version = Inspection.objects.get(id=pk, form__airport=airport)
+    return blank_inspection_document(version, airport)
+
+
+def store_empty_inspection(pk, airport, document):
+    """
+    Stores the blank inspection of an export job like the PDFs rendered
+    when publishing, so both share one file per published version.
+    """
+    version = Inspection.objects.get(id=pk, form__airport=airport)
+    return get_blank_inspection_pdf(version, airport, document)
+
+
+def blank_inspection_document(version, airport):
+    published_version = version.schema
+    logo, stable = logo_context(airport)
+    context = {
+        'airport': airport,
+        "pages": published_version['pages'],
+        "fields": published_version['fields'],
+        "sections": published_version['sections'],
+        "title": published_version['id'],
+    }
+    context.update(logo)
+    filename = '{}-{}'.format(airport.code, published_version['id'])
+    return ExportDocument(
+        BLANK_TEMPLATE, context, filename, 'inspections', stable)
+
+
+def blank_inspection_key(version, airport):
+    """
+    Storage key of the blank PDF of a published version. A published
+    version never changes, so the key only depends on the version, the
+    airport logo and the template.
+    """
+    fingerprint = content_hash('{}:{}'.format(
+        airport.logo.name, template_fingerprint(BLANK_TEMPLATE)))[:16]
+    return 'inspections/blank/{}/{}/{}.pdf'.format(
+        airport.id, version.pk, fingerprint)
+
+
+def get_blank_inspection_pdf(version, airport, document=None):
+    """
+    Returns the storage key of the blank PDF of a version, rendering it
+    only if it wasn't stored yet. Versions that are not published can
+    still change, so they are stored by content instead.
+    """
+    if version.status != PUBLISHED:
+        return store_pdf(
+            document or blank_inspection_document(version, airport))
+
+    key = blank_inspection_key(version, airport)
+    if cache.get('blank-pdf:' + key):
+        return key
+    client = get_client()
+    if not object_exists(client, key):
+        document = document or blank_inspection_document(version, airport)
+        upload_pdf(client, key, render_html(document))
+    cache.set('blank-pdf:' + key, True, None)
+    return key
+
+
+def inspection_data_document(pk, airport):
+    """ Completed inspection with its answers, remarks and work orders. """
+    documents = inspection_data_documents(
+        InspectionAnswer.objects.filter(id=pk), airport)
+    if not documents:
+        raise InspectionAnswer.DoesNotExist(
+            "InspectionAnswer matching query does not exist.")
+    return documents[0]
+
+
+def inspection_batch_params(data):
+    """
+    Params of a batch export: the 's' and 'f' dates (YYYY-MM-DD, at most
+    BATCH_MAX_DAYS apart) and optionally a single inspection type as 'n'.
+    """
+    try:
+        start = datetime.strptime(data['s'], '%Y-%m-%d')
+        end = datetime.strptime(data['f'], '%Y-%m-%d')
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError(
+            {'detail': "'s' and 'f' must be dates as YYYY-MM-DD"})
+    if not timedelta(0) <= end - start < timedelta(days=BATCH_MAX_DAYS):
+        raise ValidationError(
+            {'detail': "The range must be of at most {} days".format(
+                BATCH_MAX_DAYS)})
+    params = {'s': data['s'], 'f': data['f']}
+    if data.get('n'):
+        params['n'] = data['n']
+    return params
+
+
+def _batch_answers(airport, params):
+    answers = InspectionAnswer.objects.filter(
+        status=1, inspection__form__airport=airport)
+    return InspectionAnswerFilter(params, queryset=answers).qs
+
+
+def inspection_data_batch_documents(pk, airport, **params):
+    """ Completed inspections of the date range of a batch export. """
+    documents = inspection_data_documents(
+        _batch_answers(airport, params), airport)
+    if not documents:
+        raise InspectionAnswer.DoesNotExist(
+            "No completed inspections in the range.")
+    return documents
+
+
+def inspection_data_batch_fingerprint(pk, airport, **params):
+    """
+    Hash of what a batch export is made of, read without building it: the
+    params, the completed inspections of the range and when they last
+    changed, the logo and the template.
+    """
+    answers = _batch_answers(airport, params).order_by('id').values_list(
+        'id', 'date')
+    answers = [[answer_id, date.isoformat()] for answer_id, date in answers]
+    if not answers:
+        raise InspectionAnswer.DoesNotExist(
+            "No completed inspections in the range.")
+    return content_hash(json.dumps({
+        'params': params, 'answers': answers, 'logo': airport.logo.name,
+        'template': template_fingerprint(DATA_TEMPLATE),
+    }, sort_keys=True))
+
+
+def store_inspection_zip(pk, airport, documents):
+    """
+    Stores the zip of the PDFs of a batch export, reusing the PDFs
+    exported before. Like single PDFs, the key contains the hash of the
+    documents, so an unchanged batch is stored only once.
+    """
+    key = 'inspections/batch/{}/{}-inspections.zip'.format(
+        document_hash(documents), airport.code)
+    client = get_client()
+    if object_exists(client, key):
+        return key
+
+    def pdfs():
+        for document in documents:
+            context = document.context
+            # Two inspections can be completed on the same minute
+            name = '{}-{}-{}.pdf'.format(
+                context['inspection_date'].strftime('%Y-%m-%d-%H%M'),
+                context['answer_id'], document.filename.replace(' ', '-'))
+            yield name, get_pdf(client, document)
+
+    upload_stream(client, key, stream_zip(pdfs()), 'application/zip')
+    return key
+
+
+def inspection_data_documents(answers, airport):
+    """
+    Export documents of many inspection answers of the airport. Everything
+    the template reads is loaded up front, so the number of queries is the
+    same whatever the number of answers.
+    """
+    answers = answers.filter(
+        inspection__form__airport=airport
+    ).select_related(
+        'inspection', 'inspected_by'
+    ).prefetch_related(
+        'remarks', 'inspected_by__authorized_airports'
+    ).order_by('inspection_date', 'id')
+    # Open work orders and the self inspection are the same for every
+    # answer of the airport.
+    work_orders = list(WorkOrder.objects.filter(
+        form__form__airport=airport
+    ).exclude(status=COMPLETED).order_by('id'))
+    self_inspection = airport.safety_self_inspection
+    return [
+        _inspection_data_document(answer, airport, work_orders,
+                                  self_inspection)
+        for answer in answers
+    ]
+
+
+def _inspection_data_document(answer, airport, work_orders, self_inspection):
+    published_version = answer.inspection.schema
+    context = {
+        'airport': airport,
+        'answer_id': answer.id,
+        'work_orders': work_orders,
+        'insp_answer': answer.response,
+        'weather_conditions': answer.weather_conditions,
+        'issues': answer.issues,
+        'remarks': answer.remarks.all(),
+        'inspected': answer.inspected_by,
+        'inspection_type': answer.inspection_type,
+        'inspection_date': answer.inspection_date,
+        "pages": published_version['pages'],
+        "fields": published_version['fields'],
+        "sections": published_version['sections'],
+        "titles": published_version['id'],
+        "self_inspection": self_inspection
+    }
+    logo, stable = logo_context(airport)
+    context.update(logo)
+    filename = '{}-{}-with-data'.format(airport.code, published_version['id'])
+    return ExportDocument(
+        DATA_TEMPLATE, context, filename, 'inspections', stable)
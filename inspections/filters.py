@@ -1,7 +1,7 @@
 from django_filters import rest_framework as filters
 # from django_filters import FilterSet, DateRangeFilter, DateFilter, CharFilter
 import logging
-from inspections.models import InspectionAnswer
+from inspections.models import InspectionAnswer, ChecklistItemRollup
 from datetime import datetime, timedelta
 from django.db.models import Q
 
@@ -35,3 +35,14 @@ class InspectionAnswerFilter(filters.FilterSet):
     class Meta:
         model = InspectionAnswer
         fields = ('inspection_date', 'inspection__title',)
+
+
+class ChecklistItemRollupFilter(filters.FilterSet):
+    s = filters.DateFilter(field_name='date', lookup_expr='gte')
+    f = filters.DateFilter(field_name='date', lookup_expr='lte')
+    field = filters.CharFilter(field_name='field_reference')
+    item = filters.CharFilter(field_name='item_reference')
+
+    class Meta:
+        model = ChecklistItemRollup
+        fields = ('inspection',)
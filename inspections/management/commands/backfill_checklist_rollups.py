@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from inspections.models import COMPLETED, InspectionAnswer
+from inspections.utils import update_checklist_rollups
+
+
+class Command(BaseCommand):
+    help = ("Adds the completed inspection answers that are not rolled up "
+            "yet to the daily checklist item rollups.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help="Number of answers processed per transaction.")
+        parser.add_argument(
+            '--airport', type=int,
+            help="Only backfill the answers of this airport id.")
+
+    def handle(self, *args, **options):
+        queryset = InspectionAnswer.objects.filter(
+            status=COMPLETED, rolled_up=False
+        ).select_related('inspection__form').order_by('id')
+        if options['airport']:
+            queryset = queryset.filter(
+                inspection__form__airport_id=options['airport'])
+
+        # Walk the answers by id so every chunk is a cheap range scan and
+        # an interrupted run can simply be started again.
+        last_id = 0
+        total = 0
+        while True:
+            chunk = list(queryset.filter(
+                id__gt=last_id)[:options['chunk_size']])
+            if not chunk:
+                break
+            total += update_checklist_rollups(chunk)
+            last_id = chunk[-1].id
+            self.stdout.write("Rolled up {} answers (last id {})".format(
+                total, last_id))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Done, {} answers rolled up".format(total)))
@@ -0,0 +1,41 @@
+# Generated by Django 2.1.3 on 2019-12-05 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0041_auto_20191128_1057'),
+        ('inspections', '0014_auto_20191129_1136'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionanswer',
+            name='rolled_up',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ChecklistItemRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_reference', models.CharField(max_length=50)),
+                ('item_reference', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('passed', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checklist_rollups', to='airport.Airport')),
+                ('inspection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checklist_rollups', to='inspections.InspectionParent')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='checklistitemrollup',
+            unique_together={('airport', 'inspection', 'field_reference', 'item_reference', 'date')},
+        ),
+        migrations.AlterIndexTogether(
+            name='checklistitemrollup',
+            index_together={('airport', 'date')},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.1.3 on 2019-12-05 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0016_form_version_pointers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemplateSyncJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Running'), (2, 'Completed'), (3, 'Failed')], default=0)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('created', models.IntegerField(default=0)),
+                ('updated', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('started_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
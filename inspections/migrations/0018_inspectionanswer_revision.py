@@ -0,0 +1,22 @@
+# Generated by Django 2.1.3 on 2019-12-05 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0017_templatesyncjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspectionanswer',
+            name='revision',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterIndexTogether(
+            name='inspectionanswer',
+            index_together={('inspection', 'inspected_by', 'status')},
+        ),
+    ]
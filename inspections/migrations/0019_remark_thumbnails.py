@@ -0,0 +1,19 @@
+# Generated by Django 2.1.3 on 2019-12-05 19:05
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0018_inspectionanswer_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='remark',
+            name='thumbnails',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.1.3 on 2019-12-05 19:40
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0019_remark_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MergedSchema',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('changes_hash', models.CharField(max_length=64)),
+                ('schema', django.contrib.postgres.fields.jsonb.JSONField()),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merged_schemas', to='inspections.InspectionTemplateVersion')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='mergedschema',
+            unique_together={('template', 'changes_hash')},
+        ),
+    ]
@@ -2,23 +2,41 @@ from django.db import models
 from django.contrib.postgres.fields import JSONField
 from django.contrib.contenttypes.fields import GenericRelation
 from users.models import AerosimpleUser
-from forms.models import Form, Version, Answer
+from forms.models import Form, Version, Answer, version_pointer
 from airport.models import Airport
-from django.db.models.signals import post_save
+from airport import translations, uploads
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from forms.utils import PUBLISHED
 from django.utils.translation import ugettext_lazy as _
 from operations_log.models import LogType, LogSubType, Log, LogForm
+from exports.models import STATUS as JOB_STATUS, PENDING
+from backend.utils import enqueue_task
 import logging
 
 logger = logging.getLogger('backend')
 
+
+def self_inspection_index_key(airport_id):
+    return 'self-inspection-index:{}'.format(airport_id)
+
+
+def invalidate_self_inspection_index(airport_id):
+    """ Drops the compiled self inspection categories once committed. """
+    transaction.on_commit(
+        lambda: cache.delete(self_inspection_index_key(airport_id)))
+
+
 class InspectionTemplateForm(Form):
     """
     Model for Inspection Forms
     """
     title = models.CharField(max_length=100, null=True)
     repo_id = models.IntegerField()
+    published_version = version_pointer('InspectionTemplateVersion')
+    latest_version = version_pointer('InspectionTemplateVersion')
 
 
 class InspectionTemplateVersion(Version):
@@ -32,6 +50,22 @@ class InspectionTemplateVersion(Version):
         return "{} - Version {}".format(self.form.title, self.number)
 
 
+class MergedSchema(models.Model):
+    """
+    Schema of a template version merged with a set of airport changes,
+    stored once for all the inspections with the same changes.
+    """
+    template = models.ForeignKey(
+        InspectionTemplateVersion, related_name="merged_schemas",
+        on_delete=models.CASCADE)
+    # sha256 of the changes
+    changes_hash = models.CharField(max_length=64)
+    schema = JSONField()
+
+    class Meta:
+        unique_together = ('template', 'changes_hash')
+
+
 class AirportTemplatesRelation(models.Model):
     """
     Model to store the last version accepted for an airport
@@ -45,6 +79,26 @@ class AirportTemplatesRelation(models.Model):
     )
 
 
+class TemplateSyncJob(models.Model):
+    """
+    A sync of the templates of the central repository. The next sync sends
+    the ETag and start date of the last completed one, so the repository
+    only has to send what changed since.
+    """
+    status = models.IntegerField(choices=JOB_STATUS, default=PENDING)
+    etag = models.CharField(max_length=255, blank=True)
+    created = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    started_date = models.DateTimeField(blank=True, null=True)
+    completed_date = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return "Template sync {} ({})".format(
+            self.id, self.get_status_display())
+
+
 class InspectionParent(Form):
     """
     Model for Inspection Forms
@@ -74,6 +128,8 @@ class InspectionParent(Form):
     activity_subtype = models.ForeignKey(
         LogSubType, related_name="inspection_parents", on_delete=models.SET_NULL,
         null=True, blank=True)
+    published_version = version_pointer('Inspection')
+    latest_version = version_pointer('Inspection')
 
     def save(self, *args, **kwargs):
         if self.pk is None:
@@ -107,15 +163,39 @@ class Inspection(Version):
             self.form.title, self.number, self.form.airport.code)
 
     def save(self, *args, **kwargs):
-        from airport.models import Translation
-        translations = Translation.objects.filter(airport=self.form.airport)
-
-        for tr in translations:
-            tr.updateTranslationMap(self.title, self.schema['fields'])
+        # Version.save sets the publish date when the version gets published
+        publishing = self.status == PUBLISHED and not self.publish_date
         super(Inspection, self).save(*args, **kwargs)
+        translations.add_keys(self.form.airport_id, translations.schema_keys(
+            self.schema['fields'], self.title, checklists=True))
+        if publishing:
+            enqueue_task('render_blank_inspection_pdf', self.id)
+        invalidate_self_inspection_index(self.form.airport_id)
+
+
+@receiver(pre_save, sender=Airport, dispatch_uid="airport_logo_changed")
+def check_logo_changed(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).values_list(
+        'logo', flat=True).first() if instance.pk else None
+    instance._logo_changed = previous != instance.logo.name
+
+
+@receiver(post_save, sender=Airport,
+          dispatch_uid="airport_blank_inspection_pdfs")
+def render_blank_inspection_pdfs(sender, instance, created, **kwargs):
+    # The blank PDFs show the airport logo, render them again if it changed
+    if not created and getattr(instance, '_logo_changed', False):
+        enqueue_task('render_airport_blank_inspection_pdfs', instance.id)
 
 
 # method for updating
+@receiver(post_save, sender=Airport,
+          dispatch_uid="airport_self_inspection_index")
+def update_self_inspection_index(sender, instance, **kwargs):
+    # The self inspection or its asset types may have changed
+    invalidate_self_inspection_index(instance.id)
+
+
 @receiver(post_save, sender=InspectionParent,
           dispatch_uid="inspection_default_version")
 def create_default_version(sender, instance, created, **kwargs):
@@ -158,9 +238,16 @@ class InspectionAnswer(Answer):
     inspection_type = models.CharField(max_length=100)
     # calculated property
     issues = models.IntegerField()
+    # whether the checklist results were added to the daily rollups
+    rolled_up = models.BooleanField(default=False)
+    # increased on every draft save, to detect saves made concurrently
+    revision = models.IntegerField(default=0)
 
     logs = GenericRelation(Log)
 
+    class Meta:
+        index_together = ('inspection', 'inspected_by', 'status')
+
     def __str__(self):
         return "{} ({})".format(
             self.inspection.title,
@@ -191,3 +278,39 @@ class Remark(models.Model):
     item_reference = models.CharField(max_length=50)
     text = models.TextField()
     image = models.ImageField(upload_to='remarks/', blank=True, null=True)
+    # names of the thumbnails by size, see airport.uploads
+    thumbnails = JSONField(default=dict, blank=True)
+
+
+@receiver(post_save, sender=Remark, dispatch_uid="remark_thumbnails")
+def remark_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        uploads.schedule_thumbnails(instance)
+
+
+class ChecklistItemRollup(models.Model):
+    """
+    Daily pass/fail counts of a checklist item, aggregated from the
+    completed answers of an inspection.
+    """
+    airport = models.ForeignKey(
+        Airport, related_name="checklist_rollups", on_delete=models.CASCADE)
+    inspection = models.ForeignKey(
+        InspectionParent, related_name="checklist_rollups",
+        on_delete=models.CASCADE)
+    field_reference = models.CharField(max_length=50)
+    item_reference = models.CharField(max_length=50)
+    date = models.DateField()
+    passed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (
+            'airport', 'inspection', 'field_reference', 'item_reference',
+            'date')
+        index_together = ('airport', 'date')
+
+    def __str__(self):
+        return "{} {}/{} ({}): {} passed, {} failed".format(
+            self.inspection_id, self.field_reference, self.item_reference,
+            self.date, self.passed, self.failed)
@@ -82,7 +82,9 @@ class CanCompleteInspections(BasePermission):
         # if (request.method == 'POST' and request.user.has_perm(
         #         "inspections.add_inspectionanswer")):
         #     return True
-        if request.method == 'POST' and request.user.aerosimple_user and \
+        # Drafts are also saved as patches
+        if request.method in ('POST', 'PATCH') and \
+            request.user.aerosimple_user and \
             request.user.aerosimple_user.has_permission("add_inspectionanswer"):
             return True
         return False
@@ -1,12 +1,13 @@
 import logging
 
+from django.db.models import F, Manager, OuterRef, Prefetch, Subquery
 from rest_framework_gis import serializers
 from rest_framework.serializers import JSONField, IntegerField, \
     ValidationError, SerializerMethodField
 
 from inspections.models import Inspection, InspectionParent, InspectionAnswer,\
     Remark, InspectionTemplateVersion, InspectionTemplateForm, \
-    AirportTemplatesRelation
+    AirportTemplatesRelation, ChecklistItemRollup, TemplateSyncJob
 from pulpoforms.forms import Form as PulpoForm
 from forms.utils import EXPIRED, PUBLISHED
 from inspections.models import IN_PROGRESS
@@ -15,10 +16,31 @@ from users.serializers import AerosimpleUserSimpleSerializer
 from work_orders.models import WorkOrder, COMPLETED
 from work_orders.serializers import WorkOrderIDListSerializer
 from inspections.utils import build_schema
+from airport.uploads import ThumbnailsField, UploadedImageField
 
 logger = logging.getLogger('backend.inspections.serializers')
 
 
+def selected_template_versions(airport_id, form_ids):
+    """ Maps each template to the version selected by the airport. """
+    versions = InspectionTemplateVersion.objects.filter(
+        form_id__in=form_ids,
+        form__template_relations__airport_id=airport_id,
+        number=F('form__template_relations__selected_version'))
+    return {v.form_id: v for v in versions}
+
+
+class InspectionTemplateDetailListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        # The selected versions of all the templates are loaded at once
+        templates = list(data.all() if isinstance(data, Manager) else data)
+        airport = self.context['request'].user.aerosimple_user.airport_id
+        self.context.setdefault('selected_versions', {}).update(
+            selected_template_versions(airport, [t.id for t in templates]))
+        return super().to_representation(templates)
+
+
 class InspectionTemplateDetailSerializer(serializers.ModelSerializer):
     schema = SerializerMethodField()
     new_version_available = SerializerMethodField()
@@ -28,39 +50,28 @@ class InspectionTemplateDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = InspectionTemplateForm
         fields = '__all__'
+        list_serializer_class = InspectionTemplateDetailListSerializer
 
-    def get_title(self, obj):
-        airport = self.context['request'].user.aerosimple_user.airport_id
+    def get_selected_version(self, obj):
+        """ Version of the template selected by the airport of the user. """
+        versions = self.context.setdefault('selected_versions', {})
+        if obj.id not in versions:
+            airport = self.context['request'].user.aerosimple_user.airport_id
+            versions.update(selected_template_versions(airport, [obj.id]))
+        return versions[obj.id]
 
-        relation = AirportTemplatesRelation.objects.get(
-            airport=airport, form=obj
-        )
-        return obj.versions.get(number=relation.selected_version).title
+    def get_title(self, obj):
+        return self.get_selected_version(obj).title
 
     def get_schema(self, obj):
-        airport = self.context['request'].user.aerosimple_user.airport_id
-
-        relation = AirportTemplatesRelation.objects.get(
-            airport=airport, form=obj
-        )
-        return obj.versions.get(number=relation.selected_version).schema
+        return self.get_selected_version(obj).schema
 
     def get_new_version_available(self, obj):
-        airport = self.context['request'].user.aerosimple_user.airport_id
-
-        relation = AirportTemplatesRelation.objects.get(
-            airport=airport, form=obj
-        )
-        last_version = obj.versions.latest('number').number
-        return last_version > relation.selected_version
+        return obj.latest_version.number > \
+            self.get_selected_version(obj).number
 
     def get_selected_version_id(self, obj):
-        airport = self.context['request'].user.aerosimple_user.airport_id
-
-        relation = AirportTemplatesRelation.objects.get(
-            airport=airport, form=obj
-        )
-        return obj.versions.get(number=relation.selected_version).id
+        return self.get_selected_version(obj).id
 
 
 class InspectionTemplateVersionDetailSerializer(serializers.ModelSerializer):
@@ -163,15 +174,15 @@ class InspectionDetailSerializer(serializers.ModelSerializer):
         model = Inspection
         fields = '__all__'
 
-    def get_form(self, obj):    
-        v = VersionSerializer(obj.versions.get(status=PUBLISHED))
+    def get_form(self, obj):
+        v = VersionSerializer(obj.published_version)
         return v.data
 
     def get_open_workorders(self, obj):
         wos = []
         if hasattr(obj, 'associated_airport'):
             wos = WorkOrder.objects.filter(
-                form__form__airport__id=obj.airport.id
+                form__form__airport__id=obj.airport_id
             ).exclude(status=COMPLETED)
 
         return WorkOrderIDListSerializer(wos, many=True).data
@@ -199,14 +210,14 @@ class InspectionDetailEditSerializer(serializers.ModelSerializer):
         return TaskSerializer(obj.task).data
 
     def get_form(self, obj):
-        version = obj.versions.latest('id')
+        version = obj.latest_version
         serialized_version = VersionSerializer(version).data
         serialized_version.update(InspectionVersionSerializer(version).data)
         return serialized_version
 
     def get_new_version_available(self, obj):
         if obj.template is not None:
-            latest_template = obj.template.form.versions.latest('number').number
+            latest_template = obj.template.form.latest_version.number
             current_template = obj.template.number
 
             return latest_template > current_template
@@ -221,14 +232,37 @@ class InspectionListSerializer(serializers.ModelSerializer):
         model = InspectionParent
         fields = ('id', 'title', 'icon', 'airport_id', 'version_status', 'answer_status')
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Loads what the list shows for all the inspections at once: the
+        status of their last answer and of their versions not expired.
+        """
+        last_answer = InspectionAnswer.objects.filter(
+            inspection__form_id=OuterRef('pk')).order_by('-id')
+        return queryset.annotate(
+            last_answer_status=Subquery(last_answer.values('status')[:1])
+        ).prefetch_related(Prefetch(
+            'versions',
+            queryset=Inspection.objects.exclude(
+                status=EXPIRED).only('id', 'form_id', 'status'),
+            to_attr='active_versions'))
+
     def get_version_status(self, obj):
+        if hasattr(obj, 'active_versions'):
+            return sorted({v.status for v in obj.active_versions})
         return obj.versions.exclude(status=EXPIRED).values_list(
             'status', flat=True).distinct()
+
     def get_answer_status(self, obj):
-        answer = InspectionAnswer.objects.filter(inspection_id__form_id = obj.id).last()
-        if(answer):
-            return answer.status
-        return ""
+        if hasattr(obj, 'last_answer_status'):
+            status = obj.last_answer_status
+        else:
+            answer = InspectionAnswer.objects.filter(
+                inspection_id__form_id=obj.id).last()
+            status = answer.status if answer else None
+        return "" if status is None else status
+
 
 class InspectionAnswerSerializer(serializers.ModelSerializer):
     inspected_by = AerosimpleUserSimpleSerializer()
@@ -273,6 +307,8 @@ class InspectionAnswerDetailSerializer(serializers.ModelSerializer):
 
 
 class RemarkSerializer(serializers.ModelSerializer):
+    image = UploadedImageField(required=False, allow_null=True)
+    thumbnails = ThumbnailsField()
 
     class Meta:
         model = Remark
@@ -327,6 +363,17 @@ class InspectionTemplateListSerializer(serializers.ModelSerializer):
         fields = ('id', 'title',)
 
 
+class TemplateSyncJobSerializer(serializers.ModelSerializer):
+    status = SerializerMethodField()
+
+    class Meta:
+        model = TemplateSyncJob
+        fields = ('id', 'status', 'created', 'updated', 'error',
+                  'created_date', 'completed_date')
+
+    def get_status(self, obj):
+        return obj.get_status_display()
+
 
 class InspectionTypeSerializer(serializers.ModelSerializer):
 
@@ -347,11 +394,7 @@ class MobileInspectionListSerializer(serializers.ModelSerializer):
         fields = ('additionalInfo','form')
 
     def get_form(self, obj):
-        
-        try:
-            version = obj.versions.get(status=PUBLISHED)
-        except:
-            version = obj.versions.latest('id')
+        version = obj.published_version or obj.latest_version
         serialized_version = MobileDetailVersionSerializer(version).data
         return serialized_version
 
@@ -373,10 +416,10 @@ class MobileInspectionDetailSerializer(serializers.ModelSerializer):
         fields = ('id','inspected_by','inspection_type','issues','created_by','title','date','type','form')
 
     def get_inspected_by(self, obj):
-        return ({"id":obj.inspected_by.id})
+        return ({"id":obj.inspected_by_id})
 
     def get_created_by(self, obj):
-        return ({"id":obj.created_by.id})
+        return ({"id":obj.created_by_id})
 
     def get_title(self, obj):
         return obj.inspection.title
@@ -489,7 +532,7 @@ class MobileInspectionDetailEditSerializer(serializers.ModelSerializer):
         fields = ['form']
     
     def get_form(self, obj):
-        version = obj.versions.latest('id')
+        version = obj.latest_version
         serialized_version = VersionSerializer(version).data
         return serialized_version
 
@@ -502,9 +545,8 @@ class MobileInspectionsDetailSerializer(serializers.ModelSerializer):
         model = Inspection
         fields = '__all__'
 
-    def get_form(self, obj):    
-        parent = InspectionParent.objects.get(id = obj.form_id)
-        v = VersionSerializer(parent.versions.get(status=PUBLISHED))
+    def get_form(self, obj):
+        v = VersionSerializer(obj.form.published_version)
         return v.data
 
     def get_open_workorders(self, obj):
@@ -598,3 +640,11 @@ class MobileInspectionsSerializer(serializers.ModelSerializer):
             "fields":inspection_list}}})
 
     
+
+
+class ChecklistItemRollupSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ChecklistItemRollup
+        fields = ('inspection', 'field_reference', 'item_reference', 'date',
+                  'passed', 'failed')
@@ -1,65 +1,208 @@
+from datetime import timedelta
 import logging
 from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
 from celery import shared_task
 from inspections.models import (
-    InspectionTemplateForm, InspectionTemplateVersion,
-    AirportTemplatesRelation
+    Inspection, InspectionTemplateForm, InspectionTemplateVersion,
+    AirportTemplatesRelation, InspectionParent, TemplateSyncJob,
+    enqueue_task
 )
+from exports.models import PENDING, RUNNING, COMPLETED, FAILED
+from forms.models import update_version_pointers
+from inspections.exports import get_blank_inspection_pdf
+from inspections.utils import build_schemas
+from forms.utils import PUBLISHED
 from airport.models import Airport
 import requests
 
 logger = logging.getLogger('backend')
 
+# Seconds to wait for the central repository
+SYNC_TIMEOUT = 60
+# A sync not finished this long after being requested was lost by the
+# workers: the request timed out long ago, plus time waiting in the queue.
+SYNC_STALE_AFTER = timedelta(seconds=SYNC_TIMEOUT + 5 * 60)
+# Key of the advisory lock serializing the writes of synced templates
+SYNC_LOCK = 0x54504c53
+
+
+def active_sync_job():
+    """
+    Returns the sync in progress, if any. Syncs in progress for longer
+    than SYNC_STALE_AFTER were lost and are marked as failed.
+    """
+    now = timezone.now()
+    TemplateSyncJob.objects.filter(
+        status__in=[PENDING, RUNNING],
+        created_date__lt=now - SYNC_STALE_AFTER
+    ).update(status=FAILED, error="Timed out", completed_date=now)
+    return TemplateSyncJob.objects.filter(
+        status__in=[PENDING, RUNNING]).order_by('-id').first()
+
 
 def update_templates(templates):
     """
-    Update templates
+    Creates the templates new to the central repository and adds a version
+    to the ones that changed, comparing them with the stored templates in
+    memory and writing all of them in one transaction. Returns the number
+    of templates created and updated.
     """
-    for t in templates:
-        form = InspectionTemplateForm.objects.filter(repo_id=t['repo_id'])
-        if form.exists():
-            if (form.first().versions.latest('number').number < t['number']):
-                form = form.first()
-            else:
-                form = None
-        else:
-            form = InspectionTemplateForm.objects.create(
-                title=t['title'], repo_id=t['repo_id']
-            )
-            for airport in Airport.objects.all():
-                relation = AirportTemplatesRelation()
-                relation.airport = airport
-                relation.form = form
-                relation.selected_version = t['number']
-                relation.save()
-
-        if form is not None:
-            form.title = t['title']
-            version = InspectionTemplateVersion()
-            version.title = t['title']
-            # version.icon = t['icon']
-            version.schema = t['schema']
-            version.additionalInfo = t['additionalInfo']
-            version.form = form
-            version.save()
-    return
+    templates = {t['repo_id']: t for t in templates}
+    if not templates:
+        return 0, 0
+
+    with transaction.atomic():
+        # Overlapping syncs would both create the templates new to them
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SYNC_LOCK])
+        forms = {
+            form.repo_id: form
+            for form in InspectionTemplateForm.objects.select_related(
+                'latest_version').filter(repo_id__in=list(templates))
+        }
+        new_forms = [
+            InspectionTemplateForm(title=t['title'], repo_id=repo_id)
+            for repo_id, t in templates.items() if repo_id not in forms
+        ]
+        changed_forms = [
+            form for repo_id, form in forms.items()
+            if form.latest_version is None
+            or form.latest_version.number < templates[repo_id]['number']
+        ]
+        InspectionTemplateForm.objects.bulk_create(new_forms)
+
+        # Every airport can select a version of the new templates
+        airport_ids = list(Airport.objects.values_list('id', flat=True))
+        AirportTemplatesRelation.objects.bulk_create([
+            AirportTemplatesRelation(
+                airport_id=airport_id, form=form,
+                selected_version=templates[form.repo_id]['number'])
+            for form in new_forms for airport_id in airport_ids
+        ], batch_size=1000)
+
+        renamed = [
+            form for form in changed_forms
+            if form.title != templates[form.repo_id]['title']
+        ]
+        if renamed:
+            InspectionTemplateForm.objects.filter(
+                pk__in=[form.pk for form in renamed]
+            ).update(title=Case(*[
+                When(pk=form.pk, then=Value(templates[form.repo_id]['title']))
+                for form in renamed
+            ], output_field=CharField()))
+
+        # Versions are numbered in order like Version.save does, without
+        # locking the forms one by one.
+        versions = InspectionTemplateVersion.objects.bulk_create([
+            InspectionTemplateVersion(
+                form=form,
+                number=(form.latest_version.number
+                        if form.latest_version is not None else 0) + 1,
+                title=templates[form.repo_id]['title'],
+                schema=templates[form.repo_id]['schema'],
+                additionalInfo=templates[form.repo_id]['additionalInfo'])
+            for form in new_forms + changed_forms
+        ])
+        update_version_pointers(
+            InspectionTemplateForm, InspectionTemplateVersion,
+            [form.pk for form in new_forms + changed_forms])
+
+        changed_ids = {form.pk for form in changed_forms}
+        updated_versions = [v.id for v in versions if v.form_id in changed_ids]
+        if updated_versions:
+            enqueue_task('merge_template_schemas', updated_versions)
+    return len(new_forms), len(changed_forms)
 
 
 @shared_task(name='fetch_templates')
-def fetch_templates():
+def fetch_templates(job_id=None):
     """
-    Fetches templates
+    Fetches the templates changed since the last completed sync. The
+    scheduled runs don't have a job and create their own, unless a sync is
+    already in progress.
     """
+    if job_id is None:
+        job = active_sync_job()
+        if job is not None:
+            logger.info("Template sync {} in progress, skipped".format(job.id))
+            return
+        job = TemplateSyncJob.objects.create()
+    else:
+        job = TemplateSyncJob.objects.get(id=job_id)
+    previous = TemplateSyncJob.objects.filter(
+        status=COMPLETED).order_by('-started_date').first()
+    job.status = RUNNING
+    job.started_date = timezone.now()
+    job.save(update_fields=['status', 'started_date'])
 
-    templates = {}
+    headers = {"Authorization": "Api-Key {}".format(
+        settings.CENTRAL_REPO_API_KEY)}
+    params = {}
+    if previous is not None:
+        params['since'] = previous.started_date.isoformat()
+        if previous.etag:
+            headers['If-None-Match'] = previous.etag
     try:
         r = requests.get(
             "{}/api/templates".format(settings.CENTRAL_REPO_URL),
-            headers={"Authorization": "Api-Key {}".format(
-                settings.CENTRAL_REPO_API_KEY)}
-        )
-        templates = r.json()
-    except Exception:
-        return
-    update_templates(templates)
-    return
+            headers=headers, params=params, timeout=SYNC_TIMEOUT)
+        if r.status_code == 304:
+            job.etag = previous.etag
+        else:
+            r.raise_for_status()
+            job.created, job.updated = update_templates(r.json())
+            job.etag = r.headers.get('ETag', '')
+        job.status = COMPLETED
+    except Exception as e:
+        logger.error("Template sync {} failed: {}".format(job.id, e))
+        job.status = FAILED
+        job.error = str(e)
+    job.completed_date = timezone.now()
+    job.save()
+
+
+@shared_task(name='merge_template_schemas')
+def merge_template_schemas(version_ids):
+    """
+    Merges new template versions with the changes of every inspection based
+    on an older version of the template, so updating those inspections
+    finds their schema already merged. Inspections with the same changes
+    share one merge.
+    """
+    versions = InspectionTemplateVersion.objects.filter(id__in=version_ids)
+    for version in versions:
+        changes = InspectionParent.objects.filter(
+            template__form_id=version.form_id
+        ).exclude(airport_changes__isnull=True).values_list(
+            'airport_changes', flat=True)
+        merged = build_schemas(version, [c for c in changes if c])
+        logger.info("Template version {}: {} schemas merged".format(
+            version.id, merged))
+
+
+@shared_task(name='render_blank_inspection_pdf')
+def render_blank_inspection_pdf(version_id):
+    """
+    Renders and stores the blank PDF of a published inspection version, so
+    the first export doesn't have to wait for it.
+    """
+    version = Inspection.objects.select_related('form__airport').get(
+        id=version_id)
+    get_blank_inspection_pdf(version, version.form.airport)
+
+
+@shared_task(name='render_airport_blank_inspection_pdfs')
+def render_airport_blank_inspection_pdfs(airport_id):
+    """ Renders the blank PDFs of all the published versions of an airport. """
+    versions = Inspection.objects.select_related('form__airport').filter(
+        form__airport_id=airport_id, status=PUBLISHED)
+    for version in versions:
+        try:
+            get_blank_inspection_pdf(version, version.form.airport)
+        except Exception as e:
+            logger.error("Could not render blank PDF of version {}: {}".format(
+                version.id, e))
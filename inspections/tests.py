@@ -1,7 +1,25 @@
+import copy
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APITestCase
-from inspections.serializers import InspectionEditSerializer, RemarkSerializer
-from inspections.models import InspectionAnswer
+from exports.models import FAILED
+from inspections.serializers import InspectionEditSerializer, RemarkSerializer, \
+    InspectionTemplateDetailSerializer
+from inspections.models import Inspection, InspectionAnswer, InspectionParent, \
+    InspectionTemplateForm, InspectionTemplateVersion, \
+    AirportTemplatesRelation, TemplateSyncJob
+from inspections.utils import build_schema, build_schemas, \
+    update_checklist_rollups
+from inspections.tasks import SYNC_STALE_AFTER, fetch_templates, \
+    update_templates
+from inspections.exports import inspection_data_documents
 from work_orders.models import WorkOrderForm
+from airport.models import create_default_log_types_subtypes
+from operations_log.models import LogForm, LogVersion
 from rest_framework.test import APIClient, APIRequestFactory
 from users.factories import AerosimpleUserFactory, RoleFactory,\
     GroupFactory
@@ -127,10 +145,15 @@ class FormTestCase(APITestCase):
 
         # Login user
         self.aerouser = AerosimpleUserFactory()
+        # The factories mute the signal creating the operations log
+        create_default_log_types_subtypes(self.aerouser.airport)
+        log_form = LogForm.objects.create(
+            airport=self.aerouser.airport, title='BCN Operations log form')
+        LogVersion.objects.create(form=log_form, status=1)
 
         cfg = PermissionConfig.load()
 
-        group = GroupFactory(permissions=cfg.permissions.all())
+        self.group = group = GroupFactory(permissions=cfg.permissions.all())
         role = RoleFactory(
             airport=self.aerouser.airport,
             permission_group=group)
@@ -144,7 +167,8 @@ class FormTestCase(APITestCase):
           "icon": "icon-2",
           "schema": self.schema,
           "additionalInfo": '',
-          "status": 1
+          "status": 1,
+          "task": None
         }
 
         factory = APIRequestFactory()
@@ -186,6 +210,11 @@ class FormTestCase(APITestCase):
         self.answer = InspectionAnswer(**inspection_answer)
         self.answer.save()
 
+    def grant(self, *codenames):
+        """ Adds permissions left out of the default configuration. """
+        self.group.permissions.add(
+            *Permission.objects.filter(codename__in=codenames))
+
     def test_inspection_create(self):
         """Test the creation of inspection."""
 
@@ -393,3 +422,379 @@ class FormTestCase(APITestCase):
                 self.inspection.id), ans, format='json')
 
         self.assertEqual(response2.data['result'], 'Answer updated')
+
+    def test_bulk_complete_inspection(self):
+        response = self.apiClient.post(
+            '/api/inspections/{}/start_inspection/'.format(
+                self.inspection.id), format='json')
+        answer_id = response.data['id']
+
+        ans = {
+            "answer_id": answer_id,
+            "response": {
+                "d1": "2019-01-11T19:36:55.975Z",
+                "d2": "John Doe",
+                "d3": "Sunny",
+                "d4": "Safety self inspection",
+                "d5": "Day shift",
+                "1": {
+                    "CH1": False,
+                    "CH2": True
+                },
+                "2": {
+                    "CH1": True,
+                    "CH2": True
+                }
+            },
+            "date": "2019-01-11T19:36:55.975Z",
+            "type": "sdf",
+            "inspected_by": self.aerouser.id
+        }
+        invalid = dict(ans, response={"d1": "2019-01-11T19:36:55.975Z"})
+
+        response2 = self.apiClient.post(
+            '/api/mobile/inspections/{}/bulk_complete_inspection/'.format(
+                self.inspection.id), {"answers": [ans, invalid]},
+            format='json')
+        self.assertEqual(response2.status_code, 400)
+        self.assertEqual(list(response2.data['answers'].keys()), [1])
+        self.assertEqual(
+            InspectionAnswer.objects.get(id=answer_id).status, 0)
+
+        url = '/api/mobile/inspections/{}/bulk_complete_inspection/'.format(
+            self.inspection.id)
+        no_date = {k: v for k, v in ans.items() if k != 'date'}
+        response2 = self.apiClient.post(
+            url, {"answers": [ans, no_date, 'answer']}, format='json')
+        self.assertEqual(response2.status_code, 400)
+        self.assertEqual(list(response2.data['answers'].keys()), [1, 2])
+
+        # Answers of another inspection are not completed through this one
+        other = InspectionParent.objects.create(
+            title='Other', icon='icon-1', airport=self.aerouser.airport)
+        other_answer = InspectionAnswer.objects.create(
+            inspection=other.versions.first(), inspected_by=self.aerouser,
+            created_by=self.aerouser,
+            inspection_date="2019-01-11T19:36:55.975Z", issues=0,
+            response={})
+        response2 = self.apiClient.post(url, {"answers": [
+            dict(ans, answer_id=other_answer.id)]}, format='json')
+        self.assertEqual(response2.status_code, 400)
+
+        # Without a published version there is nothing to check against
+        response2 = self.apiClient.post(
+            '/api/mobile/inspections/{}/bulk_complete_inspection/'.format(
+                other.id), {"answers": [ans]}, format='json')
+        self.assertEqual(response2.status_code, 400)
+
+        response2 = self.apiClient.post(
+            url, {"answers": [ans]}, format='json')
+        self.assertEqual(response2.data['items'][0]['id'], answer_id)
+        completed = InspectionAnswer.objects.get(id=answer_id)
+        self.assertEqual(completed.status, 1)
+        self.assertEqual(completed.issues, 1)
+
+    def test_inspection_field_statistics(self):
+        self.grant('view_inspectionanswer')
+        self.answer.status = 1
+        self.answer.save()
+        version = self.inspection.versions.first()
+
+        response = self.apiClient.get(
+            '/api/inspection_statistics/{}/'.format(version.id),
+            {'field': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['answered'], 1)
+        self.assertEqual(
+            [(i['key'], i['pass'], i['fail'])
+             for i in response.data['items']],
+            [('CH1', 0, 1), ('CH2', 1, 0)])
+
+        response = self.apiClient.get(
+            '/api/inspection_statistics/{}/'.format(version.id),
+            {'field': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+        response = self.apiClient.get(
+            '/api/inspection_statistics/{}/'.format(version.id),
+            {'field': '1', 'percentiles': 'nan'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_checklist_rollups(self):
+        self.grant('view_inspectionanswer')
+        self.answer.status = 1
+        self.answer.save()
+        # With the inspection date parsed, as the views pass it
+        self.answer.refresh_from_db()
+
+        self.assertEqual(update_checklist_rollups([self.answer]), 1)
+        # An answer is only counted once
+        self.assertEqual(update_checklist_rollups([self.answer]), 0)
+
+        response = self.apiClient.get(
+            '/api/checklist_rollups/totals/', {'field': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(t['item_reference'], t['total_passed'], t['total_failed'])
+             for t in response.data],
+            [('CH1', 0, 1), ('CH2', 1, 0)])
+
+        response = self.apiClient.get(
+            '/api/checklist_rollups/', {'s': '2019-01-12'})
+        self.assertEqual(response.data['count'], 0)
+
+        # Editing the answer replaces its counts, unanswered items are left
+        # out
+        self.answer.response = dict(
+            self.answer.response, **{'1': {'CH1': True, 'CH2': None}})
+        self.assertEqual(update_checklist_rollups([self.answer]), 0)
+        self.answer.save()
+        response = self.apiClient.get(
+            '/api/checklist_rollups/totals/', {'field': '1'})
+        self.assertEqual(
+            [(t['item_reference'], t['total_passed'], t['total_failed'])
+             for t in response.data],
+            [('CH1', 1, 0), ('CH2', 0, 0)])
+
+        # Reopened, it is not counted anymore
+        self.answer.status = 0
+        update_checklist_rollups([self.answer])
+        self.answer.save()
+        self.assertFalse(
+            InspectionAnswer.objects.get(id=self.answer.id).rolled_up)
+        response = self.apiClient.get(
+            '/api/checklist_rollups/totals/', {'field': '1'})
+        self.assertEqual(
+            [(t['total_passed'], t['total_failed']) for t in response.data],
+            [(0, 0), (0, 0)])
+
+    def test_inspection_data_documents_queries(self):
+        airport = self.aerouser.airport
+        answers = InspectionAnswer.objects.filter(
+            inspection__form__airport=airport)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                documents = inspection_data_documents(answers, airport)
+                for document in documents:
+                    str(document.context['inspected'])
+                    list(document.context['remarks'])
+            return len(documents), len(queries)
+
+        one = count_queries()
+        for _ in range(3):
+            self.answer.pk = None
+            self.answer.save()
+        many = count_queries()
+        self.assertEqual((one[0], many[0]), (1, 4))
+        self.assertEqual(one[1], many[1])
+
+    def test_self_inspection_index(self):
+        airport = self.aerouser.airport
+        airport.safety_self_inspection = self.inspection
+        airport.types_for_self_inspection = {"2": {"CH1": "Light"}}
+        airport.save()
+
+        response = self.apiClient.get('/api/mobile/asset_category/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(c['id'], c['sub-category'])
+             for c in response.data['category']['items']],
+            [('1', ['CH1', 'CH2']), ('2', ['CH1', 'CH2'])])
+        self.assertEqual(len(response.data['sub-category']['items']), 4)
+        self.assertEqual(
+            response.data['category-assets']['items'],
+            [{'id': 1, 'category': '2', 'subCategory': 'CH1',
+              'assetType': 'Light', 'comment': 'Inspection Field 2:Light'}])
+
+    def test_version_pointers(self):
+        published = self.inspection.versions.get()
+        self.inspection.refresh_from_db()
+        self.assertEqual(self.inspection.published_version, published)
+        self.assertEqual(self.inspection.latest_version, published)
+
+        draft = Inspection(
+            form=self.inspection, title='draft', icon='icon-1',
+            schema=published.schema)
+        draft.save()
+        self.inspection.refresh_from_db()
+        self.assertEqual(self.inspection.published_version, published)
+        self.assertEqual(self.inspection.latest_version, draft)
+
+        # A stale instance doesn't write its pointers back
+        stale = InspectionParent.objects.get(id=self.inspection.id)
+        draft.status = 1
+        draft.save()
+        stale.save()
+        self.inspection.refresh_from_db()
+        self.assertEqual(self.inspection.published_version, draft)
+
+        response = self.apiClient.get('/api/mobile/inspections/')
+        self.assertEqual(
+            [i['id'] for i in response.data['items']], [draft.id])
+
+    def test_inspection_list_queries(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.apiClient.get('/api/inspections/')
+            self.assertEqual(response.status_code, 200)
+            return len(response.data['results']), len(queries)
+
+        one = count_queries()
+        for i in range(3):
+            parent = InspectionParent.objects.create(
+                created_by=self.aerouser, title='inspection {}'.format(i),
+                icon='icon-1', airport=self.aerouser.airport)
+            version = parent.versions.get()
+            version.schema = self.schema
+            version.status = 1
+            version.save()
+            self.answer.pk = None
+            self.answer.inspection = version
+            self.answer.save()
+        many = count_queries()
+        self.assertEqual((one[0], many[0]), (1, 4))
+        self.assertEqual(one[1], many[1])
+
+    def test_template_detail_queries(self):
+        request = APIRequestFactory().get('/api/inspection_templates/')
+        request.user = self.aerouser.user
+        request.user.aerosimple_user = self.aerouser
+        airport = self.aerouser.airport
+
+        def count_queries():
+            templates = InspectionTemplateForm.objects.select_related(
+                'latest_version')
+            with CaptureQueriesContext(connection) as queries:
+                data = InspectionTemplateDetailSerializer(
+                    templates, many=True, context={'request': request}).data
+            return [t['new_version_available'] for t in data], len(queries)
+
+        def add_template(repo_id, versions):
+            template = InspectionTemplateForm.objects.create(
+                title='template', repo_id=repo_id)
+            for number in range(versions):
+                InspectionTemplateVersion.objects.create(
+                    form=template, title='v{}'.format(number + 1),
+                    icon='icon-1', schema=self.schema)
+            AirportTemplatesRelation.objects.create(
+                airport=airport, form=template, selected_version=1)
+
+        add_template(1, 1)
+        one = count_queries()
+        add_template(2, 2)
+        add_template(3, 1)
+        many = count_queries()
+        self.assertEqual((one[0], many[0]), ([False], [False, True, False]))
+        self.assertEqual(one[1], many[1])
+
+    def test_update_templates(self):
+        def template(repo_id, number, title):
+            return {'repo_id': repo_id, 'number': number, 'title': title,
+                    'schema': self.schema, 'additionalInfo': ''}
+
+        self.assertEqual(update_templates(
+            [template(1, 1, 'first'), template(2, 1, 'second')]), (2, 0))
+        self.assertEqual(AirportTemplatesRelation.objects.filter(
+            airport=self.aerouser.airport).count(), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = update_templates([
+                template(1, 1, 'first'), template(2, 2, 'renamed'),
+                template(3, 1, 'third')])
+        self.assertEqual(result, (1, 1))
+        self.assertLessEqual(len(queries), 10)
+
+        second = InspectionTemplateForm.objects.get(repo_id=2)
+        self.assertEqual(second.title, 'renamed')
+        self.assertEqual(second.latest_version.number, 2)
+        self.assertEqual(InspectionTemplateForm.objects.get(
+            repo_id=1).versions.count(), 1)
+
+    def test_build_schema(self):
+        template = InspectionTemplateVersion.objects.create(
+            form=InspectionTemplateForm.objects.create(
+                title='template', repo_id=1),
+            title='template', icon='icon-1', schema=self.schema)
+        original = copy.deepcopy(template.schema)
+        changes = {
+            'fields': [
+                {'id': 'd2', 'order': 0},
+                {'id': 'd1', 'order': 1},
+                {'id': 'd3', 'hidden': True},
+                {'id': 'x1', 'type': 'string', 'title': 'Extra', 'order': 2},
+            ],
+            'inspectionChecklist': [],
+        }
+
+        schema = build_schema(changes, template)
+        self.assertEqual(template.schema, original)
+        self.assertEqual(schema['sections'][0]['fields'], ['d2', 'd1', 'x1'])
+        self.assertEqual(schema['sections'][1]['fields'], ['1', '2'])
+        self.assertEqual(
+            [f['id'] for f in schema['fields']], ['d2', 'd1', 'x1', '1', '2'])
+        self.assertEqual(changes['fields'][3]['order'], 2)
+
+        schema['fields'] = []
+        self.assertEqual(build_schema(changes, template)['sections'][0][
+            'fields'], ['d2', 'd1', 'x1'])
+        self.assertEqual(len(build_schema(changes, template)['fields']), 5)
+
+        # The merge is stored, so every worker finds it
+        self.assertEqual(template.merged_schemas.count(), 1)
+        cache.clear()
+        self.assertEqual(len(build_schema(changes, template)['fields']), 5)
+        self.assertEqual(build_schemas(template, [changes, {
+            'fields': [], 'inspectionChecklist': []}]), 1)
+        self.assertEqual(template.merged_schemas.count(), 2)
+
+    def test_sync(self):
+        self.grant('view_inspectiontemplateform')
+        url = '/api/inspection_templates/sync/'
+        # Only a POST starts a sync
+        self.assertNotEqual(self.apiClient.get(url).status_code, 202)
+        self.assertFalse(TemplateSyncJob.objects.exists())
+
+        response = self.apiClient.post(url)
+        self.assertEqual(response.status_code, 202)
+        job = TemplateSyncJob.objects.get(id=response.data['id'])
+        # The sync in progress is returned
+        self.assertEqual(self.apiClient.post(url).data['id'], job.id)
+        # and the scheduled run skips it
+        fetch_templates()
+        self.assertEqual(TemplateSyncJob.objects.count(), 1)
+
+        # A sync lost by the workers is not waited for forever
+        TemplateSyncJob.objects.filter(id=job.id).update(
+            created_date=timezone.now() - SYNC_STALE_AFTER)
+        response = self.apiClient.post(url)
+        self.assertNotEqual(response.data['id'], job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, FAILED)
+
+    def test_patch_draft_inspection(self):
+        url = '/api/inspections/{}/patch_draft_inspection/'.format(
+            self.inspection.id)
+
+        def patch(revision, operations):
+            return self.apiClient.patch(url, {
+                'answer_id': self.answer.id, 'revision': revision,
+                'operations': operations}, format='json')
+
+        response = patch(0, [
+            {'op': 'replace', 'path': '/1/CH1', 'value': True},
+            {'op': 'remove', 'path': '/d3'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['revision'], 1)
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.response['1'], {'CH1': True, 'CH2': True})
+        self.assertNotIn('d3', self.answer.response)
+
+        # A patch made on an older revision is rejected
+        response = patch(0, [{'op': 'replace', 'path': '/d5', 'value': 'x'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['revision'], 1)
+
+        response = patch(1, [{'op': 'replace', 'path': '/d3', 'value': 'x'}])
+        self.assertEqual(response.status_code, 400)
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.revision, 1)
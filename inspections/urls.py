@@ -2,7 +2,8 @@ from rest_framework import routers
 from inspections.views import InspectionViewSet, InspectionAnswerViewSet,\
   InspectionEditViewSet, RemarkViewSet, InspectionTemplateViewSet, ExportViewSet, ExportDataViewSet,\
   InspectionTypeViewSet, MobileInspectionTypeViewSet, ImagesDataViewSet, MobileInspectionAnswersViewSet,\
-    SafetySelfInspectionViewSet, AllImagesViewSet, MobileInspectionsViewSet
+    SafetySelfInspectionViewSet, AllImagesViewSet, MobileInspectionsViewSet, InspectionStatisticsViewSet,\
+    ChecklistItemRollupViewSet
 
 
 router = routers.SimpleRouter()
@@ -17,6 +18,10 @@ router.register(r'inspection_answers', InspectionAnswerViewSet,
 router.register(r'inspection_template', ExportViewSet, base_name='inspection_template')
 router.register(r'inspection_template_data', ExportDataViewSet, base_name='inspection_template_data')
 router.register(r'inspection_type', InspectionTypeViewSet, base_name='inspection_type')
+router.register(r'inspection_statistics', InspectionStatisticsViewSet,
+                base_name='inspection_statistics')
+router.register(r'checklist_rollups', ChecklistItemRollupViewSet,
+                base_name='checklist_rollups')
 
 router.register(r'mobile/inspection_type', MobileInspectionTypeViewSet, base_name='mobile_inspection_type')
 router.register(r'mobile/inspection_answers', MobileInspectionAnswersViewSet, base_name='mobile_inspection_answers')
@@ -1,88 +1,302 @@
+from collections import defaultdict
+import copy
+import hashlib
+import json
 import logging
 
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, F, Value, When
+
+from airport.models import Airport
+from forms.utils import PUBLISHED
+from inspections.models import COMPLETED, ChecklistItemRollup, \
+    InspectionAnswer, MergedSchema, self_inspection_index_key
+
 logger = logging.getLogger('backend')
 
 
-def build_schema(airport_changes, template):
-    """
-      this functions makes the merge between the airport
-      hanges and the template.
-      The result of this is the schema.
-    """
-    # ------------------------------------------------------------------------------
-    # IF THERE IS A TEMPLATE ASOCIATED WE MERGE THE TEMPLATE FIELDS
-    # WITH THE INSPECTION CHANGES
-    schema = template.schema
-    sections = schema["sections"]
-    fields = schema["fields"]
-    template_detail_fields = [
-        f for f in fields if f['id'] in sections[0]['fields']
-    ]
-    template_checklist_fields = [
-        f for f in fields if f['id'] in sections[1]['fields']
-    ]
+# Merged schemas only depend on the template version and the changes. They
+# are stored in MergedSchema, the cache only saves reading them back.
+SCHEMA_TIMEOUT = 60 * 60 * 24 * 7
 
-    # ------------------------------------------------------------------------------
-    # MERGE AIRPORT CHANGES IN FIELDS WITH TEMPLATES
-
-    airport_fields = []
-    changedFields = [f for f in airport_changes['fields'] if 'hidden' not in f]
-
-    for f in changedFields:
-        if f['id'] in sections[0]['fields']:
-            item = [fi for fi in template_detail_fields if fi['id'] == f['id']][0]
-            item['order'] = f['order']
-            airport_fields.append(item)
-        else:
-            airport_fields.append(f)
-
-    # ------------------------------------------------------------------
-    # IF THERE AREN'T CHANGES IN THE SCHEMA, WE MUST RETURN
-    # THE TEMPLATE FIELDS
-    if len(airport_changes['fields']) > 0:
-        detail_fields = sorted(
-            airport_fields, key=lambda x: x['order']
-        )
-    else:
-        detail_fields = template_detail_fields
-
-    # ------------------------------------------------------------------
-    # MERGE AIRPORT CHANGES IN CHECKLIST WITH TEMPLATES
-
-    airport_checklist = []
-    changedChecklist = [f for f in airport_changes['inspectionChecklist'] if 'hidden' not in f]
-
-    for f in changedChecklist:
-        if f['id'] in sections[1]['fields']:
-            item = [
-                fi for fi in template_checklist_fields
-                if fi['id'] == f['id']
-            ][0]
-            item['order'] = f['order']
-            airport_checklist.append(item)
-        else:
-            airport_checklist.append(f)
-
-    # ------------------------------------------------------------------
-    # IF THERE AREN'T CHANGES IN THE SCHEMA, WE MUST RETURN
-    # THE TEMPLATE FIELDS
-    if len(airport_changes['inspectionChecklist']) > 0:
-        checklist_fields = sorted(
-            airport_checklist, key=lambda x: x['order']
-        )
+
+def changes_hash(airport_changes):
+    return hashlib.sha256(json.dumps(
+        airport_changes, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def schema_cache_key(template_id, digest):
+    return 'inspection-schema:{}:{}'.format(template_id, digest)
+
+
+def _merge_section(template_fields, section_ids, changes):
+    """
+    Fields of a section of the template with the changes of an airport,
+    which reorder the template fields, hide them or add new ones. Without
+    changes the section is left as in the template.
+    """
+    ids = set(section_ids)
+    if changes:
+        index = {f['id']: f for f in template_fields if f['id'] in ids}
+        fields = []
+        for change in changes:
+            if 'hidden' in change:
+                continue
+            field = index.get(change['id']) or copy.deepcopy(change)
+            field['order'] = change['order']
+            fields.append(field)
+        fields.sort(key=lambda f: f['order'])
     else:
-        checklist_fields = template_checklist_fields
+        fields = [f for f in template_fields if f['id'] in ids]
 
-    allFields = detail_fields + checklist_fields
+    # Once ordered, the order property is not needed anymore
+    for field in fields:
+        field.pop('order', None)
+    return fields
 
-    # ONCE ORDERED, WE DONT NEED THE ORDER PROPERTY ANYMORE
-    list(map(lambda x: x.pop('order', None), allFields))
-    schema['fields'] = allFields
 
-    schema["sections"][0]['fields'] = [f['id'] for f in detail_fields]
-    schema["sections"][1]['fields'] = [f['id'] for f in checklist_fields]
+def merge_schema(airport_changes, template_schema):
+    """
+    Merges the changes of an airport into a copy of the schema of a
+    template. The first section holds the detail fields and the second one
+    the checklist.
+    """
+    schema = copy.deepcopy(template_schema)
+    sections = schema['sections']
+    detail_fields = _merge_section(
+        schema['fields'], sections[0]['fields'], airport_changes['fields'])
+    checklist_fields = _merge_section(
+        schema['fields'], sections[1]['fields'],
+        airport_changes['inspectionChecklist'])
+
+    schema['fields'] = detail_fields + checklist_fields
+    sections[0]['fields'] = [f['id'] for f in detail_fields]
+    sections[1]['fields'] = [f['id'] for f in checklist_fields]
+    return schema
+
+
+def _store_schemas(template, schemas):
+    """
+    Stores the merged schemas of a template version, keyed by the hash of
+    their changes. Another worker may have stored some of them meanwhile.
+    """
+    merged = [
+        MergedSchema(template=template, changes_hash=digest, schema=schema)
+        for digest, schema in schemas.items()
+    ]
+    try:
+        with transaction.atomic():
+            MergedSchema.objects.bulk_create(merged)
+    except IntegrityError:
+        for m in merged:
+            MergedSchema.objects.get_or_create(
+                template=template, changes_hash=m.changes_hash,
+                defaults={'schema': m.schema})
 
-    logger.info("****************************************************")
-    logger.info(schema)
-    logger.info("****************************************************")
+
+def build_schema(airport_changes, template):
+    """
+    Schema of an inspection based on a template version, merged once per
+    version and set of changes.
+    """
+    digest = changes_hash(airport_changes)
+    key = schema_cache_key(template.id, digest)
+    schema = cache.get(key)
+    if schema is None:
+        schema = MergedSchema.objects.filter(
+            template=template, changes_hash=digest
+        ).values_list('schema', flat=True).first()
+        if schema is None:
+            schema = merge_schema(airport_changes, template.schema)
+            _store_schemas(template, {digest: schema})
+        cache.set(key, schema, SCHEMA_TIMEOUT)
     return schema
+
+
+def build_schemas(template, changes):
+    """
+    Merges a template version with several sets of changes at once,
+    skipping the ones already merged. Returns the number of merges done.
+    """
+    changes = {changes_hash(c): c for c in changes}
+    stored = set(MergedSchema.objects.filter(
+        template=template, changes_hash__in=list(changes)
+    ).values_list('changes_hash', flat=True))
+    schemas = {
+        digest: merge_schema(c, template.schema)
+        for digest, c in changes.items() if digest not in stored
+    }
+    _store_schemas(template, schemas)
+    cache.set_many({
+        schema_cache_key(template.id, digest): schema
+        for digest, schema in schemas.items()
+    }, SCHEMA_TIMEOUT)
+    return len(schemas)
+
+
+def checklist_counts(answers):
+    """
+    Adds up the pass/fail results of the checklist items of the given
+    completed answers, leaving out the unanswered ones. Returns a dictionary
+    keyed by (airport id, inspection id, field id, item key, date) with
+    [passed, failed] values. The answers must have their inspection and
+    its form loaded.
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for answer in answers:
+        version = answer.inspection
+        ids = [f['id'] for f in version.schema['fields']
+               if f['type'] == 'inspection']
+        day = answer.inspection_date.date()
+        for field_id in ids:
+            items = answer.response.get(field_id)
+            if not isinstance(items, dict):
+                continue
+            for item, passed in items.items():
+                if passed is None:
+                    # Not answered
+                    continue
+                key = (version.form.airport_id, version.form_id, field_id,
+                       item, day)
+                counts[key][0 if passed else 1] += 1
+    return counts
+
+
+def apply_checklist_counts(counts):
+    """
+    Adds the counts to the rollup rows, creating the ones that don't exist
+    yet. Must run inside a transaction.
+    """
+    missing = []
+    for key, (passed, failed) in counts.items():
+        airport_id, inspection_id, field_id, item, day = key
+        updated = ChecklistItemRollup.objects.filter(
+            airport_id=airport_id, inspection_id=inspection_id,
+            field_reference=field_id, item_reference=item, date=day
+        ).update(passed=F('passed') + passed, failed=F('failed') + failed)
+        if not updated:
+            missing.append(ChecklistItemRollup(
+                airport_id=airport_id, inspection_id=inspection_id,
+                field_reference=field_id, item_reference=item, date=day,
+                passed=passed, failed=failed))
+    if not missing:
+        return
+
+    try:
+        with transaction.atomic():
+            ChecklistItemRollup.objects.bulk_create(missing)
+    except IntegrityError:
+        # Another answer created some of the rows in the meantime, add to
+        # them one by one instead.
+        for rollup in missing:
+            obj, created = ChecklistItemRollup.objects.get_or_create(
+                airport_id=rollup.airport_id,
+                inspection_id=rollup.inspection_id,
+                field_reference=rollup.field_reference,
+                item_reference=rollup.item_reference,
+                date=rollup.date,
+                defaults={'passed': rollup.passed, 'failed': rollup.failed})
+            if not created:
+                ChecklistItemRollup.objects.filter(pk=obj.pk).update(
+                    passed=F('passed') + rollup.passed,
+                    failed=F('failed') + rollup.failed)
+
+
+def update_checklist_rollups(answers):
+    """
+    Brings the daily checklist rollups up to date with the answers, which
+    must not be saved yet: the counts of their stored version, if it was
+    rolled up, are taken out and the ones of the completed answers added.
+    Every answer is so counted once, with its last response. Returns the
+    number of answers rolled up for the first time.
+    """
+    answers = [a for a in answers if a.status == COMPLETED or a.rolled_up]
+    if not answers:
+        return 0
+
+    with transaction.atomic():
+        previous = list(InspectionAnswer.objects.select_for_update(
+            of=('self',)
+        ).select_related('inspection__form').filter(
+            id__in=[a.id for a in answers], rolled_up=True))
+        completed = [a for a in answers if a.status == COMPLETED]
+        counts = checklist_counts(completed)
+        for key, (passed, failed) in checklist_counts(previous).items():
+            counts[key][0] -= passed
+            counts[key][1] -= failed
+        apply_checklist_counts(
+            {key: c for key, c in counts.items() if c != [0, 0]})
+        for answer in answers:
+            answer.rolled_up = answer.status == COMPLETED
+        InspectionAnswer.objects.filter(
+            id__in=[a.id for a in answers]).update(rolled_up=Case(
+                When(id__in=[a.id for a in completed], then=Value(True)),
+                default=Value(False), output_field=BooleanField()))
+    previous_ids = {a.id for a in previous}
+    return len([a for a in completed if a.id not in previous_ids])
+
+
+# Bounds how long an index compiled during a concurrent change can stay
+SELF_INSPECTION_INDEX_TIMEOUT = 60 * 60 * 24
+
+
+def compile_self_inspection_index(schema, types):
+    """
+    Categories (the inspection fields) and sub-categories (their checklist
+    items) of the safety self inspection, and the asset type assigned to
+    each sub-category.
+    """
+    items = []
+    sub_category_list = []
+    titles = {}
+    for field in schema['fields']:
+        if field['type'] == 'inspection':
+            titles[field['id']] = field['title']
+            items.append({
+                'id': field['id'],
+                'name': field['title'],
+                'sub-category': [i['key'] for i in field['checklist']]
+            })
+            sub_category_list.extend(
+                {'id': i['key'], 'name': i['value']}
+                for i in field['checklist'])
+
+    category_asset_list = []
+    for key, value in (types or {}).items():
+        name = titles.get(key, '')
+        for k, v in value.items():
+            category_asset_list.append({
+                'id': len(category_asset_list) + 1,
+                'category': key,
+                'subCategory': k,
+                'assetType': v,
+                'comment': name + ':' + v
+            })
+    return {
+        'category': {'items': items},
+        'sub-category': {'items': sub_category_list},
+        'category-assets': {'items': category_asset_list},
+    }
+
+
+def get_self_inspection_index(airport_id):
+    """
+    Compiled self inspection categories of the airport, only compiled
+    again after its self inspection or its asset types change.
+    """
+    key = self_inspection_index_key(airport_id)
+    index = cache.get(key)
+    if index is None:
+        airport = Airport.objects.select_related(
+            'safety_self_inspection').get(id=airport_id)
+        parent = airport.safety_self_inspection
+        schema = {'fields': []}
+        if parent is not None:
+            version = parent.versions.filter(status=PUBLISHED).first() \
+                or parent.versions.latest('id')
+            schema = version.schema
+        index = compile_self_inspection_index(
+            schema, airport.types_for_self_inspection)
+        cache.set(key, index, SELF_INSPECTION_INDEX_TIMEOUT)
+    return index
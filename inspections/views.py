@@ -5,10 +5,11 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
-from airport.models import Airport, AssetImage, AssetType
+from airport.models import Airport
 from inspections.models import (
     Inspection, InspectionParent, InspectionAnswer,
-    Remark, InspectionTemplateForm, AirportTemplatesRelation
+    Remark, InspectionTemplateForm, AirportTemplatesRelation, ChecklistItemRollup,
+    TemplateSyncJob, IN_PROGRESS, enqueue_task
 )
 from inspections.serializers import (
     InspectionEditSerializer, InspectionDetailSerializer, RemarkSerializer,
@@ -16,12 +17,13 @@ from inspections.serializers import (
     InspectionAnswerDetailSerializer, InspectionAnswerSerializer,
     InspectionTemplateListSerializer, InspectionTemplateDetailSerializer, InspectionTypeSerializer,
     MobileInspectionListSerializer, MobileInspectionDetailSerializer,
-    MobileInspectionDetailEditSerializer, MobileInspectionsDetailSerializer, MobileInspectionsSerializer
+    MobileInspectionsDetailSerializer, MobileInspectionsSerializer,
+    ChecklistItemRollupSerializer, TemplateSyncJobSerializer
 )
-from inspections.filters import InspectionAnswerFilter
-from inspections.tasks import update_templates, fetch_templates
+from inspections.filters import InspectionAnswerFilter, ChecklistItemRollupFilter
+from inspections.tasks import active_sync_job
 from users.models import AerosimpleUser
-from work_orders.models import WorkOrder, COMPLETED, WorkOrderImage
+from work_orders.models import WorkOrder, COMPLETED
 
 from inspections.permissions import CanViewInspections, \
     CanCompleteInspections, CanCreateInspections, SafetySelfInspectionPermission, \
@@ -29,38 +31,42 @@ from inspections.permissions import CanViewInspections, \
 
 from airport.permissions import AirportHasInspectionPermission
 
-from forms.utils import DRAFT, PUBLISHED
+from forms.utils import DRAFT, PUBLISHED, get_compiled_form
 from forms.serializers import AnswerSerializer,MobileAnswerSerializer
+from forms.models import update_version_pointers
+from forms.patch import PatchError, apply_patch
+from forms.views import VersionStatisticsViewSet
 from tasks.utils import create_task
 
 from tasks.models import Task, TaskOccurrence
-from inspections.utils import build_schema
+from inspections.utils import build_schema, get_self_inspection_index, \
+    update_checklist_rollups
 from operations_log.models import Log, LogForm
 from airport.utils import DynamoDbModuleUtility
+from airport import catalog, media, weather
+from exports.utils import get_presigned_url, store_pdf
+from inspections.exports import get_blank_inspection_pdf, \
+    inspection_data_document
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from django.utils import timezone
 import logging
-import os
 import boto3
 from botocore.client import Config
 import botocore.session
 from boto3.s3.transfer import S3Transfer
 from django import template
-from django.template.loader import render_to_string
-from weasyprint import HTML
-from django.core.files.storage import FileSystemStorage
-from django.http import HttpResponse
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db import models
 from django.conf import settings
 from django.conf.urls.static import static
 from django.db.models import Q
 import requests
 import xmltodict
-import random
 from collections import namedtuple, OrderedDict
 from tasks.views import TaskViewSet
-from django.db.models import OuterRef, Subquery, Max, F
+from django.db.models import OuterRef, Subquery, Max, F, Sum
 import json
 register = template.Library()
 
@@ -71,22 +77,72 @@ _PREFIX = settings.APP_IMAGES_PREFIX
 client = boto3.client('s3', config =Config(signature_version='s3v4'))
 
 
-def ListFiles(client):
-    """List files in specific S3 URL"""
-    response = client.list_objects(Bucket=_BUCKET_NAME, Prefix=_PREFIX)
-    for content in response.get('Contents', []):
-        yield content.get('Key')
+def ListFiles():
+    """List files in specific S3 URL, as recorded in the media index"""
+    return media.list_keys(_PREFIX)
 
 
 
 class InspectionMixin:
 
+    @staticmethod
+    def count_issues(inspection_field_ids, response):
+        """ Number of checklist items answered as failed in a response. """
+        issues = 0
+        for i in inspection_field_ids:
+            issues += len(
+                [c for c in response[i] if response[i][c] is False])
+        return issues
+
+    @staticmethod
+    def check_open_work_orders(work_orders, response):
+        """
+        Items with an open work order can't be answered as passed. Returns
+        the error message for the first offending item, or None.
+        """
+        for w in work_orders:
+            category = w['category_id']
+            subcategory = w['subcategory_id']
+            if category in response and response[category][subcategory]:
+                return ('The item with Category {} and subcategory '
+                        '{} has a workorder associated, thus '
+                        'response must be false.').format(
+                            category, subcategory)
+        return None
+
+    @staticmethod
+    def fill_weather_conditions(insp_answer, icao_code, inspection_date):
+        # get weather from dynamo weather table and fill the weather_conditions if found
+        try:
+            observation = weather.get_observation(icao_code, inspection_date)
+            if observation is not None:
+                insp_answer.weather_conditions['current_obs'] = observation
+                insp_answer.weather_conditions['title'] = observation['metar']['summary']
+        except Exception as ex:
+            logger.error(ex)
+            # show weather only if availabe, so do nothing
+            pass
+
+    @staticmethod
+    def complete_task_occurrence(data):
+        """ Marks the task occurrence an inspection was done for as completed. """
+        if len(data.keys()) > 0:
+            task = Task.objects.get(pk=data['taskid'])
+            date = datetime.strptime(
+                data['date'], '%Y-%m-%dT%H:%M:%SZ')
+            occurrence = task.get_occurrence(date)
+            occurrence.save()
+            t_occ, created = TaskOccurrence.objects.get_or_create(
+                task=task,
+                occurrence=occurrence
+            )
+            t_occ.completed = True
+            t_occ.save()
+
     @staticmethod
     def create_empty_inspection(self, user):
         inspection = self.get_object()
-        published_version = inspection.versions.filter(
-            status=PUBLISHED
-        ).first()
+        published_version = inspection.published_version
 
         insp_answer = InspectionAnswer()
         insp_answer.inspection = published_version
@@ -105,22 +161,87 @@ class InspectionMixin:
             'id': insp_answer.id,
             'status': insp_answer.status,
             'type':insp_answer.inspection_type,
-            'response':insp_answer.response
+            'response':insp_answer.response,
+            'revision': insp_answer.revision
         })
 
+    def draft_answers(self, pk):
+        """ Drafts of the user for the published version of an inspection. """
+        return InspectionAnswer.objects.filter(
+            inspection__form_id=pk, inspection__status=PUBLISHED,
+            inspected_by=self.request.user.aerosimple_user,
+            status=IN_PROGRESS)
+
     @action(detail=True, methods=['post'])
     def save_draft_inspection(self, request, pk=None):
         draft_data = request.data
-        inspection = Inspection.objects.filter(form_id = pk).get(status = PUBLISHED)
-        draft_version = InspectionAnswer.objects.filter(inspection_id = inspection.id).last()
-        
-        draft_version.response = draft_data['response']
-        draft_version.inspection_type = draft_data['type']
-        draft_version.save()
+        with transaction.atomic():
+            draft_version = self.draft_answers(pk).select_for_update(
+                of=('self',)).order_by('-id').first()
+            if draft_version is None:
+                return Response(
+                    {'inspection_answer': ["There is no draft to update"]},
+                    status=status.HTTP_404_NOT_FOUND)
+
+            draft_version.response = draft_data['response']
+            draft_version.inspection_type = draft_data['type']
+            draft_version.revision += 1
+            draft_version.save(
+                update_fields=['response', 'inspection_type', 'revision'])
         return Response({
             'result': 'Answer updated',
             'id': draft_version.id,
-            'status': draft_version.status
+            'status': draft_version.status,
+            'revision': draft_version.revision
+        })
+
+    @action(detail=True, methods=['patch'])
+    def patch_draft_inspection(self, request, pk=None):
+        """
+        Saves the changes to a draft as a JSON patch of its response. The
+        patch must be made on the current revision of the draft, otherwise
+        the current response is returned with a 409 for the app to merge.
+        """
+        try:
+            answer_id = int(request.data['answer_id'])
+            revision = int(request.data['revision'])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {'inspection_answer': [
+                    "'answer_id' and 'revision' must be integers"]},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            draft = self.draft_answers(pk).select_for_update(
+                of=('self',)).filter(pk=answer_id).first()
+            if draft is None:
+                return Response(
+                    {'inspection_answer': ["'answer_id' field is not valid"]},
+                    status=status.HTTP_404_NOT_FOUND)
+            if draft.revision != revision:
+                return Response({
+                    'id': draft.id,
+                    'revision': draft.revision,
+                    'response': draft.response
+                }, status=status.HTTP_409_CONFLICT)
+            try:
+                draft.response = apply_patch(
+                    draft.response, request.data.get('operations'))
+            except PatchError as e:
+                return Response({'operations': [str(e)]},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            update_fields = ['response', 'revision']
+            if 'type' in request.data:
+                draft.inspection_type = request.data['type']
+                update_fields.append('inspection_type')
+            draft.revision += 1
+            draft.save(update_fields=update_fields)
+        return Response({
+            'result': 'Answer updated',
+            'id': draft.id,
+            'status': draft.status,
+            'revision': draft.revision
         })
 
     @action(detail=True, methods=['POST'])
@@ -134,6 +255,7 @@ class InspectionMixin:
             response['response'] = draft_data.response
             response['type'] = draft_data.inspection_type
             response['status'] = draft_data.status
+            response['revision'] = draft_data.revision
             return Response(response)
         else:
             return InspectionViewSet.create_empty_inspection(self, self.request.user)
@@ -153,15 +275,17 @@ class InspectionMixin:
     @action(detail=True, methods=['post'])
     def complete_inspection(self, request, pk):
         # inspection = self.get_object()
-        inspection = InspectionParent.objects.get(id=pk)
-        published_version = inspection.versions.filter(status=PUBLISHED).first()
+        inspection = InspectionParent.objects.select_related(
+            'published_version').get(id=pk)
+        published_version = inspection.published_version
         answer_data = {
             "schema": published_version.schema,
             "status": published_version.status,
             "response": request.data['response']
             
         }
-        serializer = AnswerSerializer(data=answer_data)
+        serializer = AnswerSerializer(
+            data=answer_data, context={'version': published_version})
         if serializer.is_valid():
             # getting inspections field ids
             ids = [c['id'] for c in published_version.schema['fields']
@@ -176,24 +300,15 @@ class InspectionMixin:
                 ).exclude(status=COMPLETED).values(
                     'category_id', 'subcategory_id').distinct()
 
-                for w in work_orders:
-                    category = w['category_id']
-                    subcategory = w['subcategory_id']
-                    if category in request.data['response'] and request.data['response'][category][subcategory]:
-                        return Response(
-                            {'inspection_answer':
-                                [('The item with Category {} and subcategory '
-                                  '{} has a workorder associated, thus '
-                                  'response must be false.').format(
-                                    category, subcategory)]},
-                            status=status.HTTP_400_BAD_REQUEST)
+                error = self.check_open_work_orders(
+                    work_orders, request.data['response'])
+                if error is not None:
+                    return Response(
+                        {'inspection_answer': [error]},
+                        status=status.HTTP_400_BAD_REQUEST)
 
             # calculate issues number from response
-            issues = 0
-            for i in ids:
-                issues += len(
-                    [c for c in request.data['response'][i]
-                        if request.data['response'][i][c] is False])
+            issues = self.count_issues(ids, request.data['response'])
 
             try:
                 # inspection answer must be created when starting filling the
@@ -234,49 +349,20 @@ class InspectionMixin:
             )
 
             if inspectionDate != inspection_date:
-                # get weather from dynamo weather table and fill the weather_conditions if found
-                try:
-                    dynamodb = boto3.resource("dynamodb", region_name=settings.AWS_DEFAULT_REGION)
-                    table = dynamodb.Table(settings.MAIN_APP_PREFIX + 'weather')
-                    icao_code = request.user.aerosimple_user.airport.code
-                    max_diff = 24
-                    response = None
-                    for diff in range(max_diff):
-                        date = inspection_date - timedelta(hours = diff - 1)
-                        key = icao_code + '_' + str(date.year) + '_' + str(date.month) + '_' + str(date.day) + '_' + str(date.hour)
-                        response = table.get_item(
-                            Key={
-                                'id': key
-                            }
-                        )
-                        if 'Item' in response:
-                            insp_answer.weather_conditions['current_obs'] = response['Item']
-                            insp_answer.weather_conditions['title'] = response['Item']['metar']['summary']
-                            break
-                except Exception as ex:
-                    logger.error(ex)
-                    # show weather only if availabe, so do nothing
-                    pass
+                self.fill_weather_conditions(
+                    insp_answer, request.user.aerosimple_user.airport.code,
+                    inspection_date)
             insp_answer.inspection_date = inspection_date
             try:
                 with transaction.atomic():
+                    # Takes out the counts of the stored answer if edited
+                    update_checklist_rollups([insp_answer])
                     insp_answer.save()
                     insp_answer.create_log_entry()
 
                     if 'task_details' in request.data:
-                        data = request.data['task_details']
-                        if len(data.keys()) > 0:
-                            task = Task.objects.get(pk=data['taskid'])
-                            date = datetime.strptime(
-                                data['date'], '%Y-%m-%dT%H:%M:%SZ')
-                            occurrence = task.get_occurrence(date)
-                            occurrence.save()
-                            t_occ, created = TaskOccurrence.objects.get_or_create(
-                                task=task,
-                                occurrence=occurrence
-                            )
-                            t_occ.completed = True
-                            t_occ.save()
+                        self.complete_task_occurrence(
+                            request.data['task_details'])
             except Exception:
                 # Any exception should be handled by DRF, like a normal action
                 raise
@@ -299,30 +385,31 @@ class InspectionViewSet(mixins.ListModelMixin,
                         viewsets.GenericViewSet,
                         InspectionMixin):
 
+    # Task rules of the daily/weekdays/weekly/monthly/yearly inspections
+    RULE_QUERIES = {
+        'daily': '1', 'weekdays': '2', 'weekly': '3', 'monthly': '4',
+        'yearly': '5'
+    }
+
     def get_queryset(self):
         if self.request.user:
-            user_inspections = InspectionParent.objects.filter(
-                airport__id=self.request.user.aerosimple_user.airport_id)
+            airport_id = self.request.user.aerosimple_user.airport_id
             #to retreive daily/monthly/yearly inspections
             query = self.request.GET.get("query")
-            if query is not None:
-                if(query.lower() == 'daily'):
-                    rule_task_data = Task.objects.filter(label = 'inspections').filter(rule = '1').filter(airport_id = self.request.user.aerosimple_user.airport_id)
-                if(query.lower() == 'weekdays'):
-                    rule_task_data = Task.objects.filter(label = 'inspections').filter(rule = '2').filter(airport_id = self.request.user.aerosimple_user.airport_id)
-                if(query.lower() == 'weekly'):
-                    rule_task_data = Task.objects.filter(label = 'inspections').filter(rule = '3').filter(airport_id = self.request.user.aerosimple_user.airport_id)
-                if(query.lower() == 'monthly'):
-                    rule_task_data = Task.objects.filter(label = 'inspections').filter(rule = '4').filter(airport_id = self.request.user.aerosimple_user.airport_id)
-                if(query.lower() == 'yearly'):
-                    rule_task_data = Task.objects.filter(label = 'inspections').filter(rule = '5').filter(airport_id = self.request.user.aerosimple_user.airport_id)
-                rule_inspection = []
-                for index in range(len(rule_task_data)):
-                    inspection_data = InspectionParent.objects.get(task = rule_task_data[index].id)
-                    rule_inspection.insert(index,inspection_data)
-                
-                return rule_inspection
-            return user_inspections.filter(versions__status=PUBLISHED)
+            if query is not None and query.lower() in self.RULE_QUERIES:
+                user_inspections = InspectionParent.objects.filter(
+                    task__label='inspections',
+                    task__rule=self.RULE_QUERIES[query.lower()],
+                    task__airport_id=airport_id).order_by('task__id')
+            else:
+                user_inspections = InspectionParent.objects.filter(
+                    airport__id=airport_id, published_version__isnull=False)
+
+            if self.action == 'list':
+                return InspectionListSerializer.setup_eager_loading(
+                    user_inspections)
+            return user_inspections.select_related(
+                'published_version', 'associated_airport')
 
         return InspectionParent.objects.none()
     
@@ -334,6 +421,7 @@ class InspectionViewSet(mixins.ListModelMixin,
             'create': [IsAuthenticated, CanCreateInspections, AirportHasInspectionPermission],
             'complete_inspection': [IsAuthenticated, CanCompleteInspections, AirportHasInspectionPermission],
             'save_draft_inspection': [IsAuthenticated, CanCompleteInspections, AirportHasInspectionPermission],
+            'patch_draft_inspection': [IsAuthenticated, CanCompleteInspections, AirportHasInspectionPermission],
             'safety_self_inspection': [IsAuthenticated, SafetySelfInspectionPermission, AirportHasInspectionPermission],
             'start_inspection': [IsAuthenticated, CanCompleteInspections, AirportHasInspectionPermission]
         }
@@ -355,23 +443,16 @@ class InspectionViewSet(mixins.ListModelMixin,
     def summary(self, request):
         if self.request.user:
             weather_summary = {}
-            dynamodb = boto3.resource("dynamodb", region_name=settings.AWS_DEFAULT_REGION)
-            table = dynamodb.Table(settings.MAIN_APP_PREFIX + 'weather')
             icao_code = request.user.aerosimple_user.airport.code
-            max_diff = 24
-            response = None
-            for diff in range(max_diff):
-                date = datetime.now() - timedelta(hours = diff - 1)
-                key = icao_code + '_' + str(date.year) + '_' + str(date.month) + '_' + str(date.day) + '_' + str(date.hour)
-                response = table.get_item(
-                    Key={
-                        'id': key
-                    }
-                )
-                if 'Item' in response:
-                    weather_summary = response['Item']['metar']
-                    weather_summary['temperature'] = weather_summary['temperature'].replace('Temperature ', '')
-                    break
+            try:
+                observation = weather.get_observation(
+                    icao_code, datetime.now())
+            except Exception as ex:
+                logger.error(ex)
+                observation = None
+            if observation is not None:
+                weather_summary = dict(observation['metar'])
+                weather_summary['temperature'] = weather_summary['temperature'].replace('Temperature ', '')
             task_summary = ''
             occurences = TaskViewSet.get_task_occurences(self.request.user)
             for oc in occurences:
@@ -402,8 +483,12 @@ class InspectionEditViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if self.request.user:
-            return InspectionParent.objects.filter(
+            inspections = InspectionParent.objects.filter(
                 airport__id=self.request.user.aerosimple_user.airport_id)
+            if self.action == 'list':
+                return InspectionListSerializer.setup_eager_loading(
+                    inspections)
+            return inspections
 
         return InspectionParent.objects.none()
 
@@ -567,6 +652,7 @@ class InspectionEditViewSet(viewsets.ModelViewSet):
 
                 inspection.save()
 
+            inspection.refresh_version_pointers()
             return Response(serializer.data)
         return Response(serializer.errors,
                         status=status.HTTP_400_BAD_REQUEST)
@@ -578,6 +664,9 @@ class InspectionEditViewSet(viewsets.ModelViewSet):
         inspection.versions.filter(status=DRAFT).delete()
         if not inspection.versions.exists():
             inspection.delete()
+        else:
+            update_version_pointers(
+                InspectionParent, Inspection, [inspection.id])
 
         return Response(status=status.HTTP_200_OK)
 
@@ -599,6 +688,7 @@ class InspectionEditViewSet(viewsets.ModelViewSet):
                 newVersion.number = newVersion.number + 1
                 newVersion.schema = schema
                 newVersion.save()
+                inspection.refresh_version_pointers()
                 return Response(InspectionDetailEditSerializer(inspection).data)
         except Exception:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -669,14 +759,15 @@ class RemarkViewSet(mixins.CreateModelMixin,
 class InspectionTemplateViewSet(mixins.ListModelMixin,
                                 mixins.RetrieveModelMixin,
                                 viewsets.GenericViewSet):
-    queryset = InspectionTemplateForm.objects.all()
+    queryset = InspectionTemplateForm.objects.select_related('latest_version')
 
     def get_permissions(self):
         switcher = {
             'retrieve': [IsAuthenticated, CanViewInspectionTemplate, AirportHasInspectionPermission],
             'list': [IsAuthenticated, CanViewInspectionTemplate, AirportHasInspectionPermission],
             'update_version': [IsAuthenticated, AirportHasInspectionPermission],
-            'sync': [IsAuthenticated, CanViewInspectionTemplate, AirportHasInspectionPermission]
+            'sync': [IsAuthenticated, CanViewInspectionTemplate, AirportHasInspectionPermission],
+            'sync_status': [IsAuthenticated, CanViewInspectionTemplate, AirportHasInspectionPermission]
         }
         self.permission_classes = switcher.get(self.action, [IsAdminUser])
         return super(self.__class__, self).get_permissions()
@@ -698,7 +789,7 @@ class InspectionTemplateViewSet(mixins.ListModelMixin,
             airport=airport, form=template
         )
 
-        relation.selected_version = template.versions.latest('number').number
+        relation.selected_version = template.latest_version.number
         relation.save()
         ser = InspectionTemplateDetailSerializer(
                 template,
@@ -706,10 +797,27 @@ class InspectionTemplateViewSet(mixins.ListModelMixin,
 
         return Response(ser.data)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['post'])
     def sync(self, request):
-        fetch_templates()
-        return Response(status=status.HTTP_200_OK)
+        """
+        Starts a sync with the central repository in the background, or
+        returns the one already in progress.
+        """
+        job = active_sync_job()
+        if job is None:
+            job = TemplateSyncJob.objects.create()
+            enqueue_task('fetch_templates', job.id)
+        return Response(TemplateSyncJobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'],
+            url_path=r'sync/(?P<job_id>[0-9]+)')
+    def sync_status(self, request, job_id=None):
+        try:
+            job = TemplateSyncJob.objects.get(id=job_id)
+        except TemplateSyncJob.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(TemplateSyncJobSerializer(job).data)
 
 class ExportViewSet(viewsets.GenericViewSet):
     def get_permissions(self):
@@ -723,34 +831,13 @@ class ExportViewSet(viewsets.GenericViewSet):
     @action(detail=True, methods=['get'])
     def inspection(self, request, pk):
         airport = Airport.objects.filter(id=request.user.aerosimple_user.airport_id).last()
-        published_version = Inspection.objects.get(id=self.kwargs.get('pk')).schema
-        context = {
-            'airport': airport,
-            "pages": published_version['pages'],
-            "fields": published_version['fields'],
-            "sections": published_version['sections'],
-            "title": published_version['id'],
-        }
-        html_string = render_to_string('empty-inspection.html', context=context)
-        fileName = '{}-{}-{}.pdf'.format(airport.code, published_version['id'].replace(' ', '-'), random.randint(0,999999))
-        key = '/tmp/'+fileName
-        html = HTML(string=html_string)
-        html.write_pdf(target=key)
-        bucket = settings.ATTACHMENTS_BUCKET_NAME
-        client = boto3.client('s3', config =Config(signature_version='s3v4'))
+        version = Inspection.objects.get(id=pk, form__airport=airport)
         try:
-            client.upload_file(key,bucket,'inspections/'+fileName)
-            os.remove(key)
-            url = client.generate_presigned_url('get_object', 
-                    Params={
-                        'Bucket':bucket,
-                        'Key':'inspections/'+fileName
-                    },
-                    ExpiresIn = settings.EXPIRY_FOR_EXPORT_DOCUMENT
-                )  
+            url = get_presigned_url(get_blank_inspection_pdf(version, airport))
         except Exception as e:
             logger.error("there was an error trying to upload file")
-        
+            return HttpResponse(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
         return HttpResponse(url)
 
 class ExportDataViewSet(viewsets.GenericViewSet):
@@ -765,54 +852,12 @@ class ExportDataViewSet(viewsets.GenericViewSet):
     @action(detail=True, methods=['get'])
     def inspection_data(self, request, pk):
         airport = Airport.objects.filter(id=request.user.aerosimple_user.airport_id).first()
-        insp_answer = InspectionAnswer.objects.filter(id=self.kwargs.get('pk')).last().response
-        inspection_id = InspectionAnswer.objects.filter(id=self.kwargs.get('pk')).last().inspection_id
-        inspection_date = InspectionAnswer.objects.filter(id=self.kwargs.get('pk')).last().inspection_date
-        weather_conditions = InspectionAnswer.objects.filter(id=self.kwargs.get('pk')).last().weather_conditions
-        inspected = InspectionAnswer.objects.filter(id=self.kwargs.get('pk')).last().inspected_by
-        inspection_type = InspectionAnswer.objects.filter(id=self.kwargs.get('pk')).last().inspection_type
-        issues = InspectionAnswer.objects.filter(id=self.kwargs.get('pk')).last().issues
-        published_version = Inspection.objects.get(id=inspection_id).schema
-        remarks = Remark.objects.filter(answer_id=self.kwargs.get('pk')).all()
-        work_orders = WorkOrder.objects.filter(
-                    form__form__airport=request.user.aerosimple_user.airport
-                ).exclude(status=COMPLETED).order_by('id')
-        logger.info(work_orders)  
-        context = {
-            'airport': airport,
-            'work_orders':work_orders,
-            'insp_answer': insp_answer,
-            'weather_conditions': weather_conditions,
-            'issues': issues,
-            'remarks': remarks,
-            'inspected': inspected,
-            'inspection_type': inspection_type,
-            'inspection_date': inspection_date,
-            "pages": published_version['pages'],
-            "fields": published_version['fields'],
-            "sections": published_version['sections'],
-            "titles": published_version['id'],
-            "self_inspection": (airport.safety_self_inspection)
-        }
-        html_string = render_to_string('inspection-data.html', context=context)
-        fileName = '{}-{}-with-data-{}.pdf'.format(airport.code, published_version['id'].replace(' ', '-'), random.randint(0,999999))
-        key = '/tmp/'+fileName
-        html = HTML(string=html_string)
-        html.write_pdf(target=key)
-        bucket = settings.ATTACHMENTS_BUCKET_NAME
-        client = boto3.client('s3', config =Config(signature_version='s3v4'))
+        document = inspection_data_document(pk, airport)
         try:
-            client.upload_file(key, bucket, 'inspections/'+fileName)
-            os.remove(key)
-            url = client.generate_presigned_url('get_object', 
-                    Params={
-                        'Bucket':bucket,
-                        'Key':'inspections/'+fileName
-                    },
-                    ExpiresIn = settings.EXPIRY_FOR_EXPORT_DOCUMENT
-                )  
+            url = get_presigned_url(store_pdf(document))
         except Exception as e:
             logger.error("there was an error trying to upload file")
+            return HttpResponse(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         return HttpResponse(url)
 
@@ -835,7 +880,7 @@ class InspectionTypeViewSet(viewsets.ModelViewSet):
             user_inspections = InspectionParent.objects.filter(
                 airport__id=self.request.user.aerosimple_user.airport_id)
 
-            return user_inspections.filter(versions__status=PUBLISHED)
+            return user_inspections.filter(published_version__isnull=False)
 
         return InspectionParent.objects.none()
 
@@ -860,7 +905,7 @@ class MobileInspectionTypeViewSet(mixins.ListModelMixin,
             user_inspections = InspectionParent.objects.filter(
                 airport__id=self.request.user.aerosimple_user.airport_id)
 
-            return user_inspections.filter(versions__status=PUBLISHED)
+            return user_inspections.filter(published_version__isnull=False)
 
         return InspectionParent.objects.none()
 
@@ -874,7 +919,7 @@ class MobileInspectionTypeViewSet(mixins.ListModelMixin,
 class ImagesDataViewSet(viewsets.ViewSet):
 
     def list(self,request):
-        file_list = ListFiles(client)
+        file_list = ListFiles()
         image_list = []
         for file in file_list:
             if 'icon' in file:
@@ -882,7 +927,7 @@ class ImagesDataViewSet(viewsets.ViewSet):
         return Response({'items':image_list,'status': {'code':status.HTTP_200_OK,'message':'success'}})
 
     def retrieve(self, request, pk):
-        file_list = ListFiles(client)
+        file_list = ListFiles()
         image_list = []
         for file in file_list:
             if 'icon' in file:
@@ -911,7 +956,7 @@ class MobileInspectionAnswersViewSet(mixins.ListModelMixin,
             results = InspectionAnswer.objects.filter(
                 inspection__form__airport_id=airport_id,
                 status=1
-            ).order_by('date')
+            ).select_related('inspection').order_by('date')
             
             if filter_date:
                 results = results.filter(inspection_date__gte=filter_date)
@@ -933,103 +978,81 @@ class SafetySelfInspectionViewSet(viewsets.ViewSet):
 
     def list(self, request):
         if self.request.user:
-            airport = Airport.objects.get(
-                id=self.request.user.aerosimple_user.airport_id
-            )
-            res = MobileInspectionDetailEditSerializer(airport.safety_self_inspection)
-            res_type = airport.types_for_self_inspection
-            form_data = res.data
-            schema = form_data['form']['schema']
-            items = []
-            sub_category_list = []
-            category_asset_list = []
-            for field in schema['fields']:    
-                field_dict = {}
-                if field['type'] == 'inspection':
-                    field_dict['id'] = field['id']
-                    field_dict['name'] = field['title']
-                    check_list = field['checklist']
-                    field_obj = []
-                    for fld_list in check_list:
-                        field_obj.append(fld_list['key'])
-                        sub_category_list.append({'id':fld_list['key'],'name':fld_list['value']})
-                    field_dict['sub-category'] = field_obj
-                    items.append(field_dict)
-            res_type_id = 1
-            if res_type:
-                for key, value in res_type.items():
-                    for item in items:
-                        if(item['id'] == key):
-                            name = item['name']
-                    for k, v in value.items():
-                        res_type_dict = {
-                            'id':res_type_id,
-                            'category':key,
-                            'subCategory':k,
-                            'assetType':v,
-                            'comment':name+':'+v
-                            }
-                        res_type_id += 1
-                        category_asset_list.append(res_type_dict)
-
-            return Response({'category':{'items':items},'sub-category':{'items':sub_category_list},\
-                'category-assets':{'items':category_asset_list},
-                'status':{'code':status.HTTP_200_OK,'message':'success'}})
+            index = get_self_inspection_index(
+                self.request.user.aerosimple_user.airport_id)
+            return Response(dict(index, status={
+                'code': status.HTTP_200_OK, 'message': 'success'}))
 
         return InspectionParent.objects.none()
 
 
 class AllImagesViewSet(viewsets.ViewSet):
+    """
+    Images of the airport of the user, for the mobile app to keep a copy.
+
+    Lists at most PAGE_SIZE images per response. The returned 'cursor' is
+    passed as 'since' to get the next page while 'more' is true, and after
+    that to get only what changed: new or changed images in 'items' and the
+    ids of the removed ones in 'deleted'. Responses carry an ETag, so a
+    device that is up to date gets a 304.
+    """
+    PAGE_SIZE = 500
 
     def list(self, request):
-        airport = Airport.objects.all()
-        images_list = []
-        for data in airport:
-            if data.logo:
-                images_list.append({
-                    'id':"airport_"+ data.code,
-                    'title':data.name,
-                    'path':data.logo.url,
-                    'type':'airport'
-                })
-        asset_image = AssetImage.objects.all()
-        for data in asset_image:
-            if data.image:
-                images_list.append({
-                    'id':"asset_image_"+ str(data.id),
-                    'title':data.asset.name,
-                    'path':data.image.url,
-                    'type':'assets'
-                })
-        asset_type = AssetType.objects.all()
-        for data in asset_type:
-            if data.icon:
-                images_list.append({
-                    'id':"asset_type_"+ str(data.id),
-                    'title':data.name,
-                    'path':data.icon.url,
-                    'type':'asset_types'
-                })
-        user_data = AerosimpleUser.objects.all()
-        for data in user_data:
-            if data.image:
-                images_list.append({
-                    'id':"user_"+ data.user.username,
-                    'title':data.first_name,
-                    'path':data.image.url,
-                    'type':'userProfile'
-                })
-        work_order = WorkOrderImage.objects.all()
-        for data in work_order:
-            if data.image:
-                images_list.append({
-                    'id':"workorder_" + str(data.id),
-                    'title':data.work_order.category + ' - ' + data.work_order.subcategory,
-                    'path':data.image.url,
-                    'type':'workOrder'
-                })
-        return Response({'items':images_list, 'status':{'code':status.HTTP_200_OK,'message':'success'}})
-    
+        try:
+            since = int(request.GET.get('since', 0))
+        except ValueError:
+            return Response(
+                {'since': ["'since' must be a cursor"]},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        airport_id = request.user.aerosimple_user.airport_id
+        entries = catalog.airport_entries(airport_id)
+        last_id = entries.aggregate(last=Max('id'))['last'] or 0
+        etag = '"images-{}-{}-{}"'.format(airport_id, since, last_id)
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+
+        changes = entries.filter(id__gt=since)
+        if not since:
+            changes = changes.filter(deleted=False)
+        changes = changes[:self.PAGE_SIZE + 1].iterator()
+
+        response = StreamingHttpResponse(
+            self.stream_changes(changes, since, last_id),
+            content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+    def stream_changes(self, changes, cursor, last_id):
+        yield '{"items": ['
+        deleted = []
+        more = False
+        separator = ''
+        for count, entry in enumerate(changes):
+            if count == self.PAGE_SIZE:
+                more = True
+                break
+            cursor = entry.id
+            if entry.deleted:
+                deleted.append(entry.image_id)
+                continue
+            yield separator + json.dumps({
+                'id': entry.image_id,
+                'title': entry.title,
+                'path': default_storage.url(entry.file),
+                'type': entry.source_type
+            })
+            separator = ', '
+        if not more:
+            cursor = max(cursor, last_id)
+        yield '], ' + json.dumps({
+            'deleted': deleted,
+            'cursor': cursor,
+            'more': more,
+            'status': {'code': status.HTTP_200_OK, 'message': 'success'}
+        })[1:]
+
 
 class MobileInspectionsViewSet(viewsets.ModelViewSet,
                                 InspectionMixin):
@@ -1045,9 +1068,15 @@ class MobileInspectionsViewSet(viewsets.ModelViewSet,
                         version_qs.values('id')[:1]
                     )
                 )"""
-            return Inspection.objects.filter(form__airport__id=self.request.user.aerosimple_user.airport_id).annotate(
-                latest_version=Max('form__versions__number')
-            ).filter(number=F('latest_version'))
+            airport_id = self.request.user.aerosimple_user.airport_id
+            if self.action == 'bulk_complete_inspection':
+                # The batch is posted to the inspection, not a version
+                return InspectionParent.objects.filter(
+                    airport_id=airport_id).select_related('published_version')
+            return Inspection.objects.filter(
+                form__airport__id=airport_id,
+                form__latest_version=F('pk')
+            ).select_related('form__published_version')
         return InspectionAnswer.objects.none()
 
     def get_serializer_class(self):
@@ -1059,4 +1088,165 @@ class MobileInspectionsViewSet(viewsets.ModelViewSet,
     def get_paginated_response(self, data):
         return Response({'items': data,'status':{'code':status.HTTP_200_OK,'message':'success'}})
 
-    
+    @action(detail=True, methods=['post'])
+    def bulk_complete_inspection(self, request, pk):
+        """
+        Completes a batch of answers queued offline for the same inspection.
+        Every response is checked against one compiled form and the batch
+        is saved in a single transaction, so it is stored entirely or not
+        at all.
+        """
+        inspection = self.get_object()
+        published_version = inspection.published_version
+        if published_version is None:
+            return Response(
+                {'detail': "The inspection has no published version"},
+                status=status.HTTP_400_BAD_REQUEST)
+        answers = request.data.get('answers')
+        if not isinstance(answers, list) or len(answers) == 0:
+            return Response(
+                {'answers': ["'answers' must be a non empty list"]},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        errors = {}
+        dates = []
+        for index, answer in enumerate(answers):
+            if not isinstance(answer, dict):
+                errors[index] = ["Every answer must be an object"]
+                continue
+            if not answer.get('type'):
+                errors[index] = ["'type' field is required"]
+                continue
+            try:
+                dates.append(datetime.strptime(
+                    answer['date'], '%Y-%m-%dT%H:%M:%S.%fZ'))
+            except (KeyError, TypeError, ValueError):
+                errors[index] = [
+                    "'date' must be a date as YYYY-MM-DDTHH:MM:SS.sssZ"]
+        if errors:
+            return Response({'answers': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        form = get_compiled_form(published_version)
+        results = form.check_answers_many(
+            answer.get('response') for answer in answers)
+        for index, result in enumerate(results):
+            if result['result'] != 'OK':
+                errors[index] = result['errors']
+        if errors:
+            return Response({'answers': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        airport = request.user.aerosimple_user.airport
+        if hasattr(inspection, 'associated_airport'):
+            work_orders = list(WorkOrder.objects.filter(
+                form__form__airport=airport
+            ).exclude(status=COMPLETED).values(
+                'category_id', 'subcategory_id').distinct())
+            for index, answer in enumerate(answers):
+                error = self.check_open_work_orders(
+                    work_orders, answer['response'])
+                if error is not None:
+                    errors[index] = [error]
+        if errors:
+            return Response({'answers': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        insp_answers = InspectionAnswer.objects.filter(
+            inspection__form=inspection, inspection__form__airport=airport
+        ).in_bulk([answer.get('answer_id') for answer in answers])
+        users = AerosimpleUser.objects.filter(airport=airport).in_bulk(
+            [answer.get('inspected_by') for answer in answers])
+
+        ids = [c['id'] for c in published_version.schema['fields']
+               if c['type'] == 'inspection']
+        completed = []
+        for index, (answer, inspection_date) in enumerate(
+                zip(answers, dates)):
+            insp_answer = insp_answers.get(answer.get('answer_id'))
+            if insp_answer is None:
+                errors[index] = ["'answer_id' field is not valid"]
+                continue
+            user = users.get(answer.get('inspected_by'))
+            if user is None:
+                errors[index] = ["'Inspected by' user does not exist"]
+                continue
+
+            insp_answer.inspection = published_version
+            insp_answer.status = 1
+            insp_answer.response = answer['response']
+            insp_answer.inspected_by = user
+            insp_answer.created_by = request.user.aerosimple_user
+            insp_answer.inspection_type = answer['type']
+            insp_answer.issues = self.count_issues(ids, answer['response'])
+            self.fill_weather_conditions(
+                insp_answer, airport.code, inspection_date)
+            insp_answer.inspection_date = inspection_date
+            completed.append((insp_answer, answer.get('task_details')))
+        if errors:
+            return Response({'answers': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            update_checklist_rollups(
+                [insp_answer for insp_answer, _ in completed])
+            for insp_answer, task_details in completed:
+                insp_answer.save()
+                insp_answer.create_log_entry()
+                if task_details:
+                    self.complete_task_occurrence(task_details)
+
+        data = [{
+            'result': 'Answer updated',
+            'id': insp_answer.id,
+            'status': insp_answer.status
+        } for insp_answer, _ in completed]
+        return Response({'items': data, 'status': {
+            'code': status.HTTP_200_OK, 'message': 'success'}})
+
+
+class InspectionStatisticsViewSet(VersionStatisticsViewSet):
+    version_model = Inspection
+    answers_relation = 'inspections_answer'
+    permission_classes = [
+        IsAuthenticated, CanViewInspectionAnswers,
+        AirportHasInspectionPermission]
+
+    def get_answers(self, version):
+        # Drafts still being filled don't count
+        return version.inspections_answer.filter(status=1)
+
+
+class ChecklistItemRollupViewSet(mixins.ListModelMixin,
+                                 viewsets.GenericViewSet):
+    """
+    Daily pass/fail counts per checklist item, read from the precomputed
+    rollups instead of the answers JSON.
+    """
+    filter_class = ChecklistItemRollupFilter
+    serializer_class = ChecklistItemRollupSerializer
+
+    def get_permissions(self):
+        self.permission_classes = [
+            IsAuthenticated, CanViewInspectionAnswers,
+            AirportHasInspectionPermission]
+        return super(self.__class__, self).get_permissions()
+
+    def get_queryset(self):
+        if self.request.user:
+            return ChecklistItemRollup.objects.filter(
+                airport_id=self.request.user.aerosimple_user.airport_id
+            ).order_by('date', 'inspection', 'field_reference',
+                       'item_reference')
+        return ChecklistItemRollup.objects.none()
+
+    @action(detail=False, methods=['get'])
+    def totals(self, request):
+        """ Counts of each checklist item over the filtered period. """
+        totals = self.filter_queryset(self.get_queryset()).values(
+            'inspection', 'field_reference', 'item_reference'
+        ).annotate(
+            total_passed=Sum('passed'), total_failed=Sum('failed')
+        ).order_by('-total_failed', 'inspection', 'field_reference',
+                   'item_reference')
+        return Response(list(totals))
@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Section
+from .models import Notification, Section
 
 admin.site.register(Section)
+admin.site.register(Notification)
@@ -0,0 +1,36 @@
+# Generated by Django 2.1.3 on 2019-12-05 21:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('airport', '0045_upload_thumbnails'),
+        ('notification', '0002_auto_20190715_1418'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('object_id', models.IntegerField()),
+                ('related_id', models.IntegerField(blank=True, null=True)),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Sent'), (2, 'Failed')], default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('message_id', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('retry_date', models.DateTimeField(blank=True, null=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('sent_date', models.DateTimeField(blank=True, null=True)),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='airport.Airport')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='notification',
+            index_together={('status', 'created_date')},
+        ),
+    ]
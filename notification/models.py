@@ -1,7 +1,55 @@
 from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+from airport.models import Airport
 
 class Section(models.Model):
     section = models.CharField(max_length=255)
     class Meta:
         verbose_name = "Secttion"
         verbose_name_plural = "Sections"
+
+
+# Notification status constants
+PENDING = 0
+SENT = 1
+FAILED = 2
+SENDING = 3
+
+STATUS = (
+    (PENDING, _("Pending")),
+    (SENT, _("Sent")),
+    (FAILED, _("Failed")),
+    (SENDING, _("Sending"))
+)
+
+
+class Notification(models.Model):
+    """
+    An email waiting to be sent, written in the same transaction as the
+    change it notifies. The workers render and send it, see
+    notification.outbox.
+    """
+    kind = models.CharField(max_length=50)
+    object_id = models.IntegerField()
+    # second object some kinds need, like the maintenance of a work order
+    related_id = models.IntegerField(blank=True, null=True)
+    airport = models.ForeignKey(
+        Airport, related_name="notifications", on_delete=models.CASCADE)
+    status = models.IntegerField(choices=STATUS, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    message_id = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    # when the next attempt is due after a failed one
+    retry_date = models.DateTimeField(blank=True, null=True)
+    # when a worker claimed it for sending
+    claimed_date = models.DateTimeField(blank=True, null=True)
+    created_date = models.DateTimeField(auto_now_add=True)
+    sent_date = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        index_together = ('status', 'created_date')
+
+    def __str__(self):
+        return "{} {} ({})".format(
+            self.kind, self.object_id, self.get_status_display())
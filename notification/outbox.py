@@ -0,0 +1,150 @@
+"""
+Emails sent by the workers.
+
+The views only write a Notification in the transaction of the change it
+notifies; once committed a worker renders it with the builder of its kind
+(see notification.registry) and sends it through SES. A failed send is
+retried with an exponential backoff, and a periodic job enqueues again the
+notifications still pending whose message was lost, so a slow or failing
+SES never reaches the requests.
+
+A worker claims a notification before sending it, and sends it outside of
+any transaction. The claim is a lease: if the worker dies while sending,
+the notification can be claimed again once CLAIM_TIMEOUT went by.
+"""
+
+import datetime
+import random
+from collections import namedtuple
+
+import boto3
+from botocore.client import Config
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from backend.utils import enqueue_task
+from notification.models import Notification, PENDING, SENT, FAILED, \
+    SENDING
+
+# What the builders return: the addresses, the subject and the HTML body
+Email = namedtuple('Email', ['recipients', 'subject', 'html'])
+
+CHARSET = 'UTF-8'
+
+# Sending is attempted up to MAX_ATTEMPTS times, waiting BACKOFF seconds
+# after the first failure and twice as long after every next one.
+MAX_ATTEMPTS = 6
+BACKOFF = 30
+# Longer than a send can take with the timeouts and retries of the client
+CLAIM_TIMEOUT = datetime.timedelta(minutes=5)
+
+_client = None
+
+
+def get_client():
+    """
+    SES client of the worker process. It is made once and reused, so its
+    connections are pooled across notifications.
+    """
+    global _client
+    if _client is None:
+        _client = boto3.client(
+            'ses', region_name=settings.AWS_REGION, config=Config(
+                connect_timeout=5, read_timeout=10, max_pool_connections=10,
+                retries={'max_attempts': 2}))
+    return _client
+
+
+def email_images():
+    """ Images shared by the email templates. """
+    return {
+        'background': settings.MEDIA_URL + 'notifications/background.png',
+        'logo': settings.MEDIA_URL + 'notifications/logo.png',
+        'plane': settings.MEDIA_URL + 'notifications/plane.png',
+        'curve': settings.MEDIA_URL + 'notifications/curve.png',
+        'welcome': settings.MEDIA_URL + 'notifications/welcome-email.png',
+        'rectangle': settings.MEDIA_URL + 'notifications/Rectangle.png',
+    }
+
+
+def notify(kind, airport_id, object_id, related_id=None):
+    """
+    Writes the notification in the current transaction and has it sent
+    once the transaction commits. Not reaching the broker doesn't fail the
+    change notified.
+    """
+    notification = Notification.objects.create(
+        kind=kind, airport_id=airport_id, object_id=object_id,
+        related_id=related_id)
+    # A message lost on the way is sent by send_pending_notifications
+    enqueue_task('send_notification', notification.id)
+    return notification
+
+
+def backoff(attempts):
+    """ Seconds to wait before the next attempt, with some jitter. """
+    delay = BACKOFF * 2 ** max(attempts - 1, 0)
+    return delay + random.randint(0, BACKOFF)
+
+
+def claimable():
+    """
+    Notifications a worker can claim: the pending ones, and the ones whose
+    worker died while sending them.
+    """
+    return Notification.objects.filter(
+        Q(status=PENDING) |
+        Q(status=SENDING, claimed_date__lt=timezone.now() - CLAIM_TIMEOUT))
+
+
+def claim(notification_id):
+    """
+    Marks a notification as being sent by this worker. A single update
+    claims it, so a notification enqueued twice is only sent once.
+    Returns the notification, or None if it was claimed already.
+    """
+    claimed = claimable().filter(id=notification_id).update(
+        status=SENDING, claimed_date=timezone.now())
+    if not claimed:
+        return None
+    return Notification.objects.get(id=notification_id)
+
+
+def deliver(notification_id):
+    """
+    Renders and sends a pending notification. Returns False if there was
+    nothing to send, raises if sending failed; the notification stays
+    claimed until the failure is recorded.
+    """
+    from notification.registry import EMAIL_TYPES
+    notification = claim(notification_id)
+    if notification is None:
+        return False
+    email = EMAIL_TYPES[notification.kind](notification)
+    message_id = ''
+    if email.recipients:
+        response = get_client().send_email(
+            Destination={'ToAddresses': email.recipients},
+            Message={
+                'Body': {'Html': {'Charset': CHARSET, 'Data': email.html}},
+                'Subject': {'Charset': CHARSET, 'Data': email.subject},
+            },
+            Source=settings.EMAIL_HOST_USER,
+            ConfigurationSetName=settings.CONFIGURATION_SET,
+        )
+        message_id = response['MessageId']
+    Notification.objects.filter(id=notification_id).update(
+        status=SENT, message_id=message_id, attempts=F('attempts') + 1,
+        retry_date=None, sent_date=timezone.now())
+    return True
+
+
+def record_failure(notification_id, error, retry_date=None):
+    """
+    Counts a failed attempt of a notification, which is retried at
+    retry_date or, without one, marked as failed.
+    """
+    Notification.objects.filter(id=notification_id).update(
+        attempts=F('attempts') + 1, error=str(error), retry_date=retry_date,
+        status=PENDING if retry_date else FAILED)
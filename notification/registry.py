@@ -0,0 +1,12 @@
+from tasks.emails import task_email
+from work_orders.emails import maintenance_email, operation_email, \
+    workorder_email
+
+# The builder of each kind of notification receives the Notification and
+# returns the outbox.Email to send.
+EMAIL_TYPES = {
+    'task': task_email,
+    'workorder': workorder_email,
+    'maintenance': maintenance_email,
+    'operation': operation_email,
+}
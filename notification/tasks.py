@@ -0,0 +1,56 @@
+import datetime
+import logging
+
+from celery import shared_task
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
+from django.utils import timezone
+
+from notification import outbox
+from notification.models import SENDING
+
+logger = logging.getLogger('backend')
+
+# Pending notifications not sent this long after they were due are
+# enqueued again
+RELAY_AFTER = datetime.timedelta(minutes=15)
+
+
+@shared_task(name='send_notification', bind=True,
+             max_retries=outbox.MAX_ATTEMPTS - 1)
+def send_notification(self, notification_id):
+    """ Sends a notification, retrying with a backoff if SES fails. """
+    try:
+        outbox.deliver(notification_id)
+    except ObjectDoesNotExist as e:
+        # What it notifies was deleted in the meantime
+        outbox.record_failure(notification_id, e)
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            logger.error("Notification {} failed: {}".format(
+                notification_id, e))
+            outbox.record_failure(notification_id, e)
+            return
+        countdown = outbox.backoff(self.request.retries + 1)
+        logger.warning("Notification {} failed, retrying in {}s: {}".format(
+            notification_id, countdown, e))
+        outbox.record_failure(
+            notification_id, e,
+            retry_date=timezone.now() + datetime.timedelta(seconds=countdown))
+        raise self.retry(exc=e, countdown=countdown)
+
+
+@shared_task(name='send_pending_notifications')
+def send_pending_notifications():
+    """
+    Enqueues again the notifications whose message was lost, and the ones
+    whose worker died while sending them.
+    """
+    since = timezone.now() - RELAY_AFTER
+    pending = outbox.claimable().filter(
+        Q(status=SENDING) |
+        Q(retry_date__isnull=True, created_date__lt=since) |
+        Q(retry_date__lt=since)
+    ).order_by('created_date').values_list('id', flat=True)[:500]
+    for notification_id in pending:
+        send_notification.delay(notification_id)
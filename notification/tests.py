@@ -1,3 +1,107 @@
+import datetime
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+
+from notification import outbox
+from notification.models import Notification, PENDING, SENT, FAILED, \
+    SENDING
+from notification.tasks import send_notification, send_pending_notifications
+from users.factories import AirportFactory
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.airport = AirportFactory()
+        self.notification = Notification.objects.create(
+            kind='test', object_id=1, airport=self.airport)
+
+        patcher = mock.patch.dict('notification.registry.EMAIL_TYPES', {
+            'test': lambda n: outbox.Email(['john@bcn.aero'], 'Test', '<p>')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = mock.Mock(**{
+            'send_email.return_value': {'MessageId': 'message-1'}})
+        patcher = mock.patch(
+            'notification.outbox.get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self):
+        send_notification.apply(args=[self.notification.id])
+        self.notification.refresh_from_db()
+
+    def test_send(self):
+        self.send()
+        self.assertEqual(self.notification.status, SENT)
+        self.assertEqual(self.notification.message_id, 'message-1')
+        self.assertEqual(self.notification.attempts, 1)
+
+        # Enqueued twice, it is only sent once
+        self.send()
+        self.assertEqual(self.client.send_email.call_count, 1)
+
+    def test_claimed_not_sent_twice(self):
+        self.assertIsNotNone(outbox.claim(self.notification.id))
+        self.assertFalse(outbox.deliver(self.notification.id))
+        self.assertFalse(self.client.send_email.called)
+
+        # The claim of a worker that died is taken over
+        Notification.objects.filter(id=self.notification.id).update(
+            claimed_date=timezone.now() - outbox.CLAIM_TIMEOUT)
+        self.assertTrue(outbox.deliver(self.notification.id))
+        self.assertEqual(self.client.send_email.call_count, 1)
+
+    def test_retry(self):
+        self.client.send_email.side_effect = [
+            Exception('Throttling'), {'MessageId': 'message-2'}]
+        with mock.patch('notification.outbox.backoff', return_value=0):
+            self.send()
+        self.assertEqual(self.notification.status, SENT)
+        self.assertEqual(self.notification.message_id, 'message-2')
+        self.assertEqual(self.notification.attempts, 2)
+        self.assertEqual(self.notification.error, 'Throttling')
+
+    def test_failed_after_max_attempts(self):
+        self.client.send_email.side_effect = Exception('Throttling')
+        with mock.patch('notification.outbox.backoff', return_value=0):
+            self.send()
+        self.assertEqual(self.notification.status, FAILED)
+        self.assertEqual(self.notification.attempts, outbox.MAX_ATTEMPTS)
+        self.assertEqual(
+            self.client.send_email.call_count, outbox.MAX_ATTEMPTS)
+
+    def test_notify_without_broker(self):
+        with mock.patch('backend.utils.transaction.on_commit',
+                        side_effect=lambda send: send()), \
+                mock.patch('backend.utils.current_app') as app:
+            app.send_task.side_effect = OSError('Connection refused')
+            notification = outbox.notify('test', self.airport.id, 2)
+        app.send_task.assert_called_once_with(
+            'send_notification', args=(notification.id,))
+        # Left pending for send_pending_notifications
+        self.assertEqual(notification.status, PENDING)
+
+    def test_relay(self):
+        long_ago = timezone.now() - datetime.timedelta(hours=1)
+        lost = Notification.objects.create(
+            kind='test', object_id=2, airport=self.airport)
+        abandoned = Notification.objects.create(
+            kind='test', object_id=3, airport=self.airport, status=SENDING,
+            claimed_date=long_ago)
+        Notification.objects.create(
+            kind='test', object_id=4, airport=self.airport, status=SENDING,
+            claimed_date=timezone.now())
+        Notification.objects.create(
+            kind='test', object_id=5, airport=self.airport, status=SENT)
+        Notification.objects.filter(id__in=[lost.id, abandoned.id]).update(
+            created_date=long_ago)
 
-# Create your tests here.
+        with mock.patch.object(send_notification, 'delay') as delay:
+            send_pending_notifications()
+        self.assertEqual(
+            sorted(c[0][0] for c in delay.call_args_list),
+            [lost.id, abandoned.id])
+        self.assertEqual(
+            Notification.objects.get(id=lost.id).status, PENDING)
@@ -2,7 +2,7 @@ from django.db import models
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
-from forms.models import Form, Version, Answer
+from forms.models import Form, Version, Answer, version_pointer
 from users.models import AerosimpleUser
 
 
@@ -38,6 +38,8 @@ class LogForm(Form):
         "airport.Airport", related_name="log_form",
         on_delete=models.CASCADE
     )
+    published_version = version_pointer('LogVersion')
+    latest_version = version_pointer('LogVersion')
 
 
 class LogVersion(Version):
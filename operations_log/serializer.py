@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from operations_log.models import Log, LogVersion
-from forms.utils import PUBLISHED
+from forms.utils import PUBLISHED, get_compiled_form
 from pulpoforms.forms import Form as PulpoForm
 from users.serializers import AerosimpleUserSimpleSerializer
 from operations_log.models import LogType, LogSubType
@@ -19,12 +19,12 @@ class LogSerializer(serializers.ModelSerializer):
     def validate(self, data):
         user = self.context['request'].user
         if self.instance:
-            form = PulpoForm(self.instance.form.schema)
+            form = get_compiled_form(self.instance.form)
         else:
             published_version = LogVersion.objects.filter(
                 form__airport__id=user.aerosimple_user.airport_id,
                 status=PUBLISHED).first()
-            form = PulpoForm(published_version.schema)
+            form = get_compiled_form(published_version)
         result = form.check_answers(data['response'])
 
         if result['result'] != 'OK':
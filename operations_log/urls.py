@@ -1,9 +1,11 @@
 from rest_framework import routers
-from operations_log.views import LogViewSet
+from operations_log.views import LogViewSet, LogStatisticsViewSet
 
 
 router = routers.SimpleRouter()
 router.register(r'operations_logs', LogViewSet, base_name='operations_logs')
+router.register(r'operations_log_statistics', LogStatisticsViewSet,
+                base_name='operations_log_statistics')
 
 router.register(r'mobile/operations_logs', LogViewSet, base_name='mobile_operations_logs')
 
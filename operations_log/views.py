@@ -1,6 +1,7 @@
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from forms.utils import DRAFT, PUBLISHED
+from forms.views import VersionStatisticsViewSet
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
@@ -192,3 +193,9 @@ class LogViewSet(viewsets.ModelViewSet):
         toDeleteSub.delete()
 
         return Response(status=status.HTTP_200_OK)
+
+
+class LogStatisticsViewSet(VersionStatisticsViewSet):
+    version_model = LogVersion
+    answers_relation = 'operation_logs'
+    permission_classes = [IsAuthenticated, CanViewOperationLog]
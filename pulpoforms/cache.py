@@ -0,0 +1,71 @@
+"""
+Compiled Form Cache
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from copy import deepcopy
+
+from pulpoforms.forms import Form
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def schema_hash(schema):
+    """ Returns a stable content hash for a schema dictionary. """
+    content = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class FormCache:
+    """
+    Process-local LRU of compiled Form objects.
+
+    Entries are keyed by an optional caller supplied key (usually the
+    identity of a published version) plus the content hash of the schema,
+    so a schema edited in place is never answered with a stale form.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._forms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema, key=None):
+        """
+        Returns the compiled Form for the schema, building it on a miss.
+        """
+        cache_key = (key, schema_hash(schema))
+        with self._lock:
+            form = self._forms.get(cache_key)
+            if form is not None:
+                self._forms.move_to_end(cache_key)
+                self.hits += 1
+                return form
+            self.misses += 1
+
+        # The form keeps a private copy of the schema so later changes to
+        # the caller's dictionary can't leak into the cached object.
+        form = Form(deepcopy(schema))
+
+        with self._lock:
+            self._forms[cache_key] = form
+            self._forms.move_to_end(cache_key)
+            while len(self._forms) > self.maxsize:
+                self._forms.popitem(last=False)
+        return form
+
+    def clear(self):
+        with self._lock:
+            self._forms.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.maxsize, len(self._forms))
@@ -1,13 +1,12 @@
 """Field Classes."""
 
 import re
-from math import floor
-from copy import copy
 import logging
 
 from pulpoforms.exceptions import FieldError, ConditionError, ValidationError
 from pulpoforms.factories import ConditionFactory, ValidatorFactory, \
     FieldFactory
+from pulpoforms.statistics import integer_partitions
 
 logger = logging.getLogger('pulpo_forms')
 
@@ -108,7 +107,8 @@ class Field:
         cls.allowed_validators.add(key)
 
     @classmethod
-    def add_statistic_data(cls, stat_template, value):
+    def add_statistic_data(cls, stat_template, value, count=1):
+        # Add 'count' answers giving the value to the statistic template
         pass
 
     def validate_value(self, value):
@@ -196,9 +196,9 @@ class ListField(Field):
             raise FieldError(errors)
 
     @classmethod
-    def add_statistic_data(cls, stat_template, value):
-        stat_template['options'][value]['count'] += 1
-        stat_template['count'] += 1
+    def add_statistic_data(cls, stat_template, value, count=1):
+        stat_template['options'][value]['count'] += count
+        stat_template['count'] += count
 
         return stat_template
 
@@ -330,11 +330,12 @@ class BooleanField(Field):
     }
 
     @classmethod
-    def add_statistic_data(cls, stat_template, value):
+    def add_statistic_data(cls, stat_template, value, count=1):
         if value:
-            stat_template['true'] += 1
+            stat_template['true'] += count
         else:
-            stat_template['false'] += 1
+            stat_template['false'] += count
+        stat_template['count'] += count
 
         return stat_template
 
@@ -385,58 +386,13 @@ class NumberField(Field):
     }
 
     @classmethod
-    def add_statistic_data(cls, stat_template, value):
-        stat_template['values'].append(value)
+    def add_statistic_data(cls, stat_template, value, count=1):
+        stat_template['values'].append((value, count))
 
         return stat_template
 
     def post_process_data(self, stat_template):
-        partitions = []
-
-        values_list = stat_template['values']
-        try:
-            min_item = min(values_list)
-        except ValueError:
-            stat_template['values'] = partitions
-            return stat_template['values']
-        max_item = max(values_list)
-        partition_size = floor((max_item - min_item + 1) / 5)
-
-        initial = min_item
-        for _ in range(1, 5):
-            final = initial + partition_size
-            partition = {
-                'initial': initial,
-                'final': final,
-                'count': 0
-            }
-            partitions.append(copy(partition))
-            initial = final + 1
-
-        partition = {
-            'initial': initial,
-            'final': max_item,
-            'count': 0
-        }
-        partitions.append(copy(partition))
-
-        for value in values_list:
-            if partitions[0]['initial'] <= value <= partitions[0]['final']:
-                partitions[0]['count'] += 1
-
-            elif partitions[1]['initial'] <= value <= partitions[1]['final']:
-                partitions[1]['count'] += 1
-
-            elif partitions[2]['initial'] <= value <= partitions[2]['final']:
-                partitions[2]['count'] += 1
-
-            elif partitions[3]['initial'] <= value <= partitions[3]['final']:
-                partitions[3]['count'] += 1
-
-            elif partitions[4]['initial'] <= value <= partitions[4]['final']:
-                partitions[4]['count'] += 1
-
-        stat_template['values'] = partitions
+        stat_template['values'] = integer_partitions(stat_template['values'])
         return stat_template['values']
 
     def validate_value(self, value):
@@ -550,9 +506,9 @@ class SelectWithOtherField(ListField):
             validator.validate(value)
 
     @classmethod
-    def add_statistic_data(cls, stat_template, value):
-        stat_template['options'][value['option']]['count'] += 1
-        stat_template['count'] += 1
+    def add_statistic_data(cls, stat_template, value, count=1):
+        stat_template['options'][value['option']]['count'] += count
+        stat_template['count'] += count
 
         return stat_template
 
@@ -588,10 +544,10 @@ class MultiselectField(ListField):
     }
 
     @classmethod
-    def add_statistic_data(cls, stat_template, value):
+    def add_statistic_data(cls, stat_template, value, count=1):
         for v in value:
-            stat_template['options'][v]['count'] += 1
-            stat_template['count'] += 1
+            stat_template['options'][v]['count'] += count
+            stat_template['count'] += count
 
         return stat_template
 
@@ -2,6 +2,7 @@
 Form Classes
 """
 
+import json
 from copy import copy
 
 from pulpoforms.factories import FieldFactory, ConditionFactory
@@ -36,8 +37,14 @@ class Form:
         self.field_ids = []
         self.section_ids = []
         self.page_ids = []
+        self.dependencies = {}
+        self.dependents = {}
+        self._field_states = None
+        self._state_memo = {}
         self._errors = None
         self.full_clean()
+        if self.is_valid():
+            self._build_index()
 
     def _add_error(self, error_type, error):
         if self._errors['result'] is None:
@@ -480,122 +487,82 @@ class Form:
             success['message'] = "The answer is valid."
             return success
 
-    def check_state(self, field_id, answers):
-        field = self.fields[field_id.__str__()]
-        for sec in self.sections.values():
-            if field_id in sec.fields.keys():
-                section = sec
-                break
-        for p in self.pages.values():
-            if section.id.__str__() in p.sections.keys():
-                page = p
-                break
-        try:
-            field_hidden = field.hidden
-        except AttributeError:
-            field_hidden = False
-        try:
-            section_hidden = section.hidden
-        except AttributeError:
-            section_hidden = False
-        try:
-            page_hidden = page.hidden
-        except AttributeError:
-            page_hidden = False
-
-        try:
-            field_required = field.required
-        except AttributeError:
-            field_required = False
-
-        try:
-            field_conditionals = field.conditionals
-        except AttributeError:
-            field_conditionals = []
-
-        for conditional in field_conditionals:
-            conditions, compound = Condition.check_condition(conditional)
-            results = []
-            for condition in conditions:
-                condition_class = ConditionFactory.get_class(condition['type'])
-                cond_obj = condition_class(condition)
-                try:
-                    cond_field = answers[cond_obj.field]
-                except KeyError:
-                    cond_field = None
-                results.append(cond_obj.eval_condition(cond_field))
-            if compound:
-                result = Condition.get_condition_result(
-                    results, conditional['type'])
-            else:
-                result = Condition.get_condition_result(results, cond_obj.type)
-            if result:
-                if compound and 'hidden' in conditional['state']:
-                    field_hidden = conditional['state']['hidden']
-                elif not compound and 'hidden' in cond_obj.state:
-                    field_hidden = cond_obj.state['hidden']
-                if compound and 'required' in conditional['state']:
-                    field_required = conditional['state']['required']
-                elif not compound and 'required' in cond_obj.state:
-                    field_required = cond_obj.state['required']
-
-        try:
-            section_conditionals = section.conditionals
-        except AttributeError:
-            section_conditionals = []
-        for conditional in section_conditionals:
-            conditions, compound = Condition.check_condition(conditional)
-            results = []
-            for condition in conditions:
-                condition_class = ConditionFactory.get_class(condition['type'])
-                cond_obj = condition_class(condition)
-                try:
-                    cond_field = answers[cond_obj.field]
-                except KeyError:
-                    results.append(False)
-                    continue
-                results.append(cond_obj.eval_condition(cond_field))
-            if compound:
-                result = Condition.get_condition_result(
-                    results, conditional['type'])
-            else:
-                result = Condition.get_condition_result(results, cond_obj.type)
-            if result:
-                if compound and 'hidden' in conditional['state']:
-                    section_hidden = conditional['state']['hidden']
-                elif not compound and 'hidden' in cond_obj.state:
-                    section_hidden = cond_obj.state['hidden']
-
-        try:
-            page_conditionals = page.conditionals
-        except AttributeError:
-            page_conditionals = []
-        for conditional in page_conditionals:
-            conditions, compound = Condition.check_condition(conditional)
-            results = []
-            for condition in conditions:
-                condition_class = ConditionFactory.get_class(condition['type'])
-                cond_obj = condition_class(condition)
-                try:
-                    cond_field = answers[cond_obj.field]
-                except KeyError:
-                    results.append(False)
-                    continue
-                results.append(cond_obj.eval_condition(cond_field))
-            if compound:
-                result = Condition.get_condition_result(
-                    results, conditional['type'])
-            else:
-                result = Condition.get_condition_result(results, cond_obj.type)
-            if result:
-                if compound and 'hidden' in conditional['state']:
-                    field_hidden = conditional['state']['hidden']
-                elif not compound and 'hidden' in cond_obj.state:
-                    field_hidden = cond_obj.state['hidden']
+    def check_answers_many(self, answers_list):
+        """
+        Checks a sequence of answers against this form, yielding the result
+        of each one as soon as it is checked. Answers with keys that are not
+        part of the form yield a 'FORMAT ERROR' result instead of raising,
+        so one bad answer doesn't stop the rest of the batch.
+        """
+        for answers in answers_list:
+            try:
+                yield self.check_answers(answers)
+            except (FormatError, FieldError) as err:
+                yield {
+                    'result': 'FORMAT ERROR',
+                    'errors': list(err)
+                }
+
+    def _build_index(self):
+        """
+        Resolves the section and page of every field and compiles the
+        field, section and page conditionals into ready to call objects.
+        Also builds the dependency graph between fields, that is, which
+        answers every field state depends on.
+        """
+        section_of = {}
+        for section in self.sections.values():
+            for field_id in section.fields:
+                section_of[field_id] = section
+        page_of = {}
+        for page in self.pages.values():
+            for section_id in page.sections:
+                page_of[section_id] = page
+
+        states = {}
+        dependencies = {}
+        dependents = {}
+        for key, field in self.fields.items():
+            section = section_of[key]
+            page = page_of[section.id.__str__()]
+            state = FieldState(field, section, page)
+            states[key] = state
+            dependencies[key] = state.sources
+            for source in state.sources:
+                dependents.setdefault(source, set()).add(key)
+
+        self._field_states = states
+        self._state_memo = {}
+        self.dependencies = dependencies
+        self.dependents = dependents
 
-        # It is considered hidden if either the field,
-        # it's section or page are hidden
-        return field_hidden or section_hidden or page_hidden, field_required
+    def check_state(self, field_id, answers):
+        """
+        Returns the (hidden, required) state of a field for the given
+        answers. The result is memoized per field and only re-evaluated when
+        any of the answers it depends on changes.
+
+        Forms are shared by all the answers checked with them (see
+        pulpoforms.cache), and so is the memo. That's safe since an entry
+        is only used for the exact values of the answers it was computed
+        from, hidden answers removed by check_answers included, and it is
+        replaced as a whole by a single assignment, so concurrent checks
+        at most evaluate a state again.
+        """
+        if self._field_states is None:
+            self._build_index()
+        key = field_id.__str__()
+        state = self._field_states[key]
+        if not state.sources:
+            return state.evaluate(answers)
+
+        answer_key = state.answer_key(answers)
+        memo = self._state_memo.get(key)
+        if memo is not None and memo[0] == answer_key:
+            return memo[1]
+        result = state.evaluate(answers)
+        self._state_memo[key] = (answer_key, result)
+        return result
 
     def is_valid(self):
         """ Returns True if the form has no errors. Otherwise, False. """
@@ -616,3 +583,118 @@ class Page:
         for k, v in dictionary.items():
             setattr(self, k, v)
         self.sections = {}
+
+
+class CompiledConditional:
+    """
+    A conditional of a field, section or page with its condition objects
+    already instantiated, ready to be evaluated against an answer.
+    """
+
+    def __init__(self, conditional, missing_result=None):
+        condition_list, self.compound = Condition.check_condition(
+            conditional)
+        self.conditions = [
+            ConditionFactory.get_class(condition['type'])(condition)
+            for condition in condition_list
+        ]
+        if self.compound:
+            self.type = conditional['type']
+            self.state = conditional['state']
+        else:
+            self.type = self.conditions[0].type
+            self.state = getattr(self.conditions[0], 'state', {})
+        # Value of a clause whose field has not been answered. If None, the
+        # clause is evaluated with an empty value instead.
+        self.missing_result = missing_result
+        self.fields = set(cond.field for cond in self.conditions)
+
+    def evaluate(self, answers):
+        results = []
+        for cond in self.conditions:
+            try:
+                value = answers[cond.field]
+            except KeyError:
+                if self.missing_result is not None:
+                    results.append(self.missing_result)
+                    continue
+                value = None
+            results.append(cond.eval_condition(value))
+        return Condition.get_condition_result(results, self.type)
+
+
+class FieldState:
+    """
+    Static state of a field (including its section and page) and the
+    compiled conditionals that may change it.
+    """
+
+    def __init__(self, field, section, page):
+        self.field_hidden = getattr(field, 'hidden', False)
+        self.field_required = getattr(field, 'required', False)
+        self.section_hidden = getattr(section, 'hidden', False)
+        self.page_hidden = getattr(page, 'hidden', False)
+
+        self.field_conditionals = [
+            CompiledConditional(c)
+            for c in getattr(field, 'conditionals', [])
+        ]
+        self.section_conditionals = [
+            CompiledConditional(c, missing_result=False)
+            for c in getattr(section, 'conditionals', [])
+        ]
+        self.page_conditionals = [
+            CompiledConditional(c, missing_result=False)
+            for c in getattr(page, 'conditionals', [])
+        ]
+
+        sources = set()
+        for conditional in (self.field_conditionals +
+                            self.section_conditionals +
+                            self.page_conditionals):
+            sources.update(conditional.fields)
+        self.sources = tuple(sorted(sources, key=str))
+
+    def answer_key(self, answers):
+        """
+        Hashable snapshot of the answers this state depends on. The type is
+        part of the key since conditions compare values and their string
+        representations.
+        """
+        key = []
+        for source in self.sources:
+            try:
+                value = answers[source]
+            except KeyError:
+                key.append(None)
+                continue
+            key.append((type(value).__name__,
+                        json.dumps(value, sort_keys=True, default=str)))
+        return tuple(key)
+
+    def evaluate(self, answers):
+        field_hidden = self.field_hidden
+        field_required = self.field_required
+        section_hidden = self.section_hidden
+
+        for conditional in self.field_conditionals:
+            if conditional.evaluate(answers):
+                if 'hidden' in conditional.state:
+                    field_hidden = conditional.state['hidden']
+                if 'required' in conditional.state:
+                    field_required = conditional.state['required']
+
+        for conditional in self.section_conditionals:
+            if conditional.evaluate(answers):
+                if 'hidden' in conditional.state:
+                    section_hidden = conditional.state['hidden']
+
+        for conditional in self.page_conditionals:
+            if conditional.evaluate(answers):
+                if 'hidden' in conditional.state:
+                    field_hidden = conditional.state['hidden']
+
+        # It is considered hidden if either the field,
+        # it's section or page are hidden
+        return (field_hidden or section_hidden or self.page_hidden,
+                field_required)
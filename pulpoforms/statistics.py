@@ -0,0 +1,177 @@
+"""
+Statistics Functions
+
+Aggregate field answers in bulk. The answers come counted, as pairs of a
+distinct value and the number of answers giving it, so the work grows with
+the number of distinct values instead of the number of answers. Numbers
+are sorted once and every bin or percentile is then located by binary
+search on their running counts.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from math import floor
+from operator import mul
+
+DEFAULT_BINS = 5
+DEFAULT_PERCENTILES = (25, 50, 75)
+
+
+def _running_counts(values, presorted=False):
+    """
+    Splits the (number, count) pairs in the sorted numbers, their counts
+    and the running count of answers up to each number.
+    """
+    pairs = values if presorted else sorted(values)
+    if not pairs:
+        return (), (), []
+    numbers, counts = zip(*pairs)
+    return numbers, counts, list(accumulate(counts))
+
+
+def _count(running, start, end):
+    """ Answers of the numbers from index start to index end, excluded. """
+    if end <= start:
+        return 0
+    return running[end - 1] - (running[start - 1] if start else 0)
+
+
+def histogram(values, bins=DEFAULT_BINS, value_range=None, presorted=False):
+    """
+    Splits the range of the (number, count) pairs in 'bins' partitions of
+    equal width and counts the answers in each one. All partitions but the
+    last are half open, the last one includes its upper bound.
+    """
+    if bins < 1:
+        raise ValueError("'bins' must be a positive integer")
+    numbers, _, running = _running_counts(values, presorted)
+    if value_range is None:
+        if not numbers:
+            return []
+        value_range = (numbers[0], numbers[-1])
+    low, high = value_range
+    width = (high - low) / bins
+
+    edges = [low + width * i for i in range(bins)] + [high]
+    partitions = []
+    for i in range(bins):
+        start = bisect_left(numbers, edges[i])
+        if i == bins - 1:
+            end = bisect_right(numbers, edges[i + 1])
+        else:
+            end = bisect_left(numbers, edges[i + 1])
+        partitions.append({
+            'initial': edges[i],
+            'final': edges[i + 1],
+            'count': _count(running, start, end)
+        })
+    return partitions
+
+
+def integer_partitions(values, parts=5, presorted=False):
+    """
+    Histogram of the (number, count) pairs in 'parts' partitions with
+    inclusive integer bounds, each one starting one after the previous one
+    ends and the last one ending at the maximum.
+    """
+    numbers, _, running = _running_counts(values, presorted)
+    if not numbers:
+        return []
+    low, high = numbers[0], numbers[-1]
+    size = floor((high - low + 1) / parts)
+
+    partitions = []
+    initial = low
+    for i in range(parts):
+        final = initial + size if i < parts - 1 else high
+        start = bisect_left(numbers, initial)
+        end = bisect_right(numbers, final)
+        partitions.append({
+            'initial': initial,
+            'final': final,
+            'count': _count(running, start, end)
+        })
+        initial = final + 1
+    return partitions
+
+
+def percentiles(values, points=DEFAULT_PERCENTILES, presorted=False):
+    """
+    Returns a dictionary with the requested percentiles of the (number,
+    count) pairs, linearly interpolated between the closest ranks.
+    """
+    numbers, _, running = _running_counts(values, presorted)
+    result = {}
+    if not numbers:
+        return result
+
+    def nth(rank):
+        return numbers[bisect_right(running, rank)]
+
+    last = running[-1] - 1
+    for point in points:
+        if not 0 <= point <= 100:
+            raise ValueError(
+                "Percentile '{0}' is out of the 0-100 range".format(point))
+        rank = last * point / 100
+        lower = int(rank)
+        upper = min(lower + 1, last)
+        fraction = rank - lower
+        result[point] = nth(lower) + (nth(upper) - nth(lower)) * fraction
+    return result
+
+
+def describe(values, bins=DEFAULT_BINS, points=DEFAULT_PERCENTILES):
+    """
+    Summary of the (number, count) pairs: count, min, max, mean, histogram
+    and percentiles. The pairs are sorted only once for all of them.
+    """
+    pairs = sorted(values)
+    numbers, counts, running = _running_counts(pairs, presorted=True)
+    if not numbers:
+        return {
+            'count': 0, 'min': None, 'max': None, 'mean': None,
+            'histogram': [], 'percentiles': {}
+        }
+    return {
+        'count': running[-1],
+        'min': numbers[0],
+        'max': numbers[-1],
+        'mean': sum(map(mul, numbers, counts)) / running[-1],
+        'histogram': histogram(pairs, bins, presorted=True),
+        'percentiles': percentiles(pairs, points, presorted=True)
+    }
+
+
+def field_statistics(field, values, bins=DEFAULT_BINS,
+                     points=DEFAULT_PERCENTILES):
+    """
+    Aggregates the answers of a form field, given as (value, count) pairs.
+    The values of number fields must be numbers; they are described with
+    a histogram and percentiles. Any other field uses the statistic
+    template and hooks of its class, once per distinct value. Answers that
+    don't fit the template are counted as invalid instead of raising.
+    """
+    values = [(v, c) for v, c in values if v is not None and v != '']
+    answered = sum(c for _, c in values)
+    if field.type == 'number':
+        result = describe(values, bins, points)
+        result['answered'] = answered
+        return result
+
+    template, post_process = field.get_statistic_template()
+    result = {'answered': answered}
+    if template is None:
+        return result
+
+    invalid = 0
+    for value, count in values:
+        try:
+            field.add_statistic_data(template, value, count)
+        except (KeyError, TypeError, AttributeError):
+            invalid += count
+    if post_process:
+        field.post_process_data(template)
+    result.update(template)
+    result['invalid'] = invalid
+    return result
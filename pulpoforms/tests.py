@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from itertools import product
+
+from django.test import SimpleTestCase
+
+from pulpoforms.cache import CacheInfo, FormCache, schema_hash
+from pulpoforms.forms import Form
+
+# 'b' is hidden by 'a', 'c' is required by 'b' and the section of 'd' is
+# hidden by 'c', so the state of each field depends on the previous one.
+SCHEMA = {
+    'id': 'chained',
+    'version': 1,
+    'fields': [
+        {'type': 'string', 'id': 'a', 'title': 'A', 'required': True},
+        {'type': 'string', 'id': 'b', 'title': 'B', 'required': False,
+         'conditionals': [{'type': 'equals', 'field': 'a', 'value': 'no',
+                           'state': {'hidden': True}}]},
+        {'type': 'number', 'id': 'c', 'title': 'C', 'required': False,
+         'conditionals': [{'type': 'notEmpty', 'field': 'b',
+                           'state': {'required': True}}]},
+        {'type': 'string', 'id': 'd', 'title': 'D', 'required': True},
+    ],
+    'sections': [
+        {'id': 's1', 'title': 'S1', 'fields': ['a', 'b', 'c']},
+        {'id': 's2', 'title': 'S2', 'fields': ['d'],
+         'conditionals': [{'type': 'greater', 'field': 'c', 'value': 3,
+                           'state': {'hidden': True}}]},
+    ],
+    'pages': [{'id': 'p1', 'title': 'P1', 'sections': ['s1', 's2']}],
+}
+
+
+def titled(title):
+    schema = deepcopy(SCHEMA)
+    schema['fields'][0]['title'] = title
+    return schema
+
+
+class FormCacheTestCase(SimpleTestCase):
+    def test_counters(self):
+        cache = FormCache()
+        form = cache.get(SCHEMA)
+        self.assertTrue(form.is_valid())
+        self.assertIs(cache.get(deepcopy(SCHEMA)), form)
+        self.assertEqual(cache.info(), CacheInfo(1, 1, 128, 1))
+
+        cache.clear()
+        self.assertEqual(cache.info(), CacheInfo(0, 0, 128, 0))
+        self.assertIsNot(cache.get(SCHEMA), form)
+
+    def test_schema_hash_key(self):
+        self.assertEqual(schema_hash(SCHEMA), schema_hash(deepcopy(SCHEMA)))
+        self.assertNotEqual(schema_hash(SCHEMA), schema_hash(titled('A2')))
+
+        cache = FormCache()
+        schema = deepcopy(SCHEMA)
+        form = cache.get(schema, key='version:1')
+        # The same schema under another key is another entry
+        self.assertIsNot(cache.get(schema, key='version:2'), form)
+        # A schema edited in place is never answered with the old form
+        schema['fields'][0]['title'] = 'A2'
+        edited = cache.get(schema, key='version:1')
+        self.assertIsNot(edited, form)
+        self.assertEqual(edited.fields['a'].title, 'A2')
+        # The cached form keeps its own copy of the schema
+        self.assertEqual(form.schema['fields'][0]['title'], 'A')
+        self.assertEqual(cache.info(), CacheInfo(0, 3, 128, 3))
+
+    def test_lru_eviction(self):
+        cache = FormCache(maxsize=2)
+        first = cache.get(titled('first'))
+        cache.get(titled('second'))
+        # Used last, so the second one is evicted instead
+        self.assertIs(cache.get(titled('first')), first)
+        cache.get(titled('third'))
+        self.assertEqual(cache.info(), CacheInfo(1, 3, 2, 2))
+
+        self.assertIs(cache.get(titled('first')), first)
+        cache.get(titled('second'))
+        self.assertEqual(cache.info(), CacheInfo(2, 4, 2, 2))
+
+
+class CheckStateTestCase(SimpleTestCase):
+    def setUp(self):
+        self.form = Form(deepcopy(SCHEMA))
+
+    def states(self, answers, form=None):
+        form = form or self.form
+        return {key: form.check_state(key, answers) for key in 'abcd'}
+
+    def test_chained_conditionals(self):
+        # (hidden, required) of every field, as evaluated before the memo
+        self.assertEqual(self.states({'a': 'yes', 'b': 'x', 'c': 5}), {
+            'a': (False, True), 'b': (False, False), 'c': (False, True),
+            'd': (True, True)})
+        self.assertEqual(self.states({'a': 'no', 'b': 'x', 'c': 5}), {
+            'a': (False, True), 'b': (True, False), 'c': (False, True),
+            'd': (True, True)})
+        self.assertEqual(self.states({'a': 'yes', 'c': 2}), {
+            'a': (False, True), 'b': (False, False), 'c': (False, False),
+            'd': (False, True)})
+
+        # 'c' is required by 'b'
+        result = self.form.check_answers({'a': 'yes', 'b': 'x', 'd': 'y'})
+        self.assertEqual([e['id'] for e in result['errors']], ['c'])
+        # Unless 'b' is hidden, and so removed before 'c' is checked
+        result = self.form.check_answers({'a': 'no', 'b': 'x', 'd': 'y'})
+        self.assertEqual(result['result'], 'OK')
+
+    def test_shared_memo(self):
+        combinations = [
+            {k: v for k, v in zip('abc', values) if v is not None}
+            for values in product(
+                ['yes', 'no', None], ['x', '', None], [2, 5, 5.0, None])]
+        expected = [self.states(answers, Form(deepcopy(SCHEMA)))
+                    for answers in combinations]
+        # Checked in any order with the same form, as the cache does
+        for answers, states in list(zip(combinations, expected)) * 2:
+            self.assertEqual(self.states(answers), states)
+
+        def check(answers):
+            return self.form.check_answers(dict(answers, d='y'))
+        expected = [Form(deepcopy(SCHEMA)).check_answers(dict(answers, d='y'))
+                    for answers in combinations]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(check, combinations * 4))
+        self.assertEqual(results, expected * 4)
@@ -55,6 +55,8 @@ virtualenv $DIR/venv --python=python3.7
 source $DIR/venv/bin/activate
 pip install -r $DIR/requirements.txt
 $DIR/manage.py migrate
+$DIR/manage.py createcachetable
+$DIR/manage.py reconcile_media_index
 # Create an admin when deploying for the first time
 echo "from django.contrib.auth.models import User; import os; User.objects.create_superuser('admin', 'admin@unosimple.com', os.environ.get('DJANGO_ADMIN_PASSWORD','admin123')) if len(User.objects.filter(email='admin@unosimple.com')) == 0 else print('Admin exists')"|$DIR/manage.py shell
 # We need the so, Lambda env does not contaon it.
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from tasks.models import Task, TaskOccurrence
+from tasks.models import Task, TaskOccurrence, ScheduledOccurrence
 
 admin.site.register(Task)
 admin.site.register(TaskOccurrence)
+admin.site.register(ScheduledOccurrence)
@@ -0,0 +1,23 @@
+from django.template.loader import render_to_string
+
+from notification.outbox import Email, email_images
+from tasks.models import Task
+from users import recipients
+
+
+def task_email(notification):
+    """ Email to the user or the role a new task is assigned to. """
+    task = Task.objects.select_related('assigned_user__user').get(
+        id=notification.object_id)
+    if task.assigned_user:
+        emails = [task.assigned_user.user.email]
+    else:
+        emails = recipients.role_emails(
+            notification.airport_id, task.assigned_role_id, active_only=True)
+
+    context = {
+        'images': email_images(),
+        'task': task,
+    }
+    html_string = render_to_string('task assigned.html', context=context)
+    return Email(emails, 'Task', html_string)
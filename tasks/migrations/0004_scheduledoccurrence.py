@@ -0,0 +1,35 @@
+# Generated by Django 2.1.3 on 2019-12-05 19:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0011_event_calendar_not_null'),
+        ('tasks', '0003_task_airport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='scheduled_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ScheduledOccurrence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_start', models.DateTimeField()),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('occurrence', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='scheduled_occurrence', to='schedule.Occurrence')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_occurrences', to='tasks.Task')),
+            ],
+            options={
+                'unique_together': {('task', 'original_start')},
+                'index_together': {('task', 'start')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.3 on 2019-12-05 20:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_scheduledoccurrence'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='taskoccurrence',
+            index_together={('task', 'completed')},
+        ),
+    ]
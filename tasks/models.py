@@ -1,7 +1,14 @@
 from django.db import models
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 from schedule.models import Event, Occurrence
 
+from tasks import occurrences
+
+# Fields of a task its occurrences depend on
+SCHEDULE_FIELDS = ('start', 'end', 'rule_id', 'end_recurring_period')
+
 
 class Task(Event):
     due_date = models.DateField(blank=True, null=True)
@@ -17,6 +24,9 @@ class Task(Event):
     )
     airport = models.ForeignKey(
         'airport.Airport', related_name='tasks', on_delete=models.CASCADE, null=True)
+    # end of the stored scheduled occurrences, see tasks.occurrences
+    scheduled_until = models.DateTimeField(
+        blank=True, null=True, editable=False)
 
     def __str__(self):
         return "{}".format(self.title)
@@ -30,3 +40,54 @@ class TaskOccurrence(models.Model):
     occurrence = models.OneToOneField(
         Occurrence, related_name="task_occurrences", on_delete=models.CASCADE
     )
+
+    class Meta:
+        index_together = ('task', 'completed')
+
+
+class ScheduledOccurrence(models.Model):
+    """
+    Occurrence of a task stored ahead of time, so overdue and upcoming
+    tasks are range queries instead of expanding the recurrence rules on
+    every request. Points to the persisted occurrence once there is one,
+    which is the one that can be completed, moved or cancelled.
+    """
+    task = models.ForeignKey(
+        Task, related_name="scheduled_occurrences", on_delete=models.CASCADE)
+    original_start = models.DateTimeField()
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    occurrence = models.OneToOneField(
+        Occurrence, related_name="scheduled_occurrence", null=True,
+        blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        unique_together = ('task', 'original_start')
+        index_together = ('task', 'start')
+
+    def __str__(self):
+        return "{} ({})".format(self.task_id, self.start)
+
+
+@receiver(pre_save, sender=Task, dispatch_uid="task_schedule_changed")
+def check_schedule_changed(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).values_list(
+        *SCHEDULE_FIELDS).first() if instance.pk else None
+    instance._schedule_changed = previous is not None and previous != tuple(
+        getattr(instance, f) for f in SCHEDULE_FIELDS)
+
+
+@receiver(post_save, sender=Task, dispatch_uid="task_scheduled_occurrences")
+def reset_scheduled_occurrences(sender, instance, raw=False, **kwargs):
+    if not raw and getattr(instance, '_schedule_changed', False):
+        occurrences.reset(instance.pk)
+
+
+@receiver(post_save, sender=Occurrence,
+          dispatch_uid="occurrence_scheduled_occurrence")
+def update_scheduled_occurrence(sender, instance, raw=False, **kwargs):
+    # A persisted occurrence replaces the stored one it originated from
+    if not raw:
+        ScheduledOccurrence.objects.filter(
+            task_id=instance.event_id, original_start=instance.original_start
+        ).update(start=instance.start, end=instance.end, occurrence=instance)
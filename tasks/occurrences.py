@@ -0,0 +1,133 @@
+"""
+Stored occurrences of the tasks.
+
+Expanding the recurrence rule of a task from its start on every request
+gets slower every day it recurs, so the occurrences are stored instead,
+up to a window ahead that a periodic job keeps moving and that queries
+further ahead extend. The persisted occurrences of django-scheduler stay
+the source of truth for the occurrences that were completed, moved or
+cancelled; the stored ones just point to them.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# How far ahead the occurrences are stored
+WINDOW = datetime.timedelta(days=60)
+
+
+def _aware(value):
+    # Naive dates are taken as UTC, like django-scheduler periods do
+    if timezone.is_naive(value):
+        return timezone.make_aware(value, timezone.utc)
+    return value
+
+
+def store(task, until):
+    """ Stores the occurrences of the task starting before until. """
+    from tasks.models import ScheduledOccurrence, Task
+    until = _aware(until)
+    with transaction.atomic():
+        # Tasks are scheduled one at a time so the ranges don't overlap
+        task = Task.objects.select_for_update(of=('self',)).select_related(
+            'rule').get(pk=task.pk)
+        if task.scheduled_until is not None and task.scheduled_until >= until:
+            return
+        # Tasks without a rule occur exactly at their start, the period
+        # of get_occurrences must start before it to include them.
+        start = task.scheduled_until or \
+            _aware(task.start) - datetime.timedelta(seconds=1)
+        occurrences = task.get_occurrences(start, until)
+        existing = set(task.scheduled_occurrences.filter(
+            original_start__in=[o.original_start for o in occurrences]
+        ).values_list('original_start', flat=True))
+        ScheduledOccurrence.objects.bulk_create([
+            ScheduledOccurrence(
+                task=task, original_start=o.original_start, start=o.start,
+                end=o.end, occurrence=o if o.pk else None)
+            for o in occurrences if o.original_start not in existing
+        ], batch_size=1000)
+        Task.objects.filter(pk=task.pk).update(scheduled_until=until)
+
+
+def ensure_scheduled(tasks, until):
+    """
+    Stores the occurrences of the tasks up to until, plus a window to
+    spare the next requests from doing it again.
+    """
+    until = _aware(until)
+    stale = tasks.filter(
+        Q(scheduled_until__isnull=True) | Q(scheduled_until__lt=until))
+    # The querysets of the views select related rows, which can't be
+    # combined with loading only the pk.
+    for task in stale.select_related(None).only('pk'):
+        store(task, until + WINDOW)
+
+
+def reset(task_id):
+    """ Drops the stored occurrences of a task whose schedule changed. """
+    from tasks.models import ScheduledOccurrence, Task
+    ScheduledOccurrence.objects.filter(task_id=task_id).delete()
+    Task.objects.filter(pk=task_id).update(scheduled_until=None)
+
+
+def pending(tasks, until):
+    """
+    Occurrences of the tasks starting before until that are neither
+    completed nor cancelled, by end date.
+    """
+    from tasks.models import ScheduledOccurrence
+    until = _aware(until)
+    ensure_scheduled(tasks, until)
+    return ScheduledOccurrence.objects.filter(
+        task__in=tasks, start__lt=until
+    ).exclude(
+        occurrence__cancelled=True
+    ).exclude(
+        occurrence__task_occurrences__completed=True
+    ).select_related('task', 'occurrence').order_by('end', 'id')
+
+
+def upcoming(tasks, since, until):
+    """ Occurrences of the tasks in a period, by end date. """
+    from tasks.models import ScheduledOccurrence
+    since, until = _aware(since), _aware(until)
+    ensure_scheduled(tasks, until)
+    return ScheduledOccurrence.objects.filter(
+        task__in=tasks, start__lt=until, end__gte=since
+    ).exclude(
+        occurrence__cancelled=True
+    ).select_related('task', 'occurrence').order_by('end', 'id')
+
+
+def as_occurrence(scheduled):
+    """
+    The persisted occurrence of a stored one, or an unsaved one like the
+    ones django-scheduler makes for the occurrences not persisted yet.
+    """
+    task = scheduled.task
+    if scheduled.occurrence is not None:
+        occurrence = scheduled.occurrence
+        occurrence.event = task
+        return occurrence
+    from schedule.models import Occurrence
+    return Occurrence(
+        event=task, start=scheduled.start, end=scheduled.end,
+        original_start=scheduled.original_start,
+        original_end=scheduled.original_start + (task.end - task.start))
+
+
+def store_all():
+    """ Moves the stored window of every task. Returns the tasks updated. """
+    from tasks.models import Task
+    until = timezone.now() + WINDOW
+    tasks = Task.objects.filter(
+        Q(scheduled_until__isnull=True) | Q(scheduled_until__lt=until))
+    count = 0
+    for task in tasks.only('pk'):
+        store(task, until)
+        count += 1
+    return count
@@ -0,0 +1,11 @@
+from rest_framework import pagination
+
+
+class CompletedOccurrencePagination(pagination.CursorPagination):
+    """
+    Pages of completed occurrences, latest first. The cursor keeps the
+    position in the ordering, so a page costs the same however much
+    history comes before it.
+    """
+    page_size = 50
+    ordering = ('-end', '-id')
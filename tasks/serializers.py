@@ -57,15 +57,33 @@ class TaskOccurrenceSerializer(serializers.ModelSerializer):
 
 
 class OccurrenceSerializer(serializers.ModelSerializer):
-    event = TaskSerializer(source='event.task')
+    event = SerializerMethodField()
     task_occurrences = SerializerMethodField()
 
     class Meta:
         model = Occurrence
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Loads what the serializer shows for a queryset of stored
+        occurrences (see tasks.occurrences) with the same query.
+        """
+        return queryset.select_related(
+            'task__assigned_user', 'task__assigned_role', 'task__rule',
+            'task__creator__aerosimple_user', 'task__inspection',
+            'occurrence__task_occurrences')
+
+    def get_event(self, obj):
+        # The occurrences made from stored ones already have the task
+        task = obj.event if isinstance(obj.event, Task) else obj.event.task
+        return TaskSerializer(task).data
+
     def get_task_occurrences(self, obj):
-        to = TaskOccurrence.objects.filter(occurrence__id=obj.id)
-        if to.exists():
-            return TaskOccurrenceSerializer(to.first()).data
-        return None
+        if obj.id is None:
+            return None
+        try:
+            return TaskOccurrenceSerializer(obj.task_occurrences).data
+        except TaskOccurrence.DoesNotExist:
+            return None
@@ -0,0 +1,14 @@
+import logging
+
+from celery import shared_task
+
+from tasks import occurrences
+
+logger = logging.getLogger('backend')
+
+
+@shared_task(name='store_task_occurrences')
+def store_task_occurrences():
+    """ Stores the occurrences of the tasks for the coming window. """
+    count = occurrences.store_all()
+    logger.info("Occurrences of {} tasks stored".format(count))
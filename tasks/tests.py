@@ -1,3 +1,170 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from schedule.models import Calendar, Rule
+
+from tasks import occurrences
+from tasks.models import ScheduledOccurrence, Task, TaskOccurrence
+from tasks.pagination import CompletedOccurrencePagination
+from tasks.views import TaskViewSet
+from users.factories import AerosimpleUserFactory, AirportFactory, \
+    GroupFactory, RoleFactory
+
+
+class ScheduledOccurrencesTestCase(APITestCase):
+    def setUp(self):
+        self.aerouser = AerosimpleUserFactory()
+        self.calendar = Calendar.objects.create(name='BCN', slug='bcn')
+        self.rule = Rule.objects.create(name='Daily', frequency='DAILY')
+        self.start = timezone.now().replace(microsecond=0) - \
+            datetime.timedelta(days=3)
+        self.task = self.create_task(rule=self.rule)
+
+        self.apiClient = APIClient()
+        self.apiClient.force_authenticate(user=self.aerouser.user)
+
+    def create_task(self, **kwargs):
+        values = {
+            'title': 'Check lights', 'start': self.start, 'end': self.start,
+            'calendar': self.calendar, 'creator': self.aerouser.user,
+            'assigned_user': self.aerouser,
+            'airport': self.aerouser.airport,
+        }
+        values.update(kwargs)
+        return Task.objects.create(**values)
+
+    def test_store(self):
+        until = self.start + datetime.timedelta(days=5)
+        occurrences.store(self.task, until)
+        self.assertEqual(self.task.scheduled_occurrences.count(), 5)
+
+        # Storing up to the same date again adds nothing
+        occurrences.store(self.task, until)
+        self.assertEqual(self.task.scheduled_occurrences.count(), 5)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.scheduled_until, until)
+
+        # Further ahead only the next ones are added
+        occurrences.store(self.task, until + datetime.timedelta(days=2))
+        self.assertEqual(self.task.scheduled_occurrences.count(), 7)
+
+    def test_store_without_rule(self):
+        task = self.create_task()
+        # Naive dates are taken as UTC
+        occurrences.store(task, datetime.datetime.utcnow())
+        self.assertEqual(
+            list(task.scheduled_occurrences.values_list('start', flat=True)),
+            [self.start])
+
+    def test_pending(self):
+        tasks = Task.objects.filter(pk=self.task.pk)
+        until = self.start + datetime.timedelta(days=5)
+        self.assertEqual(occurrences.pending(tasks, until).count(), 5)
+        self.task.refresh_from_db()
+        self.assertEqual(
+            self.task.scheduled_until, until + occurrences.WINDOW)
+
+        # A completed occurrence is left out
+        occurrence = self.task.get_occurrence(self.start)
+        occurrence.save()
+        TaskOccurrence.objects.create(
+            task=self.task, occurrence=occurrence, completed=True)
+        pending = occurrences.pending(tasks, until)
+        self.assertEqual(pending.count(), 4)
+        self.assertNotIn(self.start, [o.start for o in pending])
+
+        # A moved one is listed on its new date
+        moved = self.start + datetime.timedelta(days=1)
+        occurrence = self.task.get_occurrence(moved)
+        occurrence.start = occurrence.end = until + datetime.timedelta(hours=1)
+        occurrence.save()
+        self.assertEqual(occurrences.pending(tasks, until).count(), 3)
+
+    def test_reset(self):
+        occurrences.store(self.task, self.start + datetime.timedelta(days=5))
+
+        # Saving without changing the schedule keeps them
+        self.task.title = 'Check all lights'
+        self.task.save()
+        self.assertEqual(self.task.scheduled_occurrences.count(), 5)
+
+        self.task.start = self.task.end = \
+            self.start + datetime.timedelta(hours=1)
+        self.task.save()
+        self.assertFalse(ScheduledOccurrence.objects.filter(
+            task=self.task).exists())
+        self.task.refresh_from_db()
+        self.assertIsNone(self.task.scheduled_until)
+
+    def test_occurrences_view(self):
+        self.create_task(title='Replace sign')
+        response = self.apiClient.get('/api/tasks/occurrences/')
+        self.assertEqual(response.status_code, 200)
+        titles = [o['event']['title'] for o in response.data]
+        self.assertIn('Replace sign', titles)
+        self.assertIn('Check lights', titles)
+
+    def complete(self, task, date):
+        occurrence = task.get_occurrence(date)
+        occurrence.save()
+        TaskOccurrence.objects.create(
+            task=task, occurrence=occurrence, completed=True)
+        return occurrence
+
+    def test_completed_view(self):
+        days = [self.start + datetime.timedelta(days=n) for n in range(3)]
+        for day in days:
+            self.complete(self.task, day)
+
+        with mock.patch.object(CompletedOccurrencePagination, 'page_size', 2):
+            response = self.apiClient.get('/api/tasks/completed/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                set(response.data), {'next', 'previous', 'results'})
+            self.assertIsNone(response.data['previous'])
+            # Latest first
+            ends = [o['end'] for o in response.data['results']]
+            self.assertEqual(ends, sorted(ends, reverse=True))
+            self.assertEqual(len(ends), 2)
+
+            response = self.apiClient.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        self.assertLess(response.data['results'][0]['end'], ends[-1])
+
+    def test_completed_view_dates(self):
+        days = [self.start + datetime.timedelta(days=n) for n in range(3)]
+        for day in days:
+            self.complete(self.task, day)
+
+        day = days[1].strftime('%Y-%m-%d')
+        response = self.apiClient.get(
+            '/api/tasks/completed/', {'s': day, 'f': day})
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.apiClient.get('/api/tasks/completed/', {'s': day})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.apiClient.get('/api/tasks/completed/', {'f': day})
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.apiClient.get(
+            '/api/tasks/completed/', {'s': '01/02/2019'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_airport_tasks(self):
+        airport = self.aerouser.airport
+        other = AirportFactory(name='Madrid', code='MAD')
+        role = RoleFactory(
+            airport=airport, permission_group=GroupFactory(name='BCN'))
+        other_role = RoleFactory(
+            airport=other, permission_group=GroupFactory(name='MAD'))
+        shared = self.create_task(title='Shared', airport=None)
+        with_role = self.create_task(title='With role', assigned_role=role)
+        self.create_task(title='Other airport', airport=other)
+        self.create_task(title='Other role', airport=None,
+                         assigned_role=other_role)
+
+        tasks = TaskViewSet.airport_tasks(Task.objects.all(), airport.id)
+        self.assertEqual(
+            set(tasks), {self.task, shared, with_role})
@@ -1,3 +1,5 @@
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.forms import model_to_dict
 from rest_framework import viewsets, mixins, status
@@ -9,91 +11,20 @@ from tasks.serializers import (TaskSerializer, OccurrenceSerializer,
                                RuleSerializer)
 
 from tasks.models import Task, TaskOccurrence
+from tasks.pagination import CompletedOccurrencePagination
+from tasks import occurrences as scheduled
 from tasks.utils import create_task
 from users.models import AerosimpleUser, Role
-from schedule.models import Rule
-from schedule.periods import Period
+from schedule.models import Occurrence, Rule
 from forms.utils import DRAFT
+from notification.outbox import notify
 from airport.permissions import AirportHasTaskPermission
-from users.serializers import (AerosimpleUserDisplaySerializer , RoleSimpleSerializer, AerosimpleUserAssignmentSerializer)
-from django.conf import settings
-from django.template.loader import render_to_string
-import boto3
+from users.serializers import (AerosimpleUserDisplaySerializer , RoleSimpleSerializer)
 import datetime
 import logging
 import json
-from botocore.exceptions import ClientError
 
 logger = logging.getLogger('backend')
-def SendMailToTask(airportId,taskId):
-    task= Task.objects.get(id=taskId)
-    emails = ''
-    logger.info(taskId)
-    logger.info(airportId)
-   
-    images = {
-        'background': settings.MEDIA_URL + 'notifications/background.png',
-        'logo': settings.MEDIA_URL + 'notifications/logo.png',
-        'plane': settings.MEDIA_URL + 'notifications/plane.png',
-        'curve': settings.MEDIA_URL + 'notifications/curve.png',
-        'welcome': settings.MEDIA_URL + 'notifications/welcome-email.png',
-        'rectangle': settings.MEDIA_URL + 'notifications/Rectangle.png',
-    }
-    context={
-        'images':images,
-        'task':task,
-    }
-    if(task.assigned_user):
-        task= Task.objects.get(id=taskId)
-        emails= task.assigned_user.user.email
-    else:
-        task= Task.objects.get(id=taskId) 
-        roles = AerosimpleUserAssignmentSerializer(
-           AerosimpleUser.objects.filter(roles=task.assigned_role, airport_id = airportId, system_generated	= False),
-           many=True
-        ).data
-
-        for l in range(len(roles)):
-            emails = emails + roles[l]['email'] + ','
-
-    logger.info(emails)  
-   
-    html_string = render_to_string('task assigned.html', context=context)
-    
-    if emails:
-        RECIPIENT  = emails.rstrip(',').split(',')
-        SUBJECT = 'Task'
-        BODY_HTML = html_string
-        CHARSET = "UTF-8"
-        client = boto3.client('ses',region_name=settings.AWS_REGION)
-        try:
-            response = client.send_email(
-                Destination={
-                    'ToAddresses': RECIPIENT
-                },
-                Message={
-                    'Body': {
-                        'Html': {
-                            'Charset': CHARSET,
-                            'Data': BODY_HTML,
-                        }
-                    },
-                    'Subject': {
-                        'Charset': CHARSET,
-                        'Data': SUBJECT,
-                    },
-                },
-                Source=settings.EMAIL_HOST_USER,
-                ConfigurationSetName=settings.CONFIGURATION_SET,
-            )
-        except ClientError as e:
-            logger.info(e.response['Error']['Message'])
-        else:
-            logger.info("Email sent! Message ID:"),
-            logger.info(response['MessageId'])
-        return True
-    else:
-        return True
 
 
 class TaskViewSet(viewsets.ModelViewSet):
@@ -105,17 +36,26 @@ class TaskViewSet(viewsets.ModelViewSet):
         return Task.objects.none()
 
     @staticmethod
-    def get_user_tasks(user):
-        # getting tasks assigned to me
-        my_tasks = Task.objects.filter(
-                assigned_user = user.aerosimple_user)
-        
-        # getting tasks assigned to my role
-        my_role_tasks = Task.objects.filter(
-                assigned_role__in=user.aerosimple_user.roles.all())
+    def airport_tasks(tasks, airport_id):
+        """
+        Tasks of the airport, or of no airport, whose role if any is one
+        of the airport.
+        """
+        return tasks.filter(
+            Q(airport__isnull=True) | Q(airport_id=airport_id),
+            Q(assigned_role__isnull=True) |
+            Q(assigned_role__airport_id=airport_id)
+        ).exclude(inspection__versions__status=DRAFT).select_related(
+            'assigned_user', 'assigned_role')
 
-        all_task = (my_tasks | my_role_tasks)
-        return all_task.exclude(inspection__versions__status=DRAFT)
+    @staticmethod
+    def get_user_tasks(user):
+        aerosimple_user = user.aerosimple_user
+        # getting tasks assigned to me or to my roles
+        tasks = Task.objects.filter(
+            Q(assigned_user=aerosimple_user) |
+            Q(assigned_role__in=aerosimple_user.roles.all()))
+        return TaskViewSet.airport_tasks(tasks, aerosimple_user.airport_id)
 
     def get_my_task(self):
         if self.request.user:
@@ -143,32 +83,15 @@ class TaskViewSet(viewsets.ModelViewSet):
     @staticmethod
     def get_task_occurences(user):
         tasks = TaskViewSet.get_user_tasks(user)
-        today = datetime.datetime.now()
+        today = timezone.now()
         end_date = (today + datetime.timedelta(days=(7 - today.weekday() + 7)))
 
-        this_period = Period(tasks.all(), today, end_date)
-        result = this_period.get_occurrences()
-        result.sort(key=lambda r: r.end)
-
-        overdue = TaskViewSet.get_task_overdue(user)
-
-        no_due_date = tasks.filter(end=datetime.datetime.fromtimestamp(0))
-        this_period_2 = Period(
-            no_due_date.all(),
-            datetime.datetime.fromtimestamp(-1),
-            datetime.datetime.fromtimestamp(1)
-        )
-        no_due_date_occurrences = this_period_2.get_occurrences()
-        res = list(
-            filter(lambda x: x.id is None or not x.task_occurrences.completed,
-                   result + overdue + no_due_date_occurrences)
-        )
-        data = OccurrenceSerializer(res, many=True).data
-        if data is not None:
-            return list(filter(lambda x: ((x['event']['airport'] == None or x['event']['airport'] == user.aerosimple_user.airport_id) and
-                        (x['event']['assigned_role'] == None or x['event']['assigned_role']['airport_id'] == user.aerosimple_user.airport_id)), data))
-            # return data
-        return []
+        # Overdue, this period and without due date: everything pending
+        # that starts before the end of the period.
+        pending = OccurrenceSerializer.setup_eager_loading(
+            scheduled.pending(tasks, end_date))
+        res = [scheduled.as_occurrence(o) for o in pending]
+        return OccurrenceSerializer(res, many=True).data
 
     @action(detail=False, methods=['get'])
     def occurrences(self, request):
@@ -179,23 +102,16 @@ class TaskViewSet(viewsets.ModelViewSet):
     @staticmethod
     def get_task_overdue(user):
         """
-        Get overdue tasks, ie. past ocurrences not persisted and not completed.
-        When completing an ocurrence the Ocurrence instance is persisted, so
-        ocurrence without pk are incompleted.
+        Get overdue tasks, ie. past ocurrences not completed. When completing
+        an ocurrence the Ocurrence instance is persisted, so the stored
+        ocurrences are joined with it to leave the completed ones out.
         """
 
         tasks = TaskViewSet.get_user_tasks(user)
-        today = datetime.datetime.now()
-
-        this_period = Period(
-            tasks.all(), datetime.datetime.fromtimestamp(0), today)
-
-        result = list(
-            filter(lambda x: x.id is None or not x.task_occurrences.completed,
-                   this_period.get_occurrences())
-        )
-        result.sort(key=lambda r: r.end)
-        return result
+        today = timezone.now()
+        pending = OccurrenceSerializer.setup_eager_loading(
+            scheduled.pending(tasks, today))
+        return [scheduled.as_occurrence(o) for o in pending]
 
     def get_overdue(self, request):
         TaskViewSet.get_task_overdue(self.request.user)
@@ -217,48 +133,59 @@ class TaskViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def delegated(self, request):
-        tasks = Task.objects.filter(
-            creator=self.request.user).exclude(
-                assigned_user=self.request.user.aerosimple_user).exclude(
-                    assigned_role__in=self.request.user.aerosimple_user.roles.all())
-
-        today = datetime.datetime.combine(
-            datetime.datetime.now(),
-            datetime.datetime.min.time()
-        )
+        aerosimple_user = self.request.user.aerosimple_user
+        tasks = TaskViewSet.airport_tasks(
+            Task.objects.filter(creator=self.request.user).exclude(
+                assigned_user=aerosimple_user).exclude(
+                    assigned_role__in=aerosimple_user.roles.all()),
+            aerosimple_user.airport_id)
+
+        today = timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0)
         end_date = (today + datetime.timedelta(days=(7 - today.weekday() + 7)))
 
-        this_period = Period(tasks.all(), today, end_date)
-        result = this_period.get_occurrences()
-        result.sort(key=lambda r: r.end)
-        data = OccurrenceSerializer(result, many=True).data
-        if data is not None:
-            return Response(list(filter(lambda x: ((x['event']['airport'] == None or x['event']['airport'] == self.request.user.aerosimple_user.airport_id) and
-                        (x['event']['assigned_role'] == None or x['event']['assigned_role']['airport_id'] == self.request.user.aerosimple_user.airport_id)), data)))
-            # return data
-        return []
+        upcoming = OccurrenceSerializer.setup_eager_loading(
+            scheduled.upcoming(tasks, today, end_date))
+        result = [scheduled.as_occurrence(o) for o in upcoming]
+        return Response(OccurrenceSerializer(result, many=True).data)
 
     @action(detail=False, methods=['get'])
     def completed(self, request):
-        tasks = self.get_my_task().filter(
-            task_occurrences__completed=True).distinct()
-        result = []
-        for t in tasks:
-            result += t.occurrence_set.exclude(
-                task_occurrences__completed=False)
-        result.sort(key=lambda r: r.end)
-        data = OccurrenceSerializer(result, many=True).data
-        if data is not None:
-            return Response(list(filter(lambda x: ((x['event']['airport'] == None or x['event']['airport'] == self.request.user.aerosimple_user.airport_id) and
-                        (x['event']['assigned_role'] == None or x['event']['assigned_role']['airport_id'] == self.request.user.aerosimple_user.airport_id)), data)))
-            # return data
-        return []
+        """
+        Completed occurrences of my tasks, latest first and a page at a
+        time, optionally ending between the dates 's' and 'f'.
+        """
+        occurrences = Occurrence.objects.filter(
+            task_occurrences__completed=True,
+            task_occurrences__task__in=self.get_my_task())
+        try:
+            if request.GET.get('s'):
+                start = datetime.datetime.strptime(request.GET['s'], '%Y-%m-%d')
+                occurrences = occurrences.filter(end__gte=start)
+            if request.GET.get('f'):
+                end = datetime.datetime.strptime(request.GET['f'], '%Y-%m-%d')
+                occurrences = occurrences.filter(
+                    end__lt=end + datetime.timedelta(days=1))
+        except ValueError:
+            return Response(
+                "Dates must be formatted as YYYY-MM-DD",
+                status=status.HTTP_400_BAD_REQUEST)
+
+        occurrences = occurrences.select_related(
+            'event__task__assigned_user', 'event__task__assigned_role',
+            'event__task__rule', 'event__task__creator__aerosimple_user',
+            'event__task__inspection', 'task_occurrences')
+        paginator = CompletedOccurrencePagination()
+        page = paginator.paginate_queryset(occurrences, request, view=self)
+        return paginator.get_paginated_response(
+            OccurrenceSerializer(page, many=True).data)
 
     def create(self, request):
         data = request.data
-        task = create_task(data, request.user)
-
-        SendMailToTask(self.request.user.aerosimple_user.airport_id,task.id)
+        with transaction.atomic():
+            task = create_task(data, request.user)
+            notify('task', self.request.user.aerosimple_user.airport_id,
+                   task.id)
         return Response(TaskSerializer(task).data)
 
     def partial_update(self, request, pk=None, **kwargs):
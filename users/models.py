@@ -1,7 +1,7 @@
 from django.db import models
 from django.conf import settings
-from django.contrib.auth.models import Group, Permission
-from django.db.models.signals import m2m_changed, post_save
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import m2m_changed, pre_delete, post_save
 from django.dispatch import receiver
 import logging
 import boto3
@@ -10,6 +10,7 @@ from django.contrib.postgres.fields import JSONField
 import time
 
 from forms.models import PasswordModelField
+from users import recipients
 
 logger = logging.getLogger('backend')
 
@@ -325,4 +326,39 @@ def update_authorized_airport_data(sender, instance, action, **kwargs):
         instance.user.language = instance.airport.default_language
         instance.user.save()
     # dynamodb update authorized airport
-    AerosimpleUser.update_dynamodb(instance)
\ No newline at end of file
+    AerosimpleUser.update_dynamodb(instance)
+
+
+@receiver(m2m_changed, sender=AerosimpleUser.roles.through,
+          dispatch_uid="recipients_roles")
+def invalidate_role_recipients(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance is the role
+        recipients.invalidate(instance.airport_id)
+        return
+    roles = Role.objects.filter(pk__in=pk_set) if pk_set \
+        else instance.roles.all()
+    recipients.invalidate(
+        instance.airport_id, *roles.values_list('airport_id', flat=True))
+
+
+@receiver(post_save, sender=AerosimpleUser, dispatch_uid="recipients_user")
+@receiver(pre_delete, sender=AerosimpleUser, dispatch_uid="recipients_user")
+def invalidate_user_recipients(sender, instance, **kwargs):
+    airport_ids = [instance.airport_id]
+    if instance.pk is not None:
+        airport_ids += instance.roles.values_list('airport_id', flat=True)
+    recipients.invalidate(*airport_ids)
+
+
+@receiver(post_save, sender=User, dispatch_uid="recipients_auth_user")
+def invalidate_auth_user_recipients(sender, instance, created, **kwargs):
+    # The addresses are read from the auth user, also edited on its own
+    if created:
+        return
+    aerouser = AerosimpleUser.objects.filter(user=instance).first()
+    if aerouser is not None:
+        invalidate_user_recipients(AerosimpleUser, aerouser)
@@ -0,0 +1,105 @@
+"""
+Email addresses the notifications of an airport are sent to.
+
+The addresses of a role, or of the users a work order stage is assigned
+to, are read with one query projecting just the emails. When the cache
+is shared by the workers, each list is cached under its own key, tagged
+with a version of the airport. The version is increased, dropping every
+list of the airport at once, when the roles of its users, its users or
+the assignments of its work order forms change.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.utils import cache_is_shared
+
+RECIPIENTS_TIMEOUT = 60 * 60 * 24
+
+# Assignable stages of the work orders and the related name of their form
+STAGES = {
+    'maintenance': 'maintenance_form',
+    'operations': 'operations_form',
+}
+
+
+def version_key(airport_id):
+    return 'recipients-version:{}'.format(airport_id)
+
+
+def recipients_key(airport_id, name):
+    # A version lost from the cache starts over from the current time, so
+    # it never matches the lists cached under an older one.
+    version = cache.get_or_set(
+        version_key(airport_id), lambda: int(time.time()), None)
+    return 'recipients:{}:{}:{}'.format(airport_id, version, name)
+
+
+def _drop(airport_id):
+    try:
+        cache.incr(version_key(airport_id))
+    except ValueError:
+        # Nothing was cached for the airport
+        pass
+
+
+def invalidate(*airport_ids):
+    if not cache_is_shared():
+        return
+    for airport_id in {a for a in airport_ids if a is not None}:
+        transaction.on_commit(lambda a=airport_id: _drop(a))
+
+
+def _cached(airport_id, name, resolve):
+    if not cache_is_shared():
+        return resolve()
+    key = recipients_key(airport_id, name)
+    recipients = cache.get(key)
+    if recipients is None:
+        recipients = resolve()
+        cache.set(key, recipients, RECIPIENTS_TIMEOUT)
+    return recipients
+
+
+def _emails(users):
+    return sorted(set(
+        users.exclude(user__email='').values_list('user__email', flat=True)))
+
+
+def role_emails(airport_id, role_id, active_only=False):
+    """
+    Emails of the users of a role of the airport. With active_only, only
+    the ones currently at the airport and not system generated.
+    """
+    from users.models import AerosimpleUser
+
+    def resolve():
+        users = AerosimpleUser.objects.filter(roles=role_id)
+        if active_only:
+            users = users.filter(airport_id=airport_id, system_generated=False)
+        return _emails(users)
+
+    name = 'role:{}:{}'.format(role_id, 'active' if active_only else 'all')
+    return _cached(airport_id, name, resolve)
+
+
+def assignment_emails(airport_id, stage):
+    """
+    Emails of the role or the users the maintenance or the operations
+    stage of the work orders of the airport is assigned to.
+    """
+    from users.models import AerosimpleUser
+    from work_orders.models import WorkOrderForm
+
+    def resolve():
+        form = getattr(
+            WorkOrderForm.objects.select_related(STAGES[stage]).get(
+                airport_id=airport_id), STAGES[stage])
+        if form.assigned_role_id:
+            return _emails(
+                AerosimpleUser.objects.filter(roles=form.assigned_role_id))
+        return _emails(form.assigned_users.all())
+
+    return _cached(airport_id, 'stage:{}'.format(stage), resolve)
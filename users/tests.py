@@ -1,3 +1,96 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase
+
+from users import recipients
+from users.factories import AerosimpleUserFactory, AirportFactory, \
+    GroupFactory, RoleFactory, UserFactory
+from work_orders.models import WorkOrderForm
+
+
+class RecipientsTestCase(TransactionTestCase):
+    """ The invalidation runs on commit, so the tests do commit. """
+
+    def setUp(self):
+        self.aerouser = AerosimpleUserFactory(
+            user=UserFactory(username='john', email='john@bcn.aero'))
+        self.airport = self.aerouser.airport
+        self.role = RoleFactory(
+            airport=self.airport, permission_group=GroupFactory())
+        self.aerouser.roles.add(self.role)
+        # A user of the role currently at another airport
+        self.visitor = AerosimpleUserFactory(
+            user=UserFactory(username='jane', email='jane@mad.aero'),
+            airport=AirportFactory(name='Madrid', code='MAD'))
+        self.visitor.roles.add(self.role)
+
+        cache.clear()
+        patcher = mock.patch(
+            'users.recipients.cache_is_shared', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def role_emails(self, **kwargs):
+        return recipients.role_emails(
+            self.airport.id, self.role.id, **kwargs)
+
+    def test_role_emails(self):
+        self.assertEqual(
+            self.role_emails(), ['jane@mad.aero', 'john@bcn.aero'])
+        self.assertEqual(self.role_emails(active_only=True), ['john@bcn.aero'])
+
+        # Updates without signals are not seen until the cache is dropped
+        User.objects.filter(pk=self.aerouser.user_id).update(
+            email='j@bcn.aero')
+        self.assertEqual(self.role_emails(active_only=True), ['john@bcn.aero'])
+        recipients.invalidate(self.airport.id)
+        self.assertEqual(self.role_emails(active_only=True), ['j@bcn.aero'])
+
+    def test_role_emails_not_shared_cache(self):
+        self.role_emails()
+        User.objects.filter(pk=self.aerouser.user_id).update(
+            email='j@bcn.aero')
+        with mock.patch('users.recipients.cache_is_shared',
+                        return_value=False):
+            self.assertEqual(
+                self.role_emails(), ['j@bcn.aero', 'jane@mad.aero'])
+
+    def test_roles_invalidation(self):
+        self.assertEqual(len(self.role_emails()), 2)
+        self.visitor.roles.remove(self.role)
+        self.assertEqual(self.role_emails(), ['john@bcn.aero'])
+
+        self.visitor.roles.add(self.role)
+        self.assertEqual(len(self.role_emails()), 2)
+        self.aerouser.roles.clear()
+        self.assertEqual(self.role_emails(), ['jane@mad.aero'])
+
+    def test_auth_user_invalidation(self):
+        self.assertEqual(len(self.role_emails()), 2)
+        # As edited in the admin, without saving the aerosimple user
+        user = User.objects.get(pk=self.visitor.user_id)
+        user.email = 'j@mad.aero'
+        user.save()
+        self.assertEqual(self.role_emails(), ['j@mad.aero', 'john@bcn.aero'])
+
+    def test_assignment_emails(self):
+        form = WorkOrderForm.objects.create(
+            airport=self.airport, title='BCN Work Order form')
+        maintenance = form.maintenance_form
+        maintenance.assigned_role = self.role
+        maintenance.save()
+        self.assertEqual(
+            recipients.assignment_emails(self.airport.id, 'maintenance'),
+            ['jane@mad.aero', 'john@bcn.aero'])
+
+        maintenance.assigned_role = None
+        maintenance.save()
+        maintenance.assigned_users.add(self.visitor)
+        self.assertEqual(
+            recipients.assignment_emails(self.airport.id, 'maintenance'),
+            ['jane@mad.aero'])
+        maintenance.assigned_users.remove(self.visitor)
+        self.assertEqual(
+            recipients.assignment_emails(self.airport.id, 'maintenance'), [])
@@ -0,0 +1,56 @@
+from django.template.loader import render_to_string
+
+from notification.outbox import Email, email_images
+from users import recipients
+from work_orders.models import WorkOrder, WorkOrderImage, Maintenance, \
+    MaintenanceImage, Operations
+
+
+def _subject(work_order):
+    return 'WorkOrder #' + str(work_order.id)
+
+
+def workorder_email(notification):
+    """ Email to the maintenance assignees of a new work order. """
+    work_order = WorkOrder.objects.get(id=notification.object_id)
+    emails = recipients.assignment_emails(
+        notification.airport_id, 'maintenance')
+    context = {
+        'work_order': work_order,
+        'workorderimage': WorkOrderImage.objects.filter(
+            work_order_id=work_order.id),
+        'images': email_images()
+    }
+    html_string = render_to_string('work-order.html', context=context)
+    return Email(emails, _subject(work_order), html_string)
+
+
+def maintenance_email(notification):
+    """ Email to the operations assignees once the maintenance is done. """
+    work_order = WorkOrder.objects.get(id=notification.object_id)
+    emails = recipients.assignment_emails(
+        notification.airport_id, 'operations')
+    context = {
+        'work_order': work_order,
+        'maintenanceimage': MaintenanceImage.objects.filter(
+            maintenance_form_id=notification.related_id),
+        'maintenance': Maintenance.objects.get(work_order_id=work_order.id),
+        'images': email_images()
+    }
+    html_string = render_to_string('workorder-complete.html', context=context)
+    return Email(emails, _subject(work_order), html_string)
+
+
+def operation_email(notification):
+    """ Email to the user who logged the work order once it is closed. """
+    work_order = WorkOrder.objects.select_related('logged_by__user').get(
+        id=notification.object_id)
+    context = {
+        'work_order': work_order,
+        'maintenance': Maintenance.objects.get(work_order_id=work_order.id),
+        'operation': Operations.objects.get(work_order_id=work_order.id),
+        'images': email_images()
+    }
+    html_string = render_to_string('work-orderfyi.html', context=context)
+    return Email(
+        [work_order.logged_by.user.email], _subject(work_order), html_string)
@@ -0,0 +1,42 @@
+from exports.utils import ExportDocument, logo_context
+from work_orders.models import WorkOrder, Maintenance, Operations
+
+
+def workorder_data_document(pk, airport):
+    """ Work order with its maintenance and operations reviews. """
+    workorderdata = WorkOrder.objects.select_related('logged_by').get(
+        id=pk, form__form__airport=airport)
+    asset = [a.name for a in workorderdata.assets.all()]
+    notam = [v for k, v in workorderdata.notams.items()]
+    context = {
+        'airport': airport,
+        'workid': workorderdata.id,
+        'logby': workorderdata.logged_by.fullname,
+        'date1': workorderdata.date,
+        'location': workorderdata.location,
+        'priority': workorderdata.priority,
+        'cat': workorderdata.category,
+        'subcat': workorderdata.subcategory,
+        'desc1': workorderdata.problem_description,
+        'assets': asset,
+        'notams': notam,
+    }
+
+    maintaindata = Maintenance.objects.select_related(
+        'completed_by').filter(work_order_id=pk).first()
+    if maintaindata is not None:
+        context['maincompby'] = maintaindata.completed_by.fullname
+        context['date2'] = maintaindata.completed_on
+        context['desc2'] = maintaindata.work_description
+    operationdata = Operations.objects.select_related(
+        'completed_by').filter(work_order_id=pk).first()
+    if operationdata is not None:
+        context['opcompby'] = operationdata.completed_by.fullname
+        context['date3'] = operationdata.completed_on
+        context['desc3'] = operationdata.review_report
+
+    logo, stable = logo_context(airport)
+    context.update(logo)
+    filename = '{}-{}-with-data'.format(airport, workorderdata.id)
+    return ExportDocument(
+        'workorder-data.html', context, filename, 'workorders', stable)
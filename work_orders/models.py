@@ -1,13 +1,14 @@
 from django.contrib.gis.db import models
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
-from forms.models import Form, Version, Answer
+from forms.models import Form, Version, Answer, version_pointer
 from users.models import AerosimpleUser, Role
 from forms.utils import PUBLISHED
+from users import recipients
 
 
 # ******************************************************************
@@ -18,6 +19,8 @@ class WorkOrderForm(Form):
         "airport.Airport", related_name="work_order_schema",
         on_delete=models.CASCADE
     )
+    published_version = version_pointer('WorkOrderSchema')
+    latest_version = version_pointer('WorkOrderSchema')
 
     class Meta:
 
@@ -31,12 +34,10 @@ class WorkOrderSchema(Version):
         WorkOrderForm, related_name="versions", on_delete=models.CASCADE)
 
     def save(self, *args, **kwargs):
-        from airport.models import Translation
-        translations = Translation.objects.filter(airport=self.form.airport)
-
-        for tr in translations:
-            tr.updateTranslationMap('WorkOrder', self.schema['fields'])
+        from airport import translations
         super(WorkOrderSchema, self).save(*args, **kwargs)
+        translations.add_keys(self.form.airport_id, translations.schema_keys(
+            self.schema['fields'], 'WorkOrder'))
 
 
 class MaintenanceForm(Form):
@@ -50,6 +51,8 @@ class MaintenanceForm(Form):
     assigned_users = models.ManyToManyField(
         AerosimpleUser, related_name='maintenance_assigned_users', blank=True
     )
+    published_version = version_pointer('MaintenanceSchema')
+    latest_version = version_pointer('MaintenanceSchema')
 
 
 class MaintenanceSchema(Version):
@@ -68,6 +71,8 @@ class OperationsForm(Form):
     assigned_users = models.ManyToManyField(
         AerosimpleUser, related_name='operations_assigned_users', blank=True
     )
+    published_version = version_pointer('OperationsSchema')
+    latest_version = version_pointer('OperationsSchema')
 
 
 class OperationsSchema(Version):
@@ -160,6 +165,8 @@ class WorkOrderImage(models.Model):
     work_order = models.ForeignKey(
         WorkOrder, related_name="images", on_delete=models.CASCADE)
     image = models.ImageField(upload_to='work_orders/', blank=True, null=True)
+    # names of the thumbnails by size, see airport.uploads
+    thumbnails = JSONField(default=dict, blank=True)
 
 
 # ******************************************************************
@@ -191,6 +198,8 @@ class MaintenanceImage(models.Model):
     maintenance_form = models.ForeignKey(
         Maintenance, related_name="images", on_delete=models.CASCADE)
     image = models.ImageField(upload_to='work_orders/', blank=True, null=True)
+    # names of the thumbnails by size, see airport.uploads
+    thumbnails = JSONField(default=dict, blank=True)
 
 
 # ******************************************************************
@@ -223,3 +232,42 @@ class OperationsImage(models.Model):
     operations_form = models.ForeignKey(
         Operations, related_name="images", on_delete=models.CASCADE)
     image = models.ImageField(upload_to='work_orders/', blank=True, null=True)
+    # names of the thumbnails by size, see airport.uploads
+    thumbnails = JSONField(default=dict, blank=True)
+
+
+@receiver(post_save, sender=WorkOrderImage,
+          dispatch_uid="work_order_image_thumbnails")
+@receiver(post_save, sender=MaintenanceImage,
+          dispatch_uid="maintenance_image_thumbnails")
+@receiver(post_save, sender=OperationsImage,
+          dispatch_uid="operations_image_thumbnails")
+def image_thumbnails(sender, instance, raw=False, **kwargs):
+    from airport import uploads
+    if not raw:
+        uploads.schedule_thumbnails(instance)
+
+
+@receiver(post_save, sender=MaintenanceForm,
+          dispatch_uid="recipients_maintenance_form")
+@receiver(post_save, sender=OperationsForm,
+          dispatch_uid="recipients_operations_form")
+def invalidate_assignment_recipients(sender, instance, **kwargs):
+    recipients.invalidate(instance.work_order.airport_id)
+
+
+@receiver(m2m_changed, sender=MaintenanceForm.assigned_users.through,
+          dispatch_uid="recipients_maintenance_users")
+@receiver(m2m_changed, sender=OperationsForm.assigned_users.through,
+          dispatch_uid="recipients_operations_users")
+def invalidate_assigned_users_recipients(sender, instance, action, reverse,
+                                         **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance is the user, the forms may be of any of its airports
+        recipients.invalidate(
+            instance.airport_id,
+            *instance.roles.values_list('airport_id', flat=True))
+        return
+    recipients.invalidate(instance.work_order.airport_id)
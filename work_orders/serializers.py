@@ -15,7 +15,8 @@ from users.serializers import AerosimpleUserDisplaySerializer, \
 from users.models import AerosimpleUser
 
 from airport.serializers import AssetSerializer
-from forms.utils import PUBLISHED
+from airport.uploads import ThumbnailsField, UploadedImageField
+from forms.utils import PUBLISHED, get_compiled_form
 import json
 import logging
 logger = logging.getLogger('backend')
@@ -53,7 +54,7 @@ class WorkOrderSerializer(serializers.ModelSerializer):
             form__airport__id=user.aerosimple_user.airport_id,
             status=PUBLISHED).first()
 
-        form = PulpoForm(published_version.schema)
+        form = get_compiled_form(published_version)
         result = form.check_answers(data['response'])
 
         if result['result'] != 'OK':
@@ -103,6 +104,8 @@ class WorkOrderFormSerializer(serializers.ModelSerializer):
 
 
 class WorkOrderImageSerializer(serializers.ModelSerializer):
+    image = UploadedImageField(required=False, allow_null=True)
+    thumbnails = ThumbnailsField()
 
     class Meta:
         model = WorkOrderImage
@@ -251,7 +254,7 @@ class MaintenanceSerializer(serializers.ModelSerializer):
             form__work_order__airport__id=user.aerosimple_user.airport_id,
             status=PUBLISHED).first()
 
-        form = PulpoForm(published_version.schema)
+        form = get_compiled_form(published_version)
         result = form.check_answers(data['response'])
 
         if result['result'] != 'OK':
@@ -261,6 +264,8 @@ class MaintenanceSerializer(serializers.ModelSerializer):
 
 
 class MaintenanceImageSerializer(serializers.ModelSerializer):
+    image = UploadedImageField(required=False, allow_null=True)
+    thumbnails = ThumbnailsField()
 
     class Meta:
         model = MaintenanceImage
@@ -310,7 +315,7 @@ class OperationsSchemaSerializer(serializers.ModelSerializer):
             form__work_order__airport__id=user.aerosimple_user.airport_id,
             status=PUBLISHED).first()
 
-        form = PulpoForm(published_version.schema)
+        form = get_compiled_form(published_version)
         result = form.check_answers(data['response'])
 
         if result['result'] != 'OK':
@@ -352,6 +357,8 @@ class OperationsSerializer(serializers.ModelSerializer):
 
 
 class OperationsImageSerializer(serializers.ModelSerializer):
+    image = UploadedImageField(required=False, allow_null=True)
+    thumbnails = ThumbnailsField()
 
     class Meta:
         model = OperationsImage
@@ -448,7 +455,7 @@ class WorkOrderWebSerializer(serializers.ModelSerializer):
             form__airport__id=user.aerosimple_user.airport_id,
             status=PUBLISHED).first()
 
-        form = PulpoForm(published_version.schema)
+        form = get_compiled_form(published_version)
         result = form.check_answers(data['response'])
 
         if result['result'] != 'OK':
@@ -1,5 +1,6 @@
 from rest_framework import routers
-from work_orders.views import WorkOrderViewSet, MobileWorkOrderViewSet, ExportWorkorderData
+from work_orders.views import WorkOrderViewSet, MobileWorkOrderViewSet, ExportWorkorderData, \
+    WorkOrderStatisticsViewSet
 
 
 router = routers.SimpleRouter()
@@ -8,6 +9,8 @@ router.register(r'mobile/work_orders', MobileWorkOrderViewSet,
                 base_name='mobile_work_orders')
 router.register(r'work_orders_data', ExportWorkorderData,
                 base_name='work_orders_data')
+router.register(r'work_order_statistics', WorkOrderStatisticsViewSet,
+                base_name='work_order_statistics')
 
 urlpatterns = [
 ]
@@ -1,14 +1,8 @@
-from botocore.exceptions import ClientError
 import boto3
 import json
 import logging
-import random
-import os
-from datetime import date
 from airport.models import Airport, AssetImage
 from django import template
-from django.template.loader import render_to_string
-from weasyprint import HTML
 from django.core.files.storage import FileSystemStorage
 from django.http import HttpResponse
 from botocore.client import Config
@@ -16,6 +10,10 @@ from django.db import transaction
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from forms.utils import DRAFT, PUBLISHED
+from forms.views import VersionStatisticsViewSet
+from notification.outbox import notify
+from exports.utils import get_presigned_url, store_pdf
+from work_orders.exports import workorder_data_document
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -35,8 +33,7 @@ from work_orders.serializers import MaintenanceImageSerializer, \
     OperationsSchemaSaveSerializer, MaintenanceFormSerializer, \
     OperationsFormSerializer, MobileWorkOrderSerializer, \
     WorkOrderWebSerializer, WorkOrderListWebSerializer, \
-    WorkOrderDetailWebSerializer, MaintenanceSchemaAssignmentSerializer, \
-    OperationsSchemaAssignmentSerializer
+    WorkOrderDetailWebSerializer
 
 from airport.permissions import AirportHasWorkOrderPermission, AirportHasNotamsPermission
 
@@ -49,7 +46,6 @@ from collections import OrderedDict
 from django.conf import settings
 
 from django import template
-from django.template.loader import render_to_string
 from work_orders.models import WorkOrder, WorkOrderImage, Maintenance, OperationsSchema, MaintenanceForm, WorkOrderForm, Operations, MaintenanceImage
 from users.serializers import AerosimpleUserSimpleSerializer, UserSerializer
 
@@ -89,119 +85,6 @@ def get_permission_for_action(action):
     }
     return switcher.get(action, [IsAdminUser])
 
-##########################################################
-#################### Email Sending #######################
-##########################################################
-
-
-def sendMailToMaintenance(workOrderId, airportId, maintenanceId, type):
-    emails = ''
-    images = {
-        'background': settings.MEDIA_URL + 'notifications/background.png',
-        'logo': settings.MEDIA_URL + 'notifications/logo.png',
-        'plane': settings.MEDIA_URL + 'notifications/plane.png',
-        'curve': settings.MEDIA_URL + 'notifications/curve.png',
-        'welcome': settings.MEDIA_URL + 'notifications/welcome-email.png',
-        'rectangle': settings.MEDIA_URL + 'notifications/Rectangle.png',
-    }
-    if('workorder' in type):
-        work_order = WorkOrder.objects.get(id=workOrderId)
-        workorderimage = WorkOrderImage.objects.filter(
-            work_order_id=workOrderId)
-        form = WorkOrderForm.objects.get(airport__id=airportId)
-        assignedUsers = MaintenanceSchemaAssignmentSerializer(
-            form.maintenance_form.versions.get(status=PUBLISHED)
-        ).data
-        data = assignedUsers['assignment']['users']
-        user = assignedUsers['assignment']['role']
-        if(form.maintenance_form.assigned_role):
-            for i in range(len(user)):
-                emails = emails + user[i]['email'] + ','
-        else:
-            for j in range(len(data)):
-                emails = emails + data[j]['email'] + ','
-
-        context = {
-            'work_order': work_order,
-            'workorderimage': workorderimage,
-            'images': images
-        }
-        html_string = render_to_string('work-order.html', context=context)
-    elif('maintenance' in type):
-        work_order = WorkOrder.objects.get(id=workOrderId)
-        maintenance = Maintenance.objects.get(work_order_id=workOrderId)
-        maintenanceimage = MaintenanceImage.objects.filter(
-            maintenance_form_id=maintenanceId)
-        form = WorkOrderForm.objects.get(airport__id=airportId)
-        operations = OperationsSchemaAssignmentSerializer(
-            form.operations_form.versions.get(status=PUBLISHED)
-        ).data
-        search = operations['assignment']['users']
-        userdata = operations['assignment']['role']
-        if(form.operations_form.assigned_role):
-            for k in range(len(userdata)):
-                emails = emails + userdata[k]['email'] + ','
-        else:
-            for l in range(len(search)):
-                emails = emails + search[l]['email'] + ','
-
-        context = {
-            'work_order': work_order,
-            'maintenanceimage': maintenanceimage,
-            'maintenance': maintenance,
-            'images': images
-        }
-        html_string = render_to_string(
-            'workorder-complete.html', context=context)
-    elif('operation' in type):
-        work_order = WorkOrder.objects.get(id=workOrderId)
-        maintenance = Maintenance.objects.get(work_order_id=workOrderId)
-        operation = Operations.objects.get(work_order_id=workOrderId)
-        emails = work_order.logged_by.user.email
-        context = {
-            'work_order': work_order,
-            'maintenance': maintenance,
-            'operation': operation,
-            'images': images
-        }
-        html_string = render_to_string('work-orderfyi.html', context=context)
-
-    if emails:
-        RECIPIENT = emails.rstrip(',').split(',')
-        SUBJECT = 'WorkOrder #'+str(work_order.id)
-        BODY_HTML = html_string
-        CHARSET = "UTF-8"
-        client = boto3.client('ses', region_name=settings.AWS_REGION)
-        try:
-            response = client.send_email(
-                Destination={
-                    'ToAddresses': RECIPIENT
-                },
-                Message={
-                    'Body': {
-                        'Html': {
-                            'Charset': CHARSET,
-                            'Data': BODY_HTML,
-                        }
-                    },
-                    'Subject': {
-                        'Charset': CHARSET,
-                        'Data': SUBJECT,
-                    },
-                },
-                Source=settings.EMAIL_HOST_USER,
-                ConfigurationSetName=settings.CONFIGURATION_SET,
-            )
-        except ClientError as e:
-            logger.info(e.response['Error']['Message'])
-        else:
-            logger.info("Email sent! Message ID:"),
-            logger.info(response['MessageId'])
-        return True
-    else:
-        return True
-
-
 class WorkOrderMixin:
 
     @action(detail=False, methods=['get'])
@@ -408,14 +291,14 @@ class WorkOrderMixin:
                         data={
                             'maintenance_form': serializer.instance.id,
                             'image': image
-                        })
+                        },
+                        context={'request': request})
                     serializer_image.is_valid(raise_exception=True)
                     serializer_image.save()
+                notify('maintenance', self.request.user.aerosimple_user.airport_id,
+                       workorder.id, serializer.instance.id)
         except ValidationError:
             raise
-        # sendMailToOperation(workorder.id, self.request.user.aerosimple_user.airport_id)
-        sendMailToMaintenance(
-            workorder.id, self.request.user.aerosimple_user.airport_id, serializer.instance.id, "maintenance")
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
@@ -450,14 +333,14 @@ class WorkOrderMixin:
                         data={
                             'operations_form': serializer.instance.id,
                             'image': image
-                        })
+                        },
+                        context={'request': request})
                     serializer_image.is_valid(raise_exception=True)
                     serializer_image.save()
+                notify('operation', self.request.user.aerosimple_user.airport_id,
+                       workorder.id)
         except ValidationError:
             raise
-        # sendmailComplete(workorder.id, self.request.user.aerosimple_user.airport_id)
-        sendMailToMaintenance(
-            workorder.id, self.request.user.aerosimple_user.airport_id, '', "operation")
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
@@ -598,7 +481,8 @@ class WorkOrderViewSet(mixins.CreateModelMixin,
 
                 for photo in photos:
                     serializer_photo = WorkOrderImageSerializer(
-                        data={'work_order': workorder.id, 'image': photo})
+                        data={'work_order': workorder.id, 'image': photo},
+                        context={'request': request})
                     serializer_photo.is_valid(raise_exception=True)
                     serializer_photo.save()
 
@@ -609,10 +493,10 @@ class WorkOrderViewSet(mixins.CreateModelMixin,
                         s = json.loads(assets[asset])
                         workorder.assets.add(s[0])
 
+                notify('workorder', self.request.user.aerosimple_user.airport_id,
+                       workorder.id)
         except ValidationError:
             raise
-        sendMailToMaintenance(
-            workorder.id, self.request.user.aerosimple_user.airport_id, '', "workorder")
         return Response(
             serializer.data, status=status.HTTP_201_CREATED)
 
@@ -706,7 +590,8 @@ class MobileWorkOrderViewSet(viewsets.ModelViewSet,
 
                 for photo in photos:
                     serializer_photo = WorkOrderImageSerializer(
-                        data={'work_order': workorder.id, 'image': photo})
+                        data={'work_order': workorder.id, 'image': photo},
+                        context={'request': request})
                     serializer_photo.is_valid(raise_exception=True)
                     serializer_photo.save()
 
@@ -714,10 +599,10 @@ class MobileWorkOrderViewSet(viewsets.ModelViewSet,
                     assets = data.pop('assets', '')
                     for asset in json.loads(assets[0]):
                         workorder.assets.add(asset)
+                notify('workorder', self.request.user.aerosimple_user.airport_id,
+                       workorder.id)
         except ValidationError:
             raise
-        sendMailToMaintenance(
-            workorder.id, self.request.user.aerosimple_user.airport_id, '', "workorder")
         return Response(
             serializer.data, status=status.HTTP_201_CREATED)
 
@@ -736,75 +621,20 @@ class ExportWorkorderData(viewsets.GenericViewSet):
     @register.simple_tag
     @action(detail=True, methods=['get'])
     def workorder_data_view(self, request, pk):
-        date_now = date.today()
         airport = Airport.objects.filter(
             id=request.user.aerosimple_user.airport_id).first()
-        workorderdata = WorkOrder.objects.filter(id=pk).get()
-        logged_By_id = workorderdata.logged_by_id
-        logged_By = AerosimpleUser.objects.filter(
-            id=logged_By_id).last().fullname
-        notams = workorderdata.notams
-        assets = workorderdata.assets.all()
-        asset = []
-        for a in assets:
-            asset.append(a.name)
-        notam = []
-        for k, v in notams.items():
-            notam.append(v)
-        context = {
-            'airport': airport,
-            'workid': workorderdata.id,
-            'logby': logged_By,
-            'date1': workorderdata.date,
-            'location' :workorderdata.location,
-            'priority': workorderdata.priority,
-            'cat': workorderdata.category,
-            'subcat': workorderdata.subcategory,
-            'desc1': workorderdata.problem_description,
-            'assets': asset,
-            'notams': notam,
-            'date': date_now,
-        }
-       
-        if Maintenance.objects.filter(work_order_id=pk):
-            maintaindata = Maintenance.objects.filter(work_order_id=pk).get()
-            mancompid = maintaindata.completed_by_id
-            mintenanceCompletedby = AerosimpleUser.objects.filter(
-                id=mancompid).last().fullname
-            context['maincompby'] = mintenanceCompletedby
-            context['date2'] = maintaindata.completed_on
-            context['desc2'] = maintaindata.work_description
-            context['date'] = date_now
-        if Operations.objects.filter(work_order_id=pk):
-            operationdata = Operations.objects.filter(work_order_id=pk).get()
-            operbyid = operationdata.completed_by_id
-            operationsCompletedby = AerosimpleUser.objects.filter(
-                id=operbyid).last().fullname
-            context['opcompby'] = operationsCompletedby
-            context['date3'] = operationdata.completed_on
-            context['desc3'] = operationdata.review_report
-            context['date'] = date_now
-        html_string = render_to_string(
-            'workorder-data.html', context=context)
-        fileName = '{}-{}-with-data-{}.pdf'.format(
-            airport, workorderdata.id, random.randint(0, 999999))
-        key = '/tmp/'+fileName
-        html = HTML(string=html_string)
-        html.write_pdf(target=key)
-        bucket = settings.ATTACHMENTS_BUCKET_NAME
-        client = boto3.client(
-            's3', config=Config(signature_version='s3v4'))
+        document = workorder_data_document(pk, airport)
         try:
-            client.upload_file(key, bucket, 'workorders/'+fileName)
-            os.remove(key)
-            url = client.generate_presigned_url('get_object',
-                                                Params={
-                                                    'Bucket': bucket,
-                                                    'Key': 'workorders/'+fileName
-                                                },
-                                                ExpiresIn=settings.EXPIRY_FOR_EXPORT_DOCUMENT
-                                                )
+            url = get_presigned_url(store_pdf(document))
         except Exception as e:
             logger.error("there was an error trying to upload file")
+            return HttpResponse(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         return HttpResponse(url)
+
+
+class WorkOrderStatisticsViewSet(VersionStatisticsViewSet):
+    version_model = WorkOrderSchema
+    answers_relation = 'work_orders'
+    permission_classes = [
+        IsAuthenticated, CanViewWorkOrders, AirportHasWorkOrderPermission]